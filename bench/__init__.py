@@ -0,0 +1,11 @@
+"""
+Benchmarks and checks of the BeamScript interpreter, each runnable from the
+repository root with `python -m bench.<name>`:
+- phases: tokenize, parse and evaluate timed separately on the corpus, with
+  JSON results and comparison against a baseline
+- engines: every execution engine on the corpus
+- conformance: every engine checked against the tree-walker
+- lexer_scaling, ast_nodes, values, recursion, incremental: focused
+  benchmarks of one part each
+bench/corpus holds the BeamScript programs they share.
+"""
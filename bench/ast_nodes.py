@@ -0,0 +1,76 @@
+"""
+AST node benchmark.
+Compares the slotted node classes with the dict representation the parser used
+to produce (`node.__dict__`), reporting bytes per node and dispatch throughput
+of a string compare chain on dicts against the class keyed table used by `evaluate`.
+
+Run from the repository root:
+    python -m bench.ast_nodes [repeats]
+"""
+import sys
+from time import perf_counter
+from frontend.ast import Stmt
+from frontend.parser import Parser
+from runtime.interpreter import EVALUATORS
+from bench.lexer_scaling import SNIPPET
+
+# The order in which `evaluate` used to compare node types.
+TYPE_CHAIN = [
+    "StringLiteral", "NumericLiteral", "NullLiteral", "Identifier", "MemberExpression",
+    "CallExpression", "UnaryExpression", "LogicalExpression", "ObjectExpression",
+    "AssignmentExpression", "BinaryExpression", "Program", "VariableDeclaration",
+    "FunctionDeclaration", "IfStatement", "WhileStatement", "BlockStatement", "ExpressionStatement",
+]
+
+def walk(node, nodes):
+    if isinstance(node, Stmt):
+        nodes.append(node)
+        for field in node.fields():
+            walk(getattr(node, field), nodes)
+    elif isinstance(node, list):
+        for item in node:
+            walk(item, nodes)
+    return nodes
+
+def shallow_dict(node):
+    return {"type": node.type, **{field: getattr(node, field) for field in node.fields()}}
+
+def dispatch_by_string(nodes):
+    for node in nodes:
+        node_type = node["type"]
+        for name in TYPE_CHAIN:
+            if node_type == name:
+                break
+
+def dispatch_by_class(nodes):
+    for node in nodes:
+        EVALUATORS.get(node.__class__)
+
+def rate(fn, items, repeats):
+    start = perf_counter()
+    for _ in range(repeats):
+        fn(items)
+    return len(items) * repeats / (perf_counter() - start)
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    source = SNIPPET * 200
+
+    start = perf_counter()
+    program = Parser().produceAST(source)
+    parse_time = perf_counter() - start
+
+    nodes = walk(program, [])
+    dicts = [shallow_dict(node) for node in nodes]
+    slotted_bytes = sum(sys.getsizeof(node) for node in nodes) / len(nodes)
+    dict_bytes = sum(sys.getsizeof(node) for node in dicts) / len(dicts)
+
+    print(f"nodes:                {len(nodes)}")
+    print(f"parse:                {len(nodes) / parse_time:,.0f} nodes/sec")
+    print(f"bytes/node (dict):    {dict_bytes:.1f}")
+    print(f"bytes/node (slotted): {slotted_bytes:.1f}")
+    print(f"dispatch (strings):   {rate(dispatch_by_string, dicts, repeats):,.0f} nodes/sec")
+    print(f"dispatch (classes):   {rate(dispatch_by_class, nodes, repeats):,.0f} nodes/sec")
+
+if __name__ == "__main__":
+    main()
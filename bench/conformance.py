@@ -0,0 +1,106 @@
+"""
+Engine conformance check.
+Runs every program of bench/corpus, plus a few snippets exercising runtime
+errors, on each engine selectable in main.py, with and without the -O
+optimizer, and compares what they print and which error they stop with against
+the tree-walking `evaluate` on the unoptimized program.
+
+Run from the repository root:
+    python -m bench.conformance
+"""
+import contextlib
+import io
+import os
+import sys
+from frontend.optimizer import optimize
+from frontend.parser import Parser
+from runtime.environment import createGlobalEnv
+from main import ENGINES
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus")
+
+SNIPPETS = {
+    "const_reassignment": "const var a = 1\na = 2",
+    "undeclared_variable": "con.out.print(missing)",
+    "redeclaration": "var a = 1\nvar a = 2",
+    "divide_by_zero": "con.out.print(1 / 0)",
+    "missing_member": "var o = { a: 1 }\ncon.out.print(o.b)",
+    "missing_argument": "def f(a, b) { a }\ncon.out.print(f(1))",
+    "call_non_function": "var x = 5\nx()",
+    "shadowed_after_use": "var x = 1\ndef f() { con.out.print(x)\nvar x = 2\nx }\ncon.out.print(f())",
+    "folding": "var o = { a: 2 ^ 10, b: { c: 1 < 2 } }\nvar n = 3\nif 1 > 2 { n = 0 } else { n = n * 1 + 0 }\ncon.out.print(o, n - 0, -0.0 * 1, 1 and 1.0, \"a\" + 1, 0 or 4)",
+    "folding_keeps_errors": "def f() { if 1 { 5 } }\ncon.out.print(f(), 7 % 0)",
+    "mixed_constness": "def f(c) { if c { const var x = 1 } else { var x = 2 }\nx = 3 }\nf(false)\nf(true)",
+    "polymorphic_members": "def getx(o) { o.x }\nvar a = { x: 1, y: 2 }\nvar b = { y: 3, x: 4 }\nvar c = { x: 5, x: 6 }\ncon.out.print(getx(a), getx(b), getx(a), getx(c))\ngetx({ y: 1 })",
+    "array_index_out_of_range": "var a = [1, 2]\ncon.out.print(a[1])\na.pop()\ncon.out.print(a[1])",
+    "array_index_type": "var a = [1, 2]\na[\"0\"]",
+    "array_storage_changes": "var a = [1, 2]\na.push(0.5)\nvar b = []\nb.push(1.5)\nb.push(2.5)\nb.push(\"x\")\ncon.out.print(a, b, b.pop(), b.pop(), b.pop(), b.pop(), b.length)\nvar o = { k: 1 }\ncon.out.print(o[\"k\"], [a, o][1][\"k\"], [] == [], [1] == [1.0])",
+    "array_lengths_differ": "con.out.print([1, 2] + [1, 2, 3])",
+    "array_divide_by_zero": "var a = [4, 2]\ncon.out.print([] / 0, a / [2, 1], 7 % a)\na / [1, 0]",
+    "array_condition": "var a = [1, 2]\nif a > 1 { con.out.print(1) }",
+    "array_reduction_types": "con.out.print([1, 2.5].sum(), [2, 1.5].min(), [3].max())\n[1, \"s\"].sum()",
+    "for_loop_variable": "def f(n) { var s = 0\nfor i in range(n) { for j in range(i, 0, -2) { s = s + j } }\ncon.out.print(i)\ns }\ncon.out.print(f(30))\nfor i in range(3) { }\nvar i = 1",
+    "for_loop_never_runs": "def f(n) { for i in range(n) { }\ni }\nf(0)",
+    "for_constant_variable": "def f() { for k in range(0) { }\nconst var k = 1\nfor k in range(2) { } }\nf()",
+    "for_range_bounds": "for i in range(1, 3) { con.out.print(i) }\nfor i in range(0, 3.5) { }",
+    "for_range_step": "for i in range(3, 0, -1) { con.out.print(i) }\nfor i in range(0, 3, 0) { }",
+    "for_over_values": "var o = { b: 1, a: { c: 2 } }\nvar keys = 0\nfor k in o { keys = keys + 1\ncon.out.print(k, o[k]) }\nvar a = [3, 4]\nfor x in a { a.push(x) }\ncon.out.print(a, keys)\nfor x in 5 { }",
+    "for_object_keys": "var o = { b: 1, a: 2 }\nvar n = 0\nfor k in o { n = n + 1\ncon.out.print(k) }\ncon.out.print(n)\nfor k in null { }",
+    "for_global_name": "for con in range(2) { }",
+    "memo_eviction": "memo(2) def sq(x) { con.out.print(\"computing\", x)\nx * x }\ncon.out.print(sq(2), sq(2), sq(2.0), sq(3), sq(4), sq(2))",
+    "memo_argument_types": "memo def f(x) { con.out.print(x)\n1 }\nf(0)\nf(0.0)\nf(-0.0)\nf(false)\nf(null)\nf(\"0\")\nf(0)",
+    "memo_object_arguments": "memo def f(o) { con.out.print(\"called\")\no.a }\nvar o = { a: 1 }\ncon.out.print(f(o), f(o))\ncon.out.print(f({ a: 2 }))",
+    "memo_closures": "def outer(k) { memo def inner(x) { x + k }\ninner(1) + inner(1) }\ncon.out.print(outer(1), outer(2))",
+    "par_map": "var k = 10\ndef f(x) { x * x + k }\ncon.out.print(par.map(f, [1, 2, 3, 4, 5, 6, 7, 8, 9]), par.map(f, []), par.map(f, [\"s\", null]))",
+    "par_reduce": "def add(a, b) { a + b }\ncon.out.print(par.reduce(add, [1, 2, 3, 4, 5, 6, 7]), par.reduce(add, [0.5, 1.5], 10), par.reduce(add, []), par.reduce(add, [], 3))",
+    "par_closures": "def outer(n) { def inner(x) { { v: x + n } }\npar.map(inner, [1, 2, 3]) }\ncon.out.print(outer(5))\ndef make(x) { def g(y) { x + y }\ng }\nvar fs = par.map(make, [1, 2])\ncon.out.print(fs[1](10), par.map(fs[0], [5, 6]))",
+    "par_copies": "var count = 0\ndef f(x) { count = count + 1\nx }\ncon.out.print(par.map(f, [1, 2, 3]), count)\ncon.out.print(par.map(con.in, []))",
+    "memo_tail_call": "def h(n) { con.out.print(\"h\", n)\nn * 2 }\nmemo def g(n) { h(n) }\ncon.out.print(g(1), g(1), g(2))",
+    "changing_operand_types": "def f(a, b) { a + b }\nvar k = 0\nvar v = 0\nwhile k < 100 { if k % 20 < 10 { v = v + f(k, 1) } else { v = v + f(k + 0.5, 2) }\nk = k + 1 }\ncon.out.print(v, f(\"s\", 1), f(1, 2), k < 100)",
+}
+
+def load_programs():
+    programs = {}
+    for filename in sorted(os.listdir(CORPUS)):
+        if filename.endswith(".bs"):
+            with open(os.path.join(CORPUS, filename)) as file:
+                programs[filename[:-3]] = file.read()
+    programs.update(SNIPPETS)
+    return programs
+
+def run(engine, source, optimized=False):
+    output = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(output):
+        try:
+            program = Parser().produceAST(source)
+            env = createGlobalEnv()
+            if optimized:
+                optimize(program, env.variables)
+            engine(program, env)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return output.getvalue(), error
+
+def main():
+    failures = 0
+    reference = ENGINES["tree"]
+    for name, source in load_programs().items():
+        expected = run(reference, source)
+        for engine_name, engine in ENGINES.items():
+            for optimized in (False, True):
+                if engine is reference and not optimized:
+                    continue
+                label = engine_name + (" -O" if optimized else "")
+                actual = run(engine, source, optimized)
+                if actual == expected:
+                    print(f"ok       {label:<12} {name}")
+                    continue
+                failures += 1
+                print(f"MISMATCH {label:<12} {name}")
+                print(f"    expected: {expected!r}"[:400])
+                print(f"    actual:   {actual!r}"[:400])
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Engine benchmark.
+Times every engine selectable in main.py on each program of bench/corpus and
+reports the speedup over the tree-walking `evaluate`. Parsing is not timed.
+
+Run from the repository root:
+    python -m bench.engines [repeats]
+"""
+import contextlib
+import io
+import sys
+from time import perf_counter
+from frontend.parser import Parser
+from runtime.environment import createGlobalEnv
+from bench.conformance import load_programs, SNIPPETS
+from main import ENGINES
+
+def best_time(engine, source, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        program = Parser().produceAST(source)
+        env = createGlobalEnv()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = perf_counter()
+            engine(program, env)
+            best = min(best, perf_counter() - start)
+    return best
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'program':<18}" + "".join(f"{name:>12}" for name in ENGINES) + "   speedup")
+    for name, source in load_programs().items():
+        if name in SNIPPETS:
+            continue
+        times = {engine_name: best_time(engine, source, repeats) for engine_name, engine in ENGINES.items()}
+        speedups = " ".join(f"{engine_name} x{times['tree'] / seconds:.2f}" for engine_name, seconds in times.items() if engine_name != "tree")
+        print(f"{name:<18}" + "".join(f"{seconds * 1000:>10.1f}ms" for seconds in times.values()) + f"   {speedups}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Incremental parsing benchmark.
+Generates a source of 50,000 lines, then applies random single character edits
+to it: replacing a digit, inserting a space and deleting an indentation space.
+Reports the time of a full `Parser.produceAST` against `frontend.incremental.reparse`
+per edit, and checks that the last tree matches a full parse of the same source.
+
+Run from the repository root:
+    python -m bench.incremental [lines] [edits]
+"""
+import random
+import sys
+from statistics import median
+from time import perf_counter
+from frontend.incremental import parse, reparse
+from frontend.parser import Parser
+from bench.lexer_scaling import SNIPPET
+
+def generate(lines: int) -> str:
+    # Whole copies of the snippet, so the source stays valid
+    return SNIPPET * -(-lines // SNIPPET.count("\n"))
+
+def single_character_edit(source: str, rnd: random.Random):
+    # (offset, deleted, inserted) of an edit that keeps the source valid
+    while True:
+        offset = rnd.randrange(len(source))
+        char = source[offset]
+        if char.isdigit():
+            return offset, 1, rnd.choice("0123456789")
+        if char == " " and source[offset - 1] == " ":
+            return offset, 1, ""
+        if char == " ":
+            return offset, 0, " "
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rnd = random.Random(0)
+    source = generate(lines)
+
+    start = perf_counter()
+    Parser().produceAST(source)
+    full = perf_counter() - start
+    document = parse(source)
+
+    times = []
+    reused = 0
+    for _ in range(edits):
+        offset, deleted, inserted = single_character_edit(document.source, rnd)
+        start = perf_counter()
+        edited = reparse(document, offset, deleted, inserted)
+        times.append(perf_counter() - start)
+        old = set(map(id, document.program.body))
+        reused += sum(id(statement) in old for statement in edited.program.body)
+        document = edited
+
+    statements = len(document.program.body)
+    matches = document.program.to_dict() == Parser().produceAST(document.source).to_dict()
+    print(f"{lines:,} lines, {len(source) / 1024:,.0f} KB, {statements:,} top level statements")
+    print(f"full parse        {full * 1e3:10.1f} ms")
+    print(f"reparse median    {median(times) * 1e3:10.3f} ms")
+    print(f"reparse max       {max(times) * 1e3:10.3f} ms")
+    print(f"speedup (median)  {full / median(times):10.0f}x")
+    print(f"statements reused {reused / edits / statements:10.2%}")
+    print(f"matches full parse: {matches}")
+
+if __name__ == "__main__":
+    main()
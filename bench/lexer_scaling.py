@@ -0,0 +1,52 @@
+"""
+Lexer scaling benchmark.
+Tokenizes generated sources from 10 KB up to 10 MB and reports the throughput,
+which should stay flat if lexing is linear in the size of the input.
+
+Run from the repository root:
+    python -m bench.lexer_scaling [max_size_in_kb]
+"""
+import sys
+from time import perf_counter
+from frontend.lexer import tokenize, iter_tokens
+
+SNIPPET = """const var limit = 1000
+var total = 0.5
+def step(a, b) {
+    total = total + a * b ^ 2 % 7
+    if total >= limit { total = 0 } else { total = total - 1 }
+}
+while total != limit && limit > 0 { step(total, "label") }
+var point = { x: 1, y: 2.25, name: 'origin' }
+con.out.print(point.x, point.y)
+"""
+
+def generate(size):
+    repeats = size // len(SNIPPET) + 1
+    return (SNIPPET * repeats)[:size].rsplit("\n", 1)[0]
+
+def measure(fn, source):
+    start = perf_counter()
+    fn(source)
+    return perf_counter() - start
+
+def consume(source):
+    for _ in iter_tokens(source):
+        pass
+
+def main():
+    max_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 10 * 1024
+    sizes = [kb * 1024 for kb in (10, 40, 160, 640, 2560, 10240) if kb <= max_kb]
+
+    print(f"{'size':>10} {'tokens':>10} {'list (s)':>10} {'lazy (s)':>10} {'MB/s':>8} {'us/KB':>8}")
+    for size in sizes:
+        source = generate(size)
+        count = len(tokenize(source))
+        eager = measure(tokenize, source)
+        lazy = measure(consume, source)
+        kilobytes = len(source) / 1024
+        print(f"{kilobytes:>9.0f}K {count:>10} {eager:>10.3f} {lazy:>10.3f} "
+              f"{kilobytes / 1024 / eager:>8.2f} {eager * 1e6 / kilobytes:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Phase benchmark.
+Times the three phases of running a script separately, `tokenize`,
+`Parser.produceAST` and the engine (`evaluate` unless --engine says otherwise),
+on every program of bench/corpus and on generated sources of growing size.
+Every phase runs `--warmup` times untimed and `--repetitions` times timed,
+and is reported as min, median, mean, standard deviation and max.
+
+Results can be written as JSON with --json and compared against an earlier
+result file with --baseline, which reports the change of every median and
+exits with status 1 when one got slower by more than --threshold.
+
+Run from the repository root:
+    python -m bench.phases [programs...] [--json results.json] [--baseline old.json]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import statistics
+import sys
+from time import perf_counter
+from frontend.lexer import tokenize
+from frontend.parser import Parser
+from runtime.environment import createGlobalEnv
+from bench.conformance import load_programs, SNIPPETS
+from main import ENGINES
+
+PHASES = ("tokenize", "parse", "evaluate")
+
+# A function declaration, an object, a branch and a call per unit, every name unique
+UNIT = """def unit{i}(a, b) {{
+    var point = {{ x: a, y: b, scale: {i} }}
+    if point.x > point.y {{ point.x - point.y * point.scale }} else {{ point.y + point.x }}
+}}
+var result{i} = unit{i}({i}, 7)
+"""
+
+def generate(units: int) -> str:
+    return "".join(UNIT.format(i=i) for i in range(units))
+
+def load_sources(sizes) -> dict:
+    sources = {name: source for name, source in load_programs().items() if name not in SNIPPETS}
+    for units in sizes:
+        sources[f"generated_{units}"] = generate(units)
+    return sources
+
+def summarize(times) -> dict:
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "max": max(times),
+        "repetitions": len(times),
+    }
+
+def measure(run, prepare, warmup: int, repetitions: int) -> dict:
+    """
+    Times run(prepare()) repetitions times after warmup untimed runs. prepare
+    builds fresh input outside the timed region, the engines annotate the
+    trees they run.
+    """
+    times = []
+    for i in range(warmup + repetitions):
+        argument = prepare()
+        gc.collect()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = perf_counter()
+            run(argument)
+            elapsed = perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return summarize(times)
+
+def bench_source(source: str, engine, warmup: int, repetitions: int) -> dict:
+    return {
+        "tokenize": measure(tokenize, lambda: source, warmup, repetitions),
+        "parse": measure(lambda source: Parser().produceAST(source), lambda: source, warmup, repetitions),
+        "evaluate": measure(lambda program: engine(program, createGlobalEnv()), lambda: Parser().produceAST(source), warmup, repetitions),
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    # Prints the change of every median against the baseline, returns the number of regressions
+    regressions = 0
+    print()
+    print(f"{'program':<20}{'phase':<10}{'baseline':>12}{'now':>12}{'change':>9}")
+    for name, phases in results.items():
+        for phase, stats in phases.items():
+            before = baseline.get(name, {}).get(phase)
+            if before is None:
+                continue
+            change = stats["median"] / before["median"] - 1
+            verdict = ""
+            if change > threshold:
+                verdict = "  slower"
+                regressions += 1
+            elif change < -threshold:
+                verdict = "  faster"
+            print(f"{name:<20}{phase:<10}{before['median'] * 1e3:>10.2f}ms{stats['median'] * 1e3:>10.2f}ms{change:>+9.1%}{verdict}")
+    return regressions
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Times tokenize, parse and evaluate on the benchmark corpus")
+    arg_parser.add_argument("programs", nargs="*", help="only run these programs, by name")
+    arg_parser.add_argument("--engine", choices=ENGINES, default="tree", help="engine timed in the evaluate phase")
+    arg_parser.add_argument("--warmup", type=int, default=1, help="untimed runs before every phase")
+    arg_parser.add_argument("--repetitions", type=int, default=5, help="timed runs of every phase")
+    arg_parser.add_argument("--sizes", type=int, nargs="*", default=[100, 1000], help="units of the generated sources")
+    arg_parser.add_argument("--json", help="write the results to this file")
+    arg_parser.add_argument("--baseline", help="compare against the results in this file")
+    arg_parser.add_argument("--threshold", type=float, default=0.10, help="relative change of a median counted as a regression")
+    args = arg_parser.parse_args()
+
+    sources = load_sources(args.sizes)
+    if args.programs:
+        sources = {name: sources[name] for name in args.programs}
+
+    engine = ENGINES[args.engine]
+    results = {}
+    print(f"{'program':<20}{'size':>9}" + "".join(f"{phase:>12}" for phase in PHASES) + "   (median)")
+    for name, source in sources.items():
+        results[name] = bench_source(source, engine, args.warmup, args.repetitions)
+        medians = "".join(f"{results[name][phase]['median'] * 1e3:>10.2f}ms" for phase in PHASES)
+        print(f"{name:<20}{len(source) / 1024:>8.1f}K{medians}")
+
+    if args.json:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": args.engine,
+            "warmup": args.warmup,
+            "results": results,
+        }
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("engine", "tree") != args.engine:
+            print(f"\nwarning: the baseline timed the {baseline.get('engine')} engine")
+        regressions = compare(results, baseline["results"], args.threshold)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
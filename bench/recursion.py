@@ -0,0 +1,60 @@
+"""
+Recursion benchmark.
+For every engine selectable in main.py, finds the deepest BeamScript recursion
+it runs, doubling the depth until the engine fails or reaches the limit, once
+for plain recursion and once for calls in tail position. Then times a naive
+fib and reports BeamScript calls per second.
+
+Run from the repository root:
+    python -m bench.recursion [limit] [fib_n]
+"""
+import contextlib
+import io
+import sys
+from time import perf_counter
+from frontend.parser import Parser
+from runtime.environment import createGlobalEnv
+from main import ENGINES
+
+DEPTH = "def depth(n) { if n > 0 { depth(n - 1) }\nn }\ndepth({n})"
+TAIL = "def stop(n) { n }\ndef step(n) { var next = stop\nif n > 0 { next = step }\nnext(n - 1) }\nstep({n})"
+FIB = "def fib(n) { var r = n\nif n > 1 { r = fib(n - 1) + fib(n - 2) }\nr }\nfib({n})"
+
+def runs(engine, source) -> bool:
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine(Parser().produceAST(source), createGlobalEnv())
+    except (RecursionError, MemoryError):
+        return False
+    return True
+
+def max_depth(engine, template, limit) -> str:
+    depth = 0
+    n = 100
+    while n <= limit and runs(engine, template.replace("{n}", str(n))):
+        depth = n
+        n *= 2
+    return f">={depth:,}" if n > limit else f"{depth:,}"
+
+def fib_calls(n) -> int:
+    # fib(n) makes 2 * fib(n + 1) - 1 calls
+    a, b = 0, 1
+    for _ in range(n + 1):
+        a, b = b, a + b
+    return 2 * a - 1
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 64_000
+    fib_n = int(sys.argv[2]) if len(sys.argv) > 2 else 18
+    print(f"{'engine':<10}{'depth':>12}{'tail depth':>12}{'calls/sec':>14}")
+    for name, engine in ENGINES.items():
+        depth = max_depth(engine, DEPTH, limit)
+        tail_depth = max_depth(engine, TAIL, limit)
+        program = Parser().produceAST(FIB.replace("{n}", str(fib_n)))
+        start = perf_counter()
+        engine(program, createGlobalEnv())
+        rate = fib_calls(fib_n) / (perf_counter() - start)
+        print(f"{name:<10}{depth:>12}{tail_depth:>12}{rate:>14,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Runtime value benchmark.
+Compares the slotted value classes of runtime.values with the dicts the engines
+used to pass around (`NumberVal(value).__dict__`, whose number type came from
+formatting the value with str()), reporting the memory blocks and bytes each
+arithmetic and comparison result keeps alive and the operations per second.
+
+Run from the repository root:
+    python -m bench.values [operations]
+"""
+import sys
+import tracemalloc
+from time import perf_counter
+from runtime.values import NumberVal, boolean, number
+
+def dict_number(value):
+    # What NumberVal(value).__dict__ used to build
+    return {"type": "number", "value": value, "number_type": "float" if "." in str(value) else "int"}
+
+def dict_add(lhs, rhs):
+    if lhs["type"] == "number" and rhs["type"] == "number":
+        return dict_number(lhs["value"] + rhs["value"])
+    return {"type": "null", "value": None}
+
+def dict_less(lhs, rhs):
+    if lhs["type"] == "number" and rhs["type"] == "number":
+        return {"type": "boolean", "value": lhs["value"] < rhs["value"]}
+    return {"type": "null", "value": None}
+
+def slotted_add(lhs, rhs):
+    if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+        return number(lhs.value + rhs.value)
+    return None
+
+def slotted_less(lhs, rhs):
+    if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+        return boolean(lhs.value < rhs.value)
+    return None
+
+def measure(op, operands, count):
+    """
+    Applies op to each pair of operands and keeps every result, so the blocks
+    and bytes still allocated afterwards are the ones the results cost.
+    """
+    results = [None] * count
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    for i in range(count):
+        results[i] = op(*operands[i])
+    blocks = sys.getallocatedblocks() - blocks
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = perf_counter()
+    for lhs, rhs in operands:
+        op(lhs, rhs)
+    elapsed = perf_counter() - start
+    return blocks / count, size / count, count / elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    # Counters, as in loops, and floats, as in accumulators
+    pairs = [(i % 200, 1) for i in range(count // 2)] + [(i * 0.5, 1.5) for i in range(count - count // 2)]
+    dicts = [(dict_number(lhs), dict_number(rhs)) for lhs, rhs in pairs]
+    slotted = [(number(lhs), number(rhs)) for lhs, rhs in pairs]
+
+    print(f"{'operation':<22}{'blocks/op':>10}{'bytes/op':>10}{'ops/sec':>14}")
+    for name, op, operands in [
+        ("+ (dict)", dict_add, dicts),
+        ("+ (slotted)", slotted_add, slotted),
+        ("< (dict)", dict_less, dicts),
+        ("< (slotted)", slotted_less, slotted),
+    ]:
+        blocks, size, rate = measure(op, operands, count)
+        print(f"{name:<22}{blocks:>10.2f}{size:>10.1f}{rate:>14,.0f}")
+
+if __name__ == "__main__":
+    main()
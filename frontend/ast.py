@@ -6,92 +6,194 @@ NodeType = Union[
     # STATEMENTS
     "Program",
     "VariableDeclaration",
+    "VariableDeclarator",
     "IfStatement",
-    "WhileStatement"
+    "WhileStatement",
+    "ForStatement",
     "FunctionDeclaration",
-    "Expr",
-    "BlockStatement"
+    "ExpressionStatement",
+    "BlockStatement",
     
     # EXPRESSIONS
     "AssignmentExpression",
     "ObjectExpression",
+    "ArrayExpression",
     "BinaryExpression",
     "UnaryExpression",
     "LogicalExpression",
     "MemberExpression",
-    "CallExpression"
+    "CallExpression",
+    "RangeExpression",
     
     # LITERALS
-    "StringLiteral"
+    "StringLiteral",
     "Property",
     "NumericLiteral",
     "NullLiteral",
+    "BooleanLiteral",
     "Identifier"
 ]
+
+def to_dict(node):
+    """
+    Converts a node (or a list of nodes) into plain dicts, e.g. for dumping the AST as JSON.
+    """
+    if isinstance(node, Stmt):
+        return node.to_dict()
+    if isinstance(node, list):
+        return [to_dict(item) for item in node]
+    return node
+
 """
 Statements do not result in a value at runtime.
 They contain one or more expressions internally
+- Nodes use __slots__ and keep their `type` on the class so they stay small,
+  the interpreter dispatches on the class of a node rather than its `type`.
 """
 class Stmt:
+    __slots__ = ()
     type: NodeType
 
+    def fields(self):
+        for cls in reversed(type(self).__mro__):
+            yield from getattr(cls, "__slots__", ())
+
+    def to_dict(self):
+        node = {"type": self.type}
+        for field in self.fields():
+            node[field] = to_dict(getattr(self, field))
+        return node
+
 """
 Defines a block which contains many statements.
 - Only one program will be contained in a file.
 """
 class Program(Stmt):
-    def __init__(self, start, end, body: List[Stmt]):
-        self.type = "Program"
+    __slots__ = ("start", "end", "body", "starts", "scope")
+    type = "Program"
+
+    def __init__(self, start, end, body: List[Stmt], starts: Optional[List[int]] = None):
         self.start = start
         self.end = end
         self.body = body
+        # Offset of every statement of body in the source. Offsets inside a
+        # statement are relative to its start, so they stay valid when
+        # frontend.incremental moves it.
+        self.starts = starts
+        # Slot layout of the program's variables, set by frontend.resolver
+        self.scope = None
         
 class VariableDeclaration(Stmt):
+    __slots__ = ("declarations", "kind", "constant")
+    type = "VariableDeclaration"
+
     def __init__(self, declarations, kind: str, constant: bool):
-        self.type = "VariableDeclaration"
         self.declarations = declarations
         self.kind = kind
         self.constant = constant
+
+class VariableDeclarator(Stmt):
+    __slots__ = ("id", "init")
+    type = "VariableDeclarator"
+
+    def __init__(self, ident, init):
+        self.id = ident
+        self.init = init
         
 class FunctionDeclaration(Stmt):
-    def __init__(self, ident, params, body):
-        self.type = "FunctionDeclaration"
+    __slots__ = ("id", "params", "body", "start", "scope", "memoized", "memo_size")
+    type = "FunctionDeclaration"
+
+    def __init__(self, ident, params, body, start: Optional[int] = None, memoized: bool = False, memo_size: Optional[int] = None):
         self.id = ident
         self.params = params
         self.body = body
+        # Offset of `def` from the start of the program statement holding it
+        self.start = start
+        # Slot layout of the function's variables, set by frontend.resolver
+        self.scope = None
+        # Declared `memo def`, and the n of `memo(n) def`, see runtime.memo
+        self.memoized = memoized
+        self.memo_size = memo_size
 
 class IfStatement(Stmt):
+    __slots__ = ("condition", "consequent", "alternate")
+    type = "IfStatement"
+
     def __init__(self, condition, consequent, alternate=None):
-        self.type = "IfStatement"
         self.condition = condition
         self.consequent = consequent
         self.alternate = alternate
         
 class WhileStatement(Stmt):
+    __slots__ = ("condition", "body", "site")
+    type = "WhileStatement"
+
     def __init__(self, condition, body):
-        self.type = "WhileStatement"
         self.condition = condition
         self.body = body
+        # The loop runtime.interpreter switched to once the sites in it were specialized
+        self.site = None
+
+    # Pickled as it was parsed, the specialization is a closure
+    def __reduce__(self):
+        return WhileStatement, (self.condition, self.body)
+
+"""
+`for variable in iterable { body }`. The loop variable is a variable of the
+scope the loop is in, set before every iteration. `iterable` is evaluated once,
+a RangeExpression counts through integers without building any collection.
+"""
+class ForStatement(Stmt):
+    __slots__ = ("variable", "iterable", "body", "constant")
+    type = "ForStatement"
+
+    def __init__(self, variable, iterable, body):
+        self.variable = variable
+        self.iterable = iterable
+        self.body = body
+        # Like AssignmentExpression.constant, None when the scope also declares the loop variable constant
+        self.constant = False
 
 class BlockStatement(Stmt):
+    __slots__ = ("body",)
+    type = "BlockStatement"
+
     def __init__(self, body):
-        self.type = "BlockStatement"
         self.body = body
 
 """
 Expressions will result in a value at runtime unlike Statements
 """
 class Expr(Stmt):
-    def __init__(self, expr):
-        self.type = "ExpressionStatement"
+    __slots__ = ()
+
+"""
+A statement made of a single expression, its value is discarded.
+"""
+class ExpressionStatement(Stmt):
+    __slots__ = ("expression",)
+    type = "ExpressionStatement"
+
+    def __init__(self, expr: Expr):
         self.expression = expr
 
 class AssignmentExpression(Expr):
+    __slots__ = ("left", "right", "constant", "site")
+    type = "AssignmentExpression"
+    operator = "="
+
     def __init__(self, assigne: Expr, value: Expr):
-        self.type = "AssignmentExpression"
-        self.operator = "="
         self.left = assigne
         self.right = value
+        # Whether the assigned variable was declared constant, None when its scope declares it both ways
+        self.constant = False
+        # The specialized assignment runtime.interpreter switched to, once its value was specialized
+        self.site = None
+
+    # Pickled without the specialization, which is a closure
+    def __reduce__(self):
+        return AssignmentExpression, (self.left, self.right), (None, {"constant": self.constant})
 
 """
 A operation with two sides seperated by a operator.
@@ -100,73 +202,153 @@ Both sides can be ANY Complex Expression.
 """
 
 class UnaryExpression(Expr):
+    __slots__ = ("operator", "argument")
+    type = "UnaryExpression"
+
     def __init__(self, operator: str, argument):
-        self.type = "UnaryExpression"
         self.operator = operator
         self.argument = argument
 
 class LogicalExpression(Expr):
+    __slots__ = ("left", "operator", "right")
+    type = "LogicalExpression"
+
     def __init__(self, left: Expr, operator: str, right: Expr):
-        self.type = "LogicalExpression"
         self.left = left
         self.operator = operator
         self.right = right
            
 class BinaryExpression(Expr):
+    __slots__ = ("left", "operator", "right", "feedback", "site")
+    type = "BinaryExpression"
+
     def __init__(self, left: Expr, operator: str, right: Expr):
-        self.type = "BinaryExpression"
         self.left = left
         self.operator = operator
         self.right = right
+        # Operand types seen by runtime.interpreter, and the specialized
+        # evaluation it switched to once they were stable
+        self.feedback = None
+        self.site = None
+
+    # Pickled as it was parsed, the specialization is a closure
+    def __reduce__(self):
+        return BinaryExpression, (self.left, self.operator, self.right)
         
 class CallExpression(Expr):
+    __slots__ = ("callee", "arguments")
+    type = "CallExpression"
+
     def __init__(self, callee: Expr, args: List[Expr]):
-        self.type = "CallExpression"
         self.callee = callee
         self.arguments = args
         
 class MemberExpression(Expr):
+    __slots__ = ("object", "property", "computed", "shape", "index")
+    type = "MemberExpression"
+
     def __init__(self, member_object: Expr, member_property: Expr, computed: bool):
-        self.type = "MemberExpression"
         self.object = member_object
         self.property = member_property
         self.computed = computed
+        # Inline cache of runtime.interpreter: the Shape of the last object read
+        # and the index of the property in it
+        self.shape = None
+        self.index = None
 
 # LITERAL / PRIMARY EXPRESSION TYPES
 
 """
 Represents a user-defined variable or symbol in source.
+- `depth` and `slot` are its lexical address, set by frontend.resolver.
+  A depth of None means the name is looked up in the Environment.
 """
 class Identifier(Expr):
+    __slots__ = ("name", "depth", "slot")
+    type = "Identifier"
+
     def __init__(self, name: str):
-        self.type = "Identifier"
         self.name = name
+        self.depth = None
+        self.slot = None
 
 """
 Represents a numeric constant inside the soure code.
 """
 class NumericLiteral(Expr):
+    __slots__ = ("value",)
+    type = "NumericLiteral"
+
     def __init__(self, value: int):
-        self.type = "NumericLiteral"
         self.value = value
 
 class NullLiteral(Expr):
-    def __init__(self):
-        self.type = "NullLiteral"
-        self.value = None
+    __slots__ = ()
+    type = "NullLiteral"
+    value = None
+
+"""
+A boolean constant. The parser reads `true` and `false` as identifiers,
+these only come from folding comparisons in frontend.optimizer.
+"""
+class BooleanLiteral(Expr):
+    __slots__ = ("value",)
+    type = "BooleanLiteral"
+
+    def __init__(self, value: bool):
+        self.value = value
         
 class Property(Expr):
+    __slots__ = ("key", "value", "depth", "slot")
+    type = "Property"
+
     def __init__(self, key: str, value: Expr = None):
-        self.type = "Property"
         self.key = key
         self.value = value
+        # Lexical address of the variable a shorthand property reads
+        self.depth = None
+        self.slot = None
  
 class ObjectExpression(Expr):
+    __slots__ = ("properties", "constant", "value", "shape")
+    type = "ObjectExpression"
+
     def __init__(self, properties: List[Property]):
-        self.type = "ObjectExpression"
         self.properties = properties
+        # Set by frontend.optimizer when every property value is a constant,
+        # engines may then build the object once and keep it in `value`.
+        self.constant = False
+        self.value = None
+        # Shape of the objects it builds, looked up on first use
+        self.shape = None
+
+"""
+An array literal, `[a, b, c]`. Arrays are mutable, so unlike objects every
+evaluation builds a new one.
+"""
+class ArrayExpression(Expr):
+    __slots__ = ("elements",)
+    type = "ArrayExpression"
+
+    def __init__(self, elements: List[Expr]):
+        self.elements = elements
+
+"""
+`range(start, stop, step)` in the head of a for loop, the parser fills in a
+start of 0 and a step of 1 when they are left out.
+"""
+class RangeExpression(Expr):
+    __slots__ = ("start", "stop", "step")
+    type = "RangeExpression"
+
+    def __init__(self, start: Expr, stop: Expr, step: Expr):
+        self.start = start
+        self.stop = stop
+        self.step = step
 
 class StringLiteral(Expr):
+    __slots__ = ("value",)
+    type = "StringLiteral"
+
     def __init__(self, value: str):
-        self.type = "StringLiteral"
-        self.value = value
\ No newline at end of file
+        self.value = value
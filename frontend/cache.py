@@ -0,0 +1,127 @@
+from frontend.ast import Program, Stmt
+from frontend.parser import Parser
+from typing import Optional
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+
+"""
+On-disk parse cache.
+Like `__pycache__`, the Program parsed from a script is pickled and
+compressed into a CACHE_DIR next to it, keyed by a hash of the source, the interpreter version
+and the layout of the AST classes. Running an unchanged script loads the tree
+instead of lexing and parsing it again.
+- Entries are written to a temporary file and moved into place with
+  os.replace, so concurrent runners only ever see complete entries.
+- Reading an entry refreshes its mtime. Once the directory grows past
+  MAX_CACHE_BYTES the least recently used entries are removed.
+- An entry that cannot be read is treated as missing and written again.
+"""
+VERSION = "0.3.2 Dev"
+CACHE_DIR = "__bscache__"
+SUFFIX = ".bsc"
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+def ast_layout() -> str:
+    # Names and fields of every node class, so entries of older trees never match
+    classes = []
+    pending = [Stmt]
+    while pending:
+        cls = pending.pop()
+        classes.append(f"{cls.__name__}{cls.__slots__}")
+        pending.extend(cls.__subclasses__())
+    return ";".join(sorted(classes))
+
+KEY_PREFIX = f"{VERSION}\0{ast_layout()}\0{pickle.HIGHEST_PROTOCOL}\0".encode()
+
+def cache_key(source: str) -> str:
+    return hashlib.sha256(KEY_PREFIX + source.encode()).hexdigest()
+
+def cache_path(path: str, source: str) -> str:
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    return os.path.join(directory, cache_key(source) + SUFFIX)
+
+def load(entry: str) -> Optional[Program]:
+    try:
+        with open(entry, "rb") as file:
+            program = pickle.loads(zlib.decompress(file.read()))
+    except Exception:
+        # Missing, truncated or written by something else, parse again and overwrite it
+        return None
+    if program.__class__ is not Program:
+        return None
+    try:
+        os.utime(entry)
+    except OSError:
+        pass
+    return program
+
+def store(entry: str, program: Program):
+    directory = os.path.dirname(entry)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        # A read-only directory only means running without the cache
+        return
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(zlib.compress(pickle.dumps(program, pickle.HIGHEST_PROTOCOL)))
+        os.replace(temporary, entry)
+    except (OSError, pickle.PicklingError, RecursionError):
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return
+    evict(directory, MAX_CACHE_BYTES)
+
+def evict(directory: str, max_bytes: int):
+    """
+    Removes the least recently used entries of directory until the rest fit
+    in max_bytes. Entries another process removes first are skipped.
+    """
+    entries = []
+    total = 0
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(SUFFIX):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+        total += stat.st_size
+
+    entries.sort()
+    for mtime, size, name in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+        total -= size
+
+def parse_file(path: str, cached: bool = True) -> Program:
+    with open(path) as file:
+        source = file.read()
+    return parse_source(path, source, cached)
+
+def parse_source(path: str, source: str, cached: bool = True) -> Program:
+    # Parses source read from path, through the cache next to it
+    if not cached:
+        return Parser().produceAST(source)
+
+    entry = cache_path(path, source)
+    program = load(entry)
+    if program is None:
+        program = Parser().produceAST(source)
+        store(entry, program)
+    return program
@@ -0,0 +1,90 @@
+from frontend.ast import Program, Stmt
+from frontend.lexer import TokenType, iter_tokens
+from frontend.parser import Parser
+from bisect import bisect_left
+from typing import Iterator, Optional, Tuple
+
+"""
+Incremental parsing for editors and tooling.
+A ParsedSource keeps the Program of a source, whose `starts` hold the offset
+every top level statement starts at. `reparse` applies one edit to it: lexing
+resumes at the start of the statement before the edit, and statements are
+parsed until one ends on a statement boundary of the old source past the
+edit. Every other statement is reused as it is, only its offset in `starts`
+is shifted, the positions inside it are relative to that offset.
+- Parsing a statement looks at the first token after it, `a` followed by `-b`
+  parses as `a - b`, so parsing resumes one statement before the edit.
+- The lexer tells unary from binary +/- by the token before. No statement ends
+  with a binary operator, so it resumes at every boundary but the first in the
+  same state.
+- A `//` makes the lexer drop the last character of the source, sources that
+  contain one are parsed in full.
+"""
+# Type of the token before any statement boundary but the first, as far as the lexer cares
+BOUNDARY = TokenType.CloseBrace
+
+class ParsedSource:
+    __slots__ = ("source", "program", "comment")
+
+    def __init__(self, source: str, program: Program, comment: bool):
+        self.source = source
+        self.program = program
+        # Whether the source contains a `//`
+        self.comment = comment
+
+def statements(source: str, offset: int, prev_type: Optional[TokenType]) -> Iterator[Tuple[int, Stmt, int]]:
+    # Yields (start, statement, start of what follows) for the statements from offset on
+    parser = Parser()
+    parser.reset(iter_tokens(source, offset, prev_type))
+    while parser.not_eof():
+        start = parser.statement_start = parser.current.start
+        statement = parser.parse_stmt()
+        yield start, statement, parser.current.start
+
+def parse(source: str) -> ParsedSource:
+    starts = []
+    body = []
+    for start, statement, _ in statements(source, 0, None):
+        starts.append(start)
+        body.append(statement)
+    return ParsedSource(source, Program(0, len(source), body, starts), "//" in source)
+
+def reparse(previous: ParsedSource, offset: int, deleted: int, inserted: str) -> ParsedSource:
+    """
+    Parses previous.source with `deleted` characters at `offset` replaced by
+    `inserted`, reusing the statements of previous.program the edit can't
+    have changed. previous itself is left as it was.
+    """
+    old = previous.source
+    if offset < 0 or deleted < 0 or offset + deleted > len(old):
+        raise ValueError(f"Edit of {deleted} characters at {offset} is outside the source of {len(old)} characters.")
+    source = old[:offset] + inserted + old[offset + deleted:]
+    # A `//` the edit makes must overlap the characters around the inserted text
+    if previous.comment or "//" in source[max(offset - 1, 0):offset + len(inserted) + 1]:
+        return parse(source)
+
+    starts = previous.program.starts
+    body = previous.program.body
+    shift = len(inserted) - deleted
+    # Statement before the one the edit starts in
+    first = max(bisect_left(starts, offset) - 2, 0)
+    resume = starts[first] if first > 0 else 0
+    # Old statements past the edit, the first of them is never reusable as
+    # the lexer started it without a token before
+    reusable = max(bisect_left(starts, offset + deleted), 1)
+
+    new_starts = []
+    new_body = []
+    reused = len(starts)
+    for start, statement, end in statements(source, resume, BOUNDARY if first > 0 else None):
+        new_starts.append(start)
+        new_body.append(statement)
+        while reusable < len(starts) and starts[reusable] + shift < end:
+            reusable += 1
+        if reusable < len(starts) and starts[reusable] + shift == end:
+            reused = reusable
+            break
+
+    starts = starts[:first] + new_starts + [start + shift for start in starts[reused:]]
+    body = body[:first] + new_body + body[reused:]
+    return ParsedSource(source, Program(0, len(source), body, starts), False)
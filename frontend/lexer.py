@@ -1,5 +1,5 @@
 from enum import Enum
-from re import MULTILINE
+from re import MULTILINE, compile
 
 class TokenType(Enum):
    # Literal Types
@@ -45,6 +45,8 @@ class TokenType(Enum):
     LessThanOrEquals = 37
     GreaterThanOrEquals = 38
     EOF = 39
+    For = 40
+    In = 41
 
 KEYWORDS = {
     "var": TokenType.Var,
@@ -57,13 +59,17 @@ KEYWORDS = {
     "not": TokenType.Not,
     "if": TokenType.If,
     "else": TokenType.Else,
-    "while": TokenType.While
+    "while": TokenType.While,
+    "for": TokenType.For,
+    "in": TokenType.In
 }
 
 class Token:
     def __init__(self, value, token_type):
         self.value = value
         self.type = token_type
+        # Offset of the token in the source, set by iter_tokens
+        self.start = None
         
     def __str__(self):
         return f"{{ value: {self.value}, type_name: {self.type.name}, type: {self.type.value} }}"
@@ -87,149 +93,151 @@ def isfloat(char):
     return char.isdecimal()
 
 def pos(sourceCode):
-    src = list(sourceCode)
-    return len(src)
+    return len(sourceCode)
 
-def tokenize(sourceCode):
-    tokens = []
-    src = list(sourceCode)
-    while len(src) > 0:
-        if src[0] == "(":
-            tokens.append(token(src.pop(0), TokenType.OpenParen))
-        elif src[0] == ")":
-            tokens.append(token(src.pop(0), TokenType.CloseParen))
-        elif src[0] == "{":
-            tokens.append(token(src.pop(0), TokenType.OpenBrace))
-        elif src[0] == "}":
-            tokens.append(token(src.pop(0), TokenType.CloseBrace))
-        elif src[0] == "[":
-            tokens.append(token(src.pop(0), TokenType.OpenBracket))
-        elif src[0] == "]":
-            tokens.append(token(src.pop(0), TokenType.CloseBracket))
-        elif src[0] == "%" or src[0] == "^":
-            tokens.append(token(src.pop(0), TokenType.BinaryOperator))
-        elif src[0] == "=":
+# Characters which always map onto a single token on their own.
+SINGLE_CHAR_TOKENS = {
+    "(": TokenType.OpenParen,
+    ")": TokenType.CloseParen,
+    "{": TokenType.OpenBrace,
+    "}": TokenType.CloseBrace,
+    "[": TokenType.OpenBracket,
+    "]": TokenType.CloseBracket,
+    "%": TokenType.BinaryOperator,
+    "^": TokenType.BinaryOperator,
+    ":": TokenType.Colon,
+    ",": TokenType.Comma,
+    ".": TokenType.Dot,
+}
+
+DOUBLE_CHAR_COMPARISONS = {
+    "!": TokenType.NotEquals,
+    "<": TokenType.LessThanOrEquals,
+    ">": TokenType.GreaterThanOrEquals,
+}
+
+SINGLE_CHAR_COMPARISONS = {
+    "!": TokenType.Not,
+    "<": TokenType.LessThan,
+    ">": TokenType.GreaterThan,
+}
+
+# [^\W_] matches exactly the characters for which str.isalnum() is true.
+IDENTIFIER_TAIL = compile(r"[^\W_]*")
+WHITESPACE = compile(r"[ \n\t\r]*")
+QUOTE = compile(r"[\"']")
+
+# Source that can't be tokenized or parsed, a program or REPL line that raises it is not run
+class ParseError(Exception):
+    pass
+
+def unrecognized(char):
+    raise ParseError(f"Unrecognized character found in source: {ord(char)} {char}")
+
+def iter_tokens(sourceCode, offset=0, prev_type=None):
+    """
+    Lazily yields the tokens of `sourceCode`.
+    The source is walked by index so lexing is linear in the size of the input.
+    Lexing can resume at any token boundary `offset`, given the type of the
+    token before it as `prev_type`, which decides between unary and binary +/-.
+    """
+    src = sourceCode
+    i = offset
+    end = len(src)
+    while i < end:
+        char = src[i]
+        if char in " \n\t\r":
+            i = WHITESPACE.match(src, i, end).end()
+            continue
+        start = i
+
+        token_type = SINGLE_CHAR_TOKENS.get(char)
+        if token_type is not None:
+            tk = Token(char, token_type)
+            i += 1
+        elif isalpha(char) and not isnum(char):
+            j = IDENTIFIER_TAIL.match(src, i + 1, end).end()
+            ident = src[i:j]
+            tk = Token(ident, KEYWORDS.get(ident) or TokenType.Identifier)
+            i = j
+        elif isnum(char):
+            j = i
+            while j < end and (isint(src[j]) or src[j] == "."):
+                j += 1
+            if j == i:
+                unrecognized(char)
+            num = src[i:j]
+            tk = Token(num, TokenType.Float if "." in num else TokenType.Int)
+            i = j
+        elif char == "=":
             # Count the number of consecutive equals signs
-            sign_count = 1
-            idx = 1
-            while idx < len(src) and src[idx] == "=":
-                sign_count += 1
-                idx += 1
-    
-            # Determine the appropriate token type based on the number of equals signs
+            j = i + 1
+            while j < end and src[j] == "=":
+                j += 1
+            sign_count = j - i
             if sign_count == 1:
-                tokens.append(token(src.pop(0), TokenType.Equals))
+                tk = Token("=", TokenType.Equals)
             elif sign_count == 2:
-                tokens.append(token(src.pop(0) + src.pop(0), TokenType.DoubleEquals))
-            else:
-                print("Unrecognized character found in source: ", ord(src[0]), src[0])
-                exit(1)
-        elif src[0] == "!":
-            if src[1] == "=":
-                tokens.append(token(src.pop(0) + src.pop(0), TokenType.NotEquals))
-            elif src[1] != "=":
-                tokens.append(token(src.pop(0), TokenType.Not))
-            else:
-                print("Unrecognized character found in source: ", ord(src[0]), src[0])
-                exit(1)
-        elif src[0] == "<":
-            if src[1] == "=":
-                tokens.append(token(src.pop(0) + src.pop(0), TokenType.LessThanOrEquals))
+                tk = Token("==", TokenType.DoubleEquals)
             else:
-                tokens.append(token(src.pop(0), TokenType.LessThan))
-        elif src[0] == ">":
-            if src[1] == "=":
-                tokens.append(token(src.pop(0) + src.pop(0), TokenType.GreaterThanOrEquals))
+                unrecognized(char)
+            i += sign_count
+        elif char == "!" or char == "<" or char == ">":
+            if i + 1 < end and src[i + 1] == "=":
+                tk = Token(char + "=", DOUBLE_CHAR_COMPARISONS[char])
+                i += 2
             else:
-                tokens.append(token(src.pop(0), TokenType.GreaterThan))
-        elif src[0] == "&":
-            # Count the number of consecutive & signs
-            sign_count = 1
-            idx = 1
-            while idx < len(src) and src[idx] == "&":
-                sign_count += 1
-                idx += 1
-    
-            # Determine the appropriate token type based on the number of equals signs
-            if sign_count == 2:
-                tokens.append(token(src.pop(0) + src.pop(0), TokenType.And))
-            else:
-                print("Unrecognized character found in source: ", ord(src[0]), src[0])
-                exit(1)
-        elif src[0] == "|":
-            # Count the number of consecutive & signs
-            sign_count = 1
-            idx = 1
-            while idx < len(src) and src[idx] == "|":
-                sign_count += 1
-                idx += 1
-    
-            # Determine the appropriate token type based on the number of equals signs
-            if sign_count == 2:
-                tokens.append(token(src.pop(0) + src.pop(0), TokenType.Or))
+                tk = Token(char, SINGLE_CHAR_COMPARISONS[char])
+                i += 1
+        elif char == "&" or char == "|":
+            # Only exactly two consecutive signs form a logical operator
+            j = i + 1
+            while j < end and src[j] == char:
+                j += 1
+            if j - i != 2:
+                unrecognized(char)
+            tk = Token(char + char, TokenType.And if char == "&" else TokenType.Or)
+            i = j
+        elif char == "+" or char == "-":
+            if prev_type is None or prev_type == TokenType.BinaryOperator:
+                tk = Token(char, TokenType.BinaryOperator)
             else:
-                print("Unrecognized character found in source: ", ord(src[0]), src[0])
-                exit(1)
-        elif src[0] == "+":
-            if len(tokens) == 0 or tokens[-1].type == TokenType.BinaryOperator:
-                tokens.append(token(src.pop(0), TokenType.BinaryOperator))
+                tk = Token(char, TokenType.UnaryPlus if char == "+" else TokenType.UnaryMinus)
+            i += 1
+        elif char == "*":
+            if i + 1 < end and src[i + 1] == "/":
+                tk = Token("*/", TokenType.MultiLineCommentEnd)
+                i += 2
             else:
-                tokens.append(token(src.pop(0), TokenType.UnaryPlus))
-        elif src[0] == "-":
-            if len(tokens) == 0 or tokens[-1].type == TokenType.BinaryOperator:
-                tokens.append(token(src.pop(0), TokenType.BinaryOperator))
+                tk = Token("*", TokenType.BinaryOperator)
+                i += 1
+        elif char == "/":
+            if i + 1 < end and src[i + 1] == "/":
+                # The single line comment token swallows the last character of the source
+                end -= 1
+                tk = Token("/" + src[end], TokenType.SingleLineComment)
+                i += 1
+            elif i + 2 < end and src[i + 2] == "*":
+                tk = Token(src[i:i + 2], TokenType.MultiLineCommentStart)
+                i += 2
             else:
-                tokens.append(token(src.pop(0), TokenType.UnaryMinus))
-        elif src[0] == "*":
-            if src[1] == "/":
-                tokens.append(token(src.pop(0)+src.pop(0), TokenType.MultiLineCommentEnd))
-        elif src[0] == "/":
-            if src[1] == "/":
-                tokens.append(token(src.pop(0)+src.pop(), TokenType.SingleLineComment))
-            elif src[2] == "*":
-                tokens.append(token(src.pop(0)+src.pop(0), TokenType.MultiLineCommentStart))
-            else:
-                tokens.append(token(src.pop(0), TokenType.SingleLineComment))
-        elif src[0] == ":":
-            tokens.append(token(src.pop(0), TokenType.Colon))
-        elif src[0] == ",":
-            tokens.append(token(src.pop(0), TokenType.Comma))
-        elif src[0] == ".":
-            tokens.append(token(src.pop(0), TokenType.Dot))
-        elif src[0] == '"' or src[0] == "'":
-            quote = src.pop(0)
-            string_content = ""
-            while len(src) > 0 and src[0] != '"' and src[0] != "'":
-                string_content += src.pop(0)
-                
-            if len(src) == 0 or src[0] != quote:
-                print("Error: Unterminated string literal")
-                exit(1)
-            src.pop(0)  # Discard the closing quote
-            tokens.append(token(string_content, TokenType.String))
-        elif isnum(src[0]):
-            num = ""
-            while len(src) > 0 and (isint(src[0]) or src[0] == '.'):
-                num += src.pop(0)
-            if "." in num:
-                tokens.append(token(num, TokenType.Float))
-            else:
-                tokens.append(token(num, TokenType.Int))
-        elif isalpha(src[0]):
-            ident = ""
-            while len(src) > 0 and src[0].isalnum():
-                ident += src.pop(0)
-            reserved = KEYWORDS.get(ident)
-
-            if reserved:
-                tokens.append(token(ident, reserved))
-            else:
-                tokens.append(token(ident, TokenType.Identifier))
-        elif isskippable(src[0]):
-            src.pop(0)
+                tk = Token("/", TokenType.SingleLineComment)
+                i += 1
+        elif char == '"' or char == "'":
+            match = QUOTE.search(src, i + 1, end)
+            if match is None or match.group() != char:
+                raise ParseError("Unterminated string literal")
+            tk = Token(src[i + 1:match.start()], TokenType.String)
+            i = match.end()
         else:
-            print("Unrecognized character found in source: ", ord(src[0]), src[0])
-            exit(1)
-    tokens.append(token('EndOfFile', TokenType.EOF))
-    return tokens
+            unrecognized(char)
 
+        prev_type = tk.type
+        tk.start = start
+        yield tk
+    tk = Token('EndOfFile', TokenType.EOF)
+    tk.start = end
+    yield tk
+
+def tokenize(sourceCode):
+    return list(iter_tokens(sourceCode))
@@ -0,0 +1,423 @@
+from frontend.ast import ArrayExpression, AssignmentExpression, BinaryExpression, BlockStatement, BooleanLiteral, CallExpression, Expr, ExpressionStatement, ForStatement, FunctionDeclaration, LogicalExpression, MemberExpression, NullLiteral, ObjectExpression, Stmt, Program, UnaryExpression, VariableDeclaration, NumericLiteral, Identifier, StringLiteral, IfStatement, WhileStatement, RangeExpression
+from frontend.resolver import Scope, resolve
+from typing import Collection, List, Optional
+import operator
+
+"""
+AST optimizer.
+An optional pass between Parser.produceAST and evaluation, enabled with -O.
+It folds operations on literals, drops the branches of if and while statements
+whose condition is a literal, simplifies arithmetic identities such as `x * 1`
+and marks object literals made only of constants so engines build them once.
+Every rewrite keeps the behaviour of the program, runtime errors included, so
+`1 / 0` or `-"text"` are left for the engine to fail on.
+"""
+LITERALS = (NumericLiteral, StringLiteral, NullLiteral, BooleanLiteral)
+
+ARITHMETIC_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": operator.mod,
+    "^": operator.pow,
+}
+
+COMPARISON_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Numeric kinds of expressions, "int" values are always ints and "number" values any number
+INT = "int"
+NUMBER = "number"
+
+def join(first: Optional[str], second: Optional[str]) -> Optional[str]:
+    if first is None or second is None:
+        return None
+    return INT if first == INT and second == INT else NUMBER
+
+def runtime_key(literal: Expr):
+    # Literals compare like the RuntimeVals they evaluate to, so 1 and 1.0 stay apart
+    if literal.__class__ is NumericLiteral:
+        return ("number", literal.value, literal.value.__class__)
+    return (literal.type, literal.value)
+
+def count_nodes(node) -> int:
+    if isinstance(node, Stmt):
+        return 1 + sum(count_nodes(getattr(node, field)) for field in node.fields())
+    if isinstance(node, list):
+        return sum(count_nodes(item) for item in node)
+    return 0
+
+class Report:
+    def __init__(self):
+        self.nodes_before = 0
+        self.nodes_after = 0
+        self.folded = 0
+        self.branches = 0
+        self.identities = 0
+        self.objects = 0
+
+    def __str__(self):
+        return (f"Optimizer removed {self.nodes_before - self.nodes_after} of {self.nodes_before} nodes: "
+                f"{self.folded} folded, {self.branches} dead branches, "
+                f"{self.identities} identities, {self.objects} constant objects")
+
+class Optimizer:
+    def __init__(self, globals: Collection[str] = ()):
+        self.globals = globals
+        self.report = Report()
+        self.scope = None
+        # (scope, slot) -> numeric kind of the variables that only ever hold numbers
+        self.kinds = {}
+
+    # NUMERIC KINDS
+
+    def binding(self, ident, scope: Scope):
+        if ident.depth is None:
+            return None
+        return scope.at(ident.depth), ident.slot
+
+    def kind(self, expr: Optional[Stmt], scope: Scope) -> Optional[str]:
+        cls = expr.__class__
+        if cls is NumericLiteral:
+            return INT if expr.value.__class__ is int else NUMBER
+        if cls is Identifier:
+            return self.kinds.get(self.binding(expr, scope))
+        if cls is UnaryExpression and expr.operator in ("+", "-"):
+            # Negating anything but a number fails, so a result is always a number
+            return self.kind(expr.argument, scope) or NUMBER
+        if cls is BinaryExpression and expr.operator in ARITHMETIC_OPERATORS:
+            kind = join(self.kind(expr.left, scope), self.kind(expr.right, scope))
+            return kind if expr.operator in ("+", "-", "*", "%") else kind and NUMBER
+        if cls is AssignmentExpression:
+            return self.kind(expr.right, scope)
+        return None
+
+    def collect(self, node, scope: Scope, values: dict):
+        """
+        Records every value given to each variable: declaration initialisers
+        and assigned expressions. Parameters, functions and the variables of
+        for loops over values get None, those of range loops an int.
+        """
+        if isinstance(node, list):
+            for item in node:
+                self.collect(item, scope, values)
+            return
+        if not isinstance(node, Stmt):
+            return
+
+        cls = node.__class__
+        if cls is VariableDeclaration:
+            for declarator in node.declarations:
+                self.collect(declarator.init, scope, values)
+                values.setdefault(self.binding(declarator.id, scope), []).append((declarator.init, scope))
+            return
+        if cls is FunctionDeclaration:
+            values.setdefault(self.binding(node.id, scope), []).append((None, scope))
+            for param in node.params:
+                values.setdefault((node.scope, param.slot), []).append((None, node.scope))
+            self.collect(node.body, node.scope, values)
+            return
+        if cls is ForStatement:
+            value = NumericLiteral(0) if node.iterable.__class__ is RangeExpression else None
+            values.setdefault(self.binding(node.variable, scope), []).append((value, scope))
+            self.collect(node.iterable, scope, values)
+            self.collect(node.body, scope, values)
+            return
+        if cls is AssignmentExpression:
+            self.collect(node.right, scope, values)
+            values.setdefault(self.binding(node.left, scope), []).append((node.right, scope))
+            return
+        for field in node.fields():
+            self.collect(getattr(node, field), scope, values)
+
+    def infer_kinds(self, program: Program):
+        values = {}
+        self.collect(program.body, program.scope, values)
+        values.pop(None, None)
+
+        # A read before the declaration runs falls back to an outer variable of the
+        # same name, only variables no outer scope or global shares a name with qualify
+        for scope, slot in list(values):
+            name = scope.names[slot]
+            if name in self.globals or (scope.parent is not None and scope.parent.lookup(name)[0] is not None):
+                del values[(scope, slot)]
+
+        # Start with every variable holding ints and widen until nothing changes
+        self.kinds = {binding: INT for binding in values}
+        changed = True
+        while changed:
+            changed = False
+            for binding, assigned in values.items():
+                kind = self.kinds.get(binding)
+                if kind is None:
+                    continue
+                for value, scope in assigned:
+                    kind = join(kind, self.kind(value, scope))
+                if kind != self.kinds[binding]:
+                    changed = True
+                    if kind is None:
+                        del self.kinds[binding]
+                    else:
+                        self.kinds[binding] = kind
+
+    # STATEMENTS
+
+    def optimize_program(self, program: Program) -> Report:
+        self.report.nodes_before = count_nodes(program)
+        resolve(program, self.globals)
+        self.infer_kinds(program)
+        self.scope = program.scope
+        if program.starts is None:
+            program.body = self.optimize_body(program.body, True)
+        else:
+            # Statements a top-level statement folds into start where it started
+            body = []
+            starts = []
+            last = len(program.body) - 1
+            for i, (statement, start) in enumerate(zip(program.body, program.starts)):
+                statements = self.optimize_stmt(statement, i == last)
+                body.extend(statements)
+                starts.extend([start] * len(statements))
+            program.body = body
+            program.starts = starts
+        self.report.nodes_after = count_nodes(program)
+        return self.report
+
+    def optimize_body(self, body: List[Stmt], keep_value: bool) -> List[Stmt]:
+        """
+        Optimizes a list of statements. With `keep_value` the value of the last
+        statement is the value of the body, so it must stay a statement of the
+        same kind.
+        """
+        optimized = []
+        last = len(body) - 1
+        for i, statement in enumerate(body):
+            optimized.extend(self.optimize_stmt(statement, keep_value and i == last))
+        return optimized
+
+    def optimize_stmt(self, stmt: Stmt, keep_value: bool) -> List[Stmt]:
+        cls = stmt.__class__
+        if cls is ExpressionStatement:
+            stmt.expression = self.optimize_expr(stmt.expression)
+            return [stmt]
+        if cls is VariableDeclaration:
+            for declarator in stmt.declarations:
+                declarator.init = self.optimize_expr(declarator.init)
+            return [stmt]
+        if cls is FunctionDeclaration:
+            parent, self.scope = self.scope, stmt.scope
+            stmt.body.body = self.optimize_body(stmt.body.body, True)
+            self.scope = parent
+            return [stmt]
+        if cls is IfStatement:
+            return self.optimize_if_stmt(stmt, keep_value)
+        if cls is WhileStatement:
+            return self.optimize_while_loop(stmt, keep_value)
+        if cls is ForStatement:
+            return self.optimize_for_loop(stmt)
+        if cls is BlockStatement:
+            stmt.body = self.optimize_body(stmt.body, False)
+            return [stmt]
+        # Expressions can appear directly where statements are expected
+        return [self.optimize_expr(stmt)]
+
+    def optimize_branch(self, branch: Optional[Stmt]) -> Optional[Stmt]:
+        if branch is None:
+            return None
+        if branch.__class__ is BlockStatement:
+            branch.body = self.optimize_body(branch.body, False)
+            return branch
+        # An else if chain may fold away, or into several statements
+        statements = self.optimize_stmt(branch, False)
+        if len(statements) == 1:
+            return statements[0]
+        return BlockStatement(statements) if statements else None
+
+    def optimize_if_stmt(self, stmt: IfStatement, keep_value: bool) -> List[Stmt]:
+        stmt.condition = self.optimize_expr(stmt.condition)
+        if stmt.condition.__class__ not in LITERALS:
+            stmt.consequent = self.optimize_branch(stmt.consequent)
+            stmt.alternate = self.optimize_branch(stmt.alternate)
+            return [stmt]
+
+        self.report.branches += 1
+        taken = self.optimize_branch(stmt.consequent if stmt.condition.value else stmt.alternate)
+        if keep_value:
+            # An if statement evaluates to nothing, unlike the block it would leave behind
+            if taken is None:
+                return [IfStatement(BooleanLiteral(False), BlockStatement([]), None)]
+            return [IfStatement(BooleanLiteral(True), taken, None)]
+        if taken is None:
+            return []
+        # Blocks share the scope around them, so the statements can take their place
+        return taken.body if taken.__class__ is BlockStatement else [taken]
+
+    def optimize_while_loop(self, stmt: WhileStatement, keep_value: bool) -> List[Stmt]:
+        stmt.condition = self.optimize_expr(stmt.condition)
+        if stmt.condition.__class__ in LITERALS and not stmt.condition.value:
+            self.report.branches += 1
+            return [WhileStatement(BooleanLiteral(False), BlockStatement([]))] if keep_value else []
+        stmt.body = self.optimize_branch(stmt.body)
+        return [stmt]
+
+    def optimize_for_loop(self, stmt: ForStatement) -> List[Stmt]:
+        # Evaluating the iterable may fail or call functions, so even a loop with an empty body stays
+        stmt.iterable = self.optimize_expr(stmt.iterable)
+        stmt.body = self.optimize_branch(stmt.body)
+        return [stmt]
+
+    # EXPRESSIONS
+
+    def optimize_expr(self, expr: Optional[Stmt]) -> Optional[Stmt]:
+        if expr is None:
+            return None
+        optimizer = EXPRESSION_OPTIMIZERS.get(expr.__class__)
+        if optimizer is None:
+            return expr
+        return optimizer(self, expr)
+
+    def fold(self, literal: Expr) -> Expr:
+        self.report.folded += 1
+        return literal
+
+    def optimize_binary_expr(self, binop: BinaryExpression) -> Expr:
+        left = binop.left = self.optimize_expr(binop.left)
+        right = binop.right = self.optimize_expr(binop.right)
+        op = binop.operator
+
+        if left.__class__ in LITERALS and right.__class__ in LITERALS:
+            if left.__class__ is not NumericLiteral or right.__class__ is not NumericLiteral:
+                # Binary operations on anything but two numbers are null
+                return self.fold(NullLiteral())
+            try:
+                if op in COMPARISON_OPERATORS:
+                    return self.fold(BooleanLiteral(COMPARISON_OPERATORS[op](left.value, right.value)))
+                if op == "/" and right.value == 0:
+                    return binop
+                if op == "^" and right.value.__class__ is int and right.value > 1024:
+                    # Huge powers are left to runtime, they may never be evaluated
+                    return binop
+                return self.fold(NumericLiteral(ARITHMETIC_OPERATORS[op](left.value, right.value)))
+            except (ArithmeticError, TypeError):
+                # Overflows, modulo by zero and comparing complex numbers fail at runtime
+                return binop
+
+        simplified = self.simplify(binop)
+        if simplified is not binop:
+            self.report.identities += 1
+        return simplified
+
+    def simplify(self, binop: BinaryExpression) -> Expr:
+        """
+        Drops an operand that leaves a number unchanged: `x * 1`, `x - 0`,
+        `x ^ 1`, and `x + 0` for ints only, since -0.0 + 0 is 0.0. The other
+        operand has to be known to be a number, on anything else the
+        operation evaluates to null.
+        """
+        left, right, op = binop.left, binop.right, binop.operator
+
+        def is_int(node, value):
+            return node.__class__ is NumericLiteral and node.value.__class__ is int and node.value == value
+
+        if op == "*":
+            if is_int(right, 1) and self.kind(left, self.scope):
+                return left
+            if is_int(left, 1) and self.kind(right, self.scope):
+                return right
+        elif op == "+":
+            if is_int(right, 0) and self.kind(left, self.scope) == INT:
+                return left
+            if is_int(left, 0) and self.kind(right, self.scope) == INT:
+                return right
+        elif op == "-":
+            if is_int(right, 0) and self.kind(left, self.scope):
+                return left
+        elif op == "^":
+            if is_int(right, 1) and self.kind(left, self.scope):
+                return left
+        return binop
+
+    def optimize_logical_expr(self, expr: LogicalExpression) -> Expr:
+        left = expr.left = self.optimize_expr(expr.left)
+        right = expr.right = self.optimize_expr(expr.right)
+        # Both sides are always evaluated, so only two literals can be folded
+        if left.__class__ not in LITERALS or right.__class__ not in LITERALS:
+            return expr
+        if expr.operator in {"and", "&&"}:
+            return self.fold(left if runtime_key(left) == runtime_key(right) else BooleanLiteral(False))
+        if expr.operator in {"or", "||"}:
+            return self.fold(BooleanLiteral(True) if left.value else right)
+        return expr
+
+    def optimize_unary_expr(self, expr: UnaryExpression) -> Expr:
+        argument = expr.argument = self.optimize_expr(expr.argument)
+        if argument.__class__ is NumericLiteral and expr.operator == "-":
+            return self.fold(NumericLiteral(-argument.value))
+        if argument.__class__ is NumericLiteral and expr.operator == "+":
+            return self.fold(NumericLiteral(+argument.value))
+        if argument.__class__ is BooleanLiteral and expr.operator in {"not", "!"}:
+            return self.fold(BooleanLiteral(not argument.value))
+        return expr
+
+    def optimize_assignment(self, node: AssignmentExpression) -> Expr:
+        node.right = self.optimize_expr(node.right)
+        return node
+
+    def optimize_object_expr(self, obj: ObjectExpression) -> Expr:
+        constant = True
+        for prop in obj.properties:
+            prop.value = self.optimize_expr(prop.value)
+            # A property without a value reads the variable of the same name
+            if prop.value is None or not (prop.value.__class__ in LITERALS or (prop.value.__class__ is ObjectExpression and prop.value.constant)):
+                constant = False
+        if constant and not obj.constant:
+            obj.constant = True
+            self.report.objects += 1
+        return obj
+
+    def optimize_array_expr(self, array: ArrayExpression) -> Expr:
+        array.elements = [self.optimize_expr(element) for element in array.elements]
+        return array
+
+    def optimize_member_expr(self, expr: MemberExpression) -> Expr:
+        expr.object = self.optimize_expr(expr.object)
+        if expr.computed:
+            expr.property = self.optimize_expr(expr.property)
+        return expr
+
+    def optimize_range_expr(self, expr: RangeExpression) -> Expr:
+        expr.start = self.optimize_expr(expr.start)
+        expr.stop = self.optimize_expr(expr.stop)
+        expr.step = self.optimize_expr(expr.step)
+        return expr
+
+    def optimize_call_expr(self, expr: CallExpression) -> Expr:
+        expr.arguments = [self.optimize_expr(arg) for arg in expr.arguments]
+        expr.callee = self.optimize_expr(expr.callee)
+        return expr
+
+EXPRESSION_OPTIMIZERS = {
+    BinaryExpression: Optimizer.optimize_binary_expr,
+    LogicalExpression: Optimizer.optimize_logical_expr,
+    UnaryExpression: Optimizer.optimize_unary_expr,
+    AssignmentExpression: Optimizer.optimize_assignment,
+    ObjectExpression: Optimizer.optimize_object_expr,
+    ArrayExpression: Optimizer.optimize_array_expr,
+    MemberExpression: Optimizer.optimize_member_expr,
+    CallExpression: Optimizer.optimize_call_expr,
+    RangeExpression: Optimizer.optimize_range_expr,
+}
+
+def optimize(program: Program, globals: Collection[str] = ()) -> Report:
+    """
+    Optimizes a Program in place. `globals` are the names the Environment it
+    will run in already defines.
+    """
+    return Optimizer(globals).optimize_program(program)
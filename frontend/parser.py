@@ -1,27 +1,55 @@
-from frontend.ast import AssignmentExpression, BinaryExpression, BlockStatement, CallExpression, Expr, FunctionDeclaration, Identifier, IfStatement, LogicalExpression, MemberExpression, NullLiteral, NumericLiteral, ObjectExpression, Program, Property, Stmt, UnaryExpression, VariableDeclaration, StringLiteral, WhileStatement
-from frontend.lexer import TokenType, tokenize, pos
+from frontend.ast import ArrayExpression, AssignmentExpression, BinaryExpression, BlockStatement, CallExpression, Expr, ExpressionStatement, ForStatement, FunctionDeclaration, Identifier, IfStatement, LogicalExpression, MemberExpression, NullLiteral, NumericLiteral, ObjectExpression, Program, Property, RangeExpression, Stmt, UnaryExpression, VariableDeclaration, VariableDeclarator, StringLiteral, WhileStatement
+from frontend.lexer import KEYWORDS, ParseError, TokenType, iter_tokens, pos
+from collections import deque
 from typing import List, Self
 import json
 
+# Maximum number of tokens the parser may look ahead of the current one.
+MAX_LOOKAHEAD = 4
+
 class Parser:
     def __init__(self):
-        self.tokens = []
+        # Lazy token stream, the parser only ever holds the current token
+        # plus at most MAX_LOOKAHEAD buffered tokens of it.
+        self.tokens = iter(())
+        self.current = None
+        self.lookahead = deque()
+        # Offset of the program statement being parsed
+        self.statement_start = 0
+
+    def reset(self, tokens):
+        self.tokens = iter(tokens)
+        self.lookahead.clear()
+        self.current = next(self.tokens)
 
     def not_eof(self):
-        return self.tokens[0].type != TokenType.EOF
+        return self.current.type != TokenType.EOF
 
     def at(self):
-        return self.tokens[0]
+        return self.current
+
+    def peek(self, offset: int = 1):
+        if offset == 0:
+            return self.current
+        if offset > MAX_LOOKAHEAD:
+            raise ValueError(f"Cannot look {offset} tokens ahead, the limit is {MAX_LOOKAHEAD}.")
+        while len(self.lookahead) < offset:
+            # Past the end of the stream keep repeating the EOF token
+            self.lookahead.append(next(self.tokens, self.lookahead[-1] if self.lookahead else self.current))
+        return self.lookahead[offset - 1]
 
     def eat(self):
-        prev = self.tokens.pop(0)
+        prev = self.current
+        if self.lookahead:
+            self.current = self.lookahead.popleft()
+        else:
+            self.current = next(self.tokens, prev)
         return prev
 
     def expect(self, token_type: TokenType, err):
         prev = self.eat()
         if not prev or prev.type != token_type:
-            print("Parser Error:\n", err, prev, " - Expecting: ", token_type)
-            exit(0) 
+            raise ParseError(f"{err} {prev} - Expecting: {token_type}")
         return prev
 
     # def eat_comment(self):
@@ -37,13 +65,16 @@ class Parser:
     #         raise Exception("Unterminated multi-line comment")
 
     def produceAST(self, sourceCode) -> Program:
-        self.tokens = tokenize(sourceCode)
+        self.reset(iter_tokens(sourceCode))
         self.length = pos(sourceCode)
         body = []
+        starts = []
         while self.not_eof():
+            self.statement_start = self.current.start
+            starts.append(self.statement_start)
             body.append(self.parse_stmt())
             
-        program = Program(0, self.length, body).__dict__
+        program = Program(0, self.length, body, starts)
         
         # with open("parser_output.json", "w") as f:
         #     json.dump(program, f, indent=4)
@@ -58,26 +89,53 @@ class Parser:
             statements = self.parse_if_stmt()
         elif self.at().type == TokenType.While:
             statements = self.parse_while_loop()
+        elif self.at().type == TokenType.For:
+            statements = self.parse_for_loop()
         elif self.at().type in {TokenType.Declare, TokenType.Const, TokenType.Var}:
             statements = self.parse_var_declaration()
         elif self.at().type == TokenType.Def:
             return self.parse_fn_declaration()
+        elif self.at_memo():
+            return self.parse_memo_declaration()
         else:
             statements = self.parse_expr_statement()
         return statements
 
-    def parse_fn_declaration(self) -> Stmt:
+    def at_memo(self) -> bool:
+        # `memo` is only a modifier right before `def` or `(size) def`, elsewhere it is a name
+        if self.at().type != TokenType.Identifier or self.at().value != "memo":
+            return False
+        if self.peek().type == TokenType.Def:
+            return True
+        return (self.peek().type == TokenType.OpenParen and self.peek(2).type == TokenType.Int
+                and self.peek(3).type == TokenType.CloseParen and self.peek(4).type == TokenType.Def)
+
+    def parse_memo_declaration(self) -> Stmt:
         self.eat()
-        identifier = str(self.expect(
+        size = None
+        if self.at().type == TokenType.OpenParen:
+            self.eat()
+            size = int(self.expect(TokenType.Int, "Expected the number of results to cache following 'memo('").value)
+            self.expect(TokenType.CloseParen, "Missing closing parenthesis following the memo cache size")
+        if self.at().type != TokenType.Def:
+            self.expect(TokenType.Def, "Expected 'def' following 'memo'")
+        fn = self.parse_fn_declaration()
+        fn.memoized = True
+        fn.memo_size = size
+        return fn
+
+    def parse_fn_declaration(self) -> Stmt:
+        start = self.eat().start - self.statement_start
+        identifier = self.expect(
                 TokenType.Identifier,
                 "Expected identifier name following declare | var| const keywords."
-        ))
+        ).value
         
         args = self.parse_args()
         params = []
 
         for arg in args:
-            if arg["type"] != "Identifier":
+            if arg.type != "Identifier":
                     raise Exception("Expected")
             params.append(arg)
             
@@ -86,11 +144,7 @@ class Parser:
         body = self.parse_block()
         
         self.expect(TokenType.CloseBrace, "Missing Closing Brace inside function declaration")
-        ident = {
-                "type": identifier.split(":")[2].strip().split(",")[0],
-                "name": identifier.split(":")[1].strip().split(",")[0]
-        }
-        fn = FunctionDeclaration(ident, params, body).dict()
+        fn = FunctionDeclaration(Identifier(identifier), params, body, start)
         return fn
 
     def parse_var_declaration(self) -> Stmt:
@@ -124,10 +178,10 @@ class Parser:
 
         while True:
 
-            identifier = str(self.expect(
+            identifier = self.expect(
                 TokenType.Identifier,
                 "Expected identifier name following declare | var| const keywords."
-            ))
+            ).value
             
             if self.at().type == TokenType.Equals:
                 self.eat()
@@ -142,23 +196,14 @@ class Parser:
                 else:
                     value = None
             
-            declarations.append(
-                {
-                    "type": "VariableDeclarator",
-                    "id": {
-                         "type": identifier.split(":")[2].strip().split(",")[0],
-                         "name": identifier.split(":")[1].strip().split(",")[0]
-                    },
-                    "init": value
-                }  
-            )
+            declarations.append(VariableDeclarator(Identifier(identifier), value))
             
             if self.at().type == TokenType.Comma:
                 self.eat()
             else:
                 break
 
-        declaration = VariableDeclaration(declarations, key, is_constant).__dict__
+        declaration = VariableDeclaration(declarations, key, is_constant)
         
         return declaration
     
@@ -172,13 +217,13 @@ class Parser:
         if self.at().type == TokenType.Else:
             self.eat()  # Consume the 'else' token
             if self.at().type == TokenType.If:
-                alternate = self.parse_if_else_stmt()  # Nested if-else
+                alternate = self.parse_if_stmt()  # Nested if-else
             else:
                 self.expect(TokenType.OpenBrace, "Expected '{' after 'else'")
                 alternate = self.parse_block()
                 self.expect(TokenType.CloseBrace, "Expected '}' after closing 'else' statement")
                 
-        st = IfStatement(condition, consequent, alternate).__dict__
+        st = IfStatement(condition, consequent, alternate)
         return st
 
     def parse_while_loop(self) -> Stmt:
@@ -187,12 +232,34 @@ class Parser:
         self.expect(TokenType.OpenBrace, "Expected '{' after 'while' condition")
         body = self.parse_block()
         self.expect(TokenType.CloseBrace, "Expected '}' after closing 'while' statement")
-        st = WhileStatement(condition, body).__dict__
+        st = WhileStatement(condition, body)
         return st
+
+    def parse_for_loop(self) -> Stmt:
+        self.eat()
+        variable = self.expect(TokenType.Identifier, "Expected loop variable following 'for'").value
+        self.expect(TokenType.In, "Expected 'in' following the loop variable")
+        # `range(...)` right after `in` is part of the loop, not a call
+        if self.at().type == TokenType.Identifier and self.at().value == "range" and self.peek().type == TokenType.OpenParen:
+            self.eat()
+            args = self.parse_args()
+            if not 1 <= len(args) <= 3:
+                raise Exception(f"range takes 1 to 3 arguments, {len(args)} given.")
+            if len(args) == 1:
+                args.insert(0, NumericLiteral(0))
+            if len(args) == 2:
+                args.append(NumericLiteral(1))
+            iterable = RangeExpression(*args)
+        else:
+            iterable = self.parse_expr()
+        self.expect(TokenType.OpenBrace, "Expected '{' after 'for' head")
+        body = self.parse_block()
+        self.expect(TokenType.CloseBrace, "Expected '}' after closing 'for' statement")
+        return ForStatement(Identifier(variable), iterable, body)
         
     def parse_expr_statement(self) -> Stmt:
         expression = self.parse_assignment_expr()
-        expr_stmt = Expr(expression).__dict__
+        expr_stmt = ExpressionStatement(expression)
         return expr_stmt
         
     def parse_block(self):
@@ -200,7 +267,7 @@ class Parser:
         while self.not_eof() and self.at().type != TokenType.CloseBrace:
            body.append(self.parse_stmt()) # Assign statement to index key
         # self.expect(TokenType.CloseBrace, "Expected '}' after block")
-        statements = BlockStatement(body).__dict__   
+        statements = BlockStatement(body)   
         return statements
 
     def parse_expr(self) -> Expr:
@@ -213,7 +280,7 @@ class Parser:
         if self.at().type == TokenType.Equals:
             self.eat();
             value = self.parse_assignment_expr()
-            left = AssignmentExpression(left, value).__dict__
+            left = AssignmentExpression(left, value)
         
         return left
     
@@ -225,50 +292,48 @@ class Parser:
         properties = []
 
         while self.not_eof() and self.at().type != TokenType.CloseBrace:
+            token = self.at()
+            if KEYWORDS.get(token.value) == token.type:
+                # Keywords name properties too, such as `{ in: 1 }`, but always with a value
+                key = self.eat().value
+                self.expect(TokenType.Colon, "Missing colon following keyword in ObjectExpr")
+                properties.append(Property(key, self.parse_expr()))
+                if self.at().type != TokenType.CloseBrace:
+                    self.expect(TokenType.Comma, "Expected comma or closing bracket following property")
+                continue
             key = self.expect(TokenType.Identifier, "Object literal key expected").value
 
             if self.at().type == TokenType.Comma:
                 self.eat()
-                properties.append(Property(key).__dict__)
+                properties.append(Property(key))
                 continue
             elif self.at().type == TokenType.CloseBrace:
-                properties.append(Property(key, value).__dict__)
+                properties.append(Property(key, value))
                 continue
 
             self.expect(TokenType.Colon, "Missing colon following identifier in ObjectExpr")
             value = self.parse_expr()
 
-            properties.append(Property(key, value).__dict__)
+            properties.append(Property(key, value))
             if self.at().type != TokenType.CloseBrace:
                 self.expect(TokenType.Comma, "Expected comma or closing bracket following property")
 
         self.expect(TokenType.CloseBrace, "Object literal missing closing brace.")
         
-        expr = ObjectExpression(properties).__dict__
+        expr = ObjectExpression(properties)
         return expr
 
-    # def parse_array_expr(self):
-    #     if self.at().type != TokenType.OpenBracket:
-    #         return self.parse_logical_expr()
-        
-    #     self.eat()
-    #     elements = []
-        
-    #     while self.not_eof and self.at().type != TokenType.CloseBracket:
-    #         while self.at().type != TokenType.Comma and self.at().type != TokenType.CloseBracket and self.at().type != TokenType.EOF:
-    #             elements.append(self.parse_expr())
-    #         self.eat()
-    #         if self.at().type == TokenType.Comma:
-    #             self.eat()
-                
-    #     self.expect(TokenType.CloseBracket, "Expected ']' at the end of array expression")
-        
-    #     return {
-    #         "type": "ArrayExpression",
-    #         "elements": elements
-    #     }
-            
-            
+    def parse_array_expr(self) -> Expr:
+        self.expect(TokenType.OpenBracket, "Expected '[' at the start of array expression")
+        elements = []
+
+        while self.not_eof() and self.at().type != TokenType.CloseBracket:
+            elements.append(self.parse_assignment_expr())
+            if self.at().type != TokenType.CloseBracket:
+                self.expect(TokenType.Comma, "Expected comma or closing bracket following array element")
+
+        self.expect(TokenType.CloseBracket, "Expected ']' at the end of array expression")
+        return ArrayExpression(elements)
 
 
     def parse_logical_expr(self) -> Expr:
@@ -276,14 +341,14 @@ class Parser:
         while self.at().type in {TokenType.And, TokenType.Or}:
             operator = self.eat().value
             right = self.parse_unary_expr()
-            left = LogicalExpression(left, operator, right).__dict__
+            left = LogicalExpression(left, operator, right)
         return left
 
     def parse_unary_expr(self) -> Expr:
         if self.at().type in {TokenType.Not, TokenType.UnaryPlus, TokenType.UnaryMinus}:
             operator = self.eat().value
             operand = self.parse_comparison_expr()
-            expr = UnaryExpression(operator, operand).__dict__
+            expr = UnaryExpression(operator, operand)
             return expr
         else:
             return self.parse_comparison_expr()
@@ -300,7 +365,7 @@ class Parser:
         }:
             operator = self.eat().value
             right = self.parse_additive_expr()
-            left = BinaryExpression(left, operator, right).__dict__
+            left = BinaryExpression(left, operator, right)
         return left 
 
     def parse_additive_expr(self) -> Expr:
@@ -308,7 +373,7 @@ class Parser:
         while self.at().value == "+" or self.at().value == "-":
             operator = self.eat().value
             right = self.parse_multiplicative_expr()
-            left = BinaryExpression(left, operator, right).__dict__
+            left = BinaryExpression(left, operator, right)
         return left
 
     def parse_multiplicative_expr(self) -> Expr:
@@ -316,7 +381,7 @@ class Parser:
         while self.at().value in ["/", "*", "%"]:
             operator = self.eat().value
             right = self.parse_power_expr()
-            left = BinaryExpression(left, operator, right).__dict__
+            left = BinaryExpression(left, operator, right)
         return left
     
     def parse_power_expr(self) -> Expr:
@@ -324,7 +389,7 @@ class Parser:
         while self.at().value in "^":
             operator = self.eat().value
             right = self.parse_call_member_expr()
-            left = BinaryExpression(left, operator, right).__dict__
+            left = BinaryExpression(left, operator, right)
         return left
 
     def parse_call_member_expr(self) -> Expr:
@@ -337,7 +402,7 @@ class Parser:
         
     def parse_call_expr(self, callee: Expr) -> Expr:
         args = self.parse_args()
-        call_expr = CallExpression(callee, args). __dict__
+        call_expr = CallExpression(callee, args)
         if self.at().type == TokenType.OpenParen:
             call_expr = self.parse_call_expr(call_expr)
             
@@ -372,17 +437,21 @@ class Parser:
             # Non-computed aka obj.expr
             if operator.type == TokenType.Dot:
                 computed = False   
-                member_property = self.parse_primary_expr()
+                if self.at().value in KEYWORDS:
+                    # Keywords name properties after a dot, such as `con.in`
+                    member_property = Identifier(self.eat().value)
+                else:
+                    member_property = self.parse_primary_expr()
                     
 
-                if member_property["type"] != "Identifier":
+                if member_property.type != "Identifier":
                     raise Exception("Cannot use dot operator without right hand side being a identifier")
             else:
                 computed = True
                 member_property = self.parse_expr()
                 self.expect(TokenType.CloseBracket, "Missing closing bracket in computed value.")
             
-            member_object = MemberExpression(member_object, member_property, computed).__dict__
+            member_object = MemberExpression(member_object, member_property, computed)
             
         return member_object
                 
@@ -403,16 +472,18 @@ class Parser:
     def parse_primary_expr(self) -> Expr:
         tk = self.at().type
         if tk == TokenType.Identifier:
-            return Identifier(self.eat().value).__dict__
+            return Identifier(self.eat().value)
         elif tk == TokenType.String:
-            return StringLiteral(self.eat().value).__dict__
+            return StringLiteral(self.eat().value)
         elif tk == TokenType.Null:
             self.eat()
-            return NullLiteral().__dict__
+            return NullLiteral()
         elif tk == TokenType.Int:
-            return NumericLiteral(int(self.eat().value)).__dict__
+            return NumericLiteral(int(self.eat().value))
         elif tk == TokenType.Float:
-            return NumericLiteral(float(self.eat().value)).__dict__
+            return NumericLiteral(float(self.eat().value))
+        elif tk == TokenType.OpenBracket:
+            return self.parse_array_expr()
         elif tk == TokenType.OpenParen:
             self.eat()  # eat the opening paren
             value = self.parse_expr()
@@ -421,7 +492,6 @@ class Parser:
         # elif tk == TokenType.CloseParen:
         #     pass
         else:
-            print("Unexpected token found during parsing!", self.at())
-            exit(1)
+            raise ParseError(f"Unexpected token found during parsing! {self.at()}")
 
 
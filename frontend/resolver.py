@@ -0,0 +1,236 @@
+from frontend.ast import ArrayExpression, AssignmentExpression, BinaryExpression, BlockStatement, BooleanLiteral, CallExpression, ExpressionStatement, ForStatement, FunctionDeclaration, LogicalExpression, MemberExpression, NullLiteral, ObjectExpression, Stmt, Program, UnaryExpression, VariableDeclaration, NumericLiteral, Identifier, StringLiteral, IfStatement, WhileStatement, RangeExpression
+from typing import Collection, List, Optional, Tuple
+
+"""
+Static scope resolution.
+Runs after parsing and gives every variable reference a lexical address: the
+`depth` of the scope declaring it, counted outwards from the scope it is used
+in, and its `slot` in that scope. The program and every function body are one
+scope each, blocks share the scope around them like they do at runtime.
+Names no scope declares keep a depth of None and are looked up by name in the
+Environment, which holds the globals such as `con`.
+"""
+class Scope:
+    __slots__ = ("parent", "names", "slots", "constant")
+
+    def __init__(self, parent: Optional['Scope'] = None):
+        self.parent = parent
+        # slot -> name and name -> slot
+        self.names = []
+        self.slots = {}
+        # slot -> True when every declaration of it is constant, False when none is, None when mixed
+        self.constant = []
+
+    def declare(self, name: str, constant: bool) -> int:
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.names)
+            self.names.append(name)
+            self.constant.append(constant)
+        elif self.constant[slot] is not constant:
+            self.constant[slot] = None
+        return slot
+
+    def lookup(self, name: str) -> Tuple[Optional[int], Optional[int]]:
+        scope = self
+        depth = 0
+        while scope is not None:
+            slot = scope.slots.get(name)
+            if slot is not None:
+                return depth, slot
+            scope = scope.parent
+            depth += 1
+        return None, None
+
+    def at(self, depth: int) -> 'Scope':
+        scope = self
+        for _ in range(depth):
+            scope = scope.parent
+        return scope
+
+class AllNames:
+    """
+    The `globals` of programs run in an Environment that outlives them, like
+    the one of a REPL session. Every name counts as a global, so program level
+    declarations stay in the Environment instead of taking slots.
+    """
+    __slots__ = ()
+
+    def __contains__(self, name: str) -> bool:
+        return True
+
+ALL_NAMES = AllNames()
+
+class Resolver:
+    def __init__(self, globals: Collection[str] = ()):
+        # Names the Environment already defines, declaring them again at program level stays a runtime error
+        self.globals = globals
+        self.scope = None
+
+    def resolve_program(self, program: Program) -> Scope:
+        self.scope = program.scope = Scope()
+        self.declare(program)
+        for statement in program.body:
+            self.resolve(statement)
+        return program.scope
+
+    def resolve_function(self, params: List[Identifier], body: BlockStatement) -> Scope:
+        parent, self.scope = self.scope, Scope(self.scope)
+        scope = self.scope
+        for param in params:
+            param.depth, param.slot = 0, scope.declare(param.name, False)
+        self.declare(body)
+        self.resolve(body)
+        self.scope = parent
+        return scope
+
+    def declare(self, node: Optional[Stmt]):
+        """
+        Hoists the declarations of one scope, so every slot is known before any
+        reference is resolved. Nested function bodies are left to their own scope.
+        """
+        cls = node.__class__
+        if cls is VariableDeclaration:
+            for declarator in node.declarations:
+                self.declare_name(declarator.id.name, node.constant)
+        elif cls is FunctionDeclaration:
+            self.declare_name(node.id.name, True)
+        elif cls is Program or cls is BlockStatement:
+            for statement in node.body:
+                self.declare(statement)
+        elif cls is IfStatement:
+            self.declare(node.consequent)
+            self.declare(node.alternate)
+        elif cls is WhileStatement:
+            self.declare(node.body)
+        elif cls is ForStatement:
+            self.declare_name(node.variable.name, False)
+            self.declare(node.body)
+
+    def declare_name(self, name: str, constant: bool):
+        if self.scope.parent is None and name in self.globals:
+            return
+        self.scope.declare(name, constant)
+
+    def resolve(self, node: Optional[Stmt]):
+        if node is None:
+            return
+        resolver = RESOLVERS.get(node.__class__)
+        if resolver is None:
+            raise ValueError(f"This AST Node has not yet been set up for resolution: {node.type}")
+        resolver(self, node)
+
+    def resolve_block(self, block: BlockStatement):
+        for statement in block.body:
+            self.resolve(statement)
+
+    def resolve_var_declaration(self, declaration: VariableDeclaration):
+        for declarator in declaration.declarations:
+            self.resolve(declarator.init)
+            self.resolve_identifier(declarator.id)
+
+    def resolve_fn_declaration(self, declaration: FunctionDeclaration):
+        self.resolve_identifier(declaration.id)
+        declaration.scope = self.resolve_function(declaration.params, declaration.body)
+
+    def resolve_if_stmt(self, stmt: IfStatement):
+        self.resolve(stmt.condition)
+        self.resolve(stmt.consequent)
+        self.resolve(stmt.alternate)
+
+    def resolve_while_loop(self, stmt: WhileStatement):
+        self.resolve(stmt.condition)
+        self.resolve(stmt.body)
+
+    def resolve_for_loop(self, stmt: ForStatement):
+        self.resolve(stmt.iterable)
+        self.resolve_identifier(stmt.variable)
+        depth = stmt.variable.depth
+        stmt.constant = False if depth is None else self.scope.at(depth).constant[stmt.variable.slot]
+        self.resolve(stmt.body)
+
+    def resolve_range_expr(self, expr: RangeExpression):
+        self.resolve(expr.start)
+        self.resolve(expr.stop)
+        self.resolve(expr.step)
+
+    def resolve_expr_stmt(self, stmt: ExpressionStatement):
+        self.resolve(stmt.expression)
+
+    def resolve_identifier(self, ident: Identifier):
+        ident.depth, ident.slot = self.scope.lookup(ident.name)
+
+    def resolve_assignment(self, node: AssignmentExpression):
+        if node.left.__class__ is not Identifier:
+            raise Exception("Invalid LHS inside assignment expression")
+        self.resolve(node.right)
+        self.resolve_identifier(node.left)
+        # Constness of Environment variables is left to Environment.assignVar
+        depth = node.left.depth
+        node.constant = False if depth is None else self.scope.at(depth).constant[node.left.slot]
+
+    def resolve_binary_expr(self, expr: Stmt):
+        self.resolve(expr.left)
+        self.resolve(expr.right)
+
+    def resolve_unary_expr(self, expr: UnaryExpression):
+        self.resolve(expr.argument)
+
+    def resolve_object_expr(self, obj: ObjectExpression):
+        for prop in obj.properties:
+            if prop.value is None:
+                prop.depth, prop.slot = self.scope.lookup(prop.key)
+            else:
+                self.resolve(prop.value)
+
+    def resolve_array_expr(self, array: ArrayExpression):
+        for element in array.elements:
+            self.resolve(element)
+
+    def resolve_member_expr(self, expr: MemberExpression):
+        self.resolve(expr.object)
+        if expr.computed:
+            self.resolve(expr.property)
+
+    def resolve_call_expr(self, expr: CallExpression):
+        for arg in expr.arguments:
+            self.resolve(arg)
+        self.resolve(expr.callee)
+
+    def resolve_literal(self, literal: Stmt):
+        pass
+
+RESOLVERS = {
+    StringLiteral: Resolver.resolve_literal,
+    NumericLiteral: Resolver.resolve_literal,
+    NullLiteral: Resolver.resolve_literal,
+    BooleanLiteral: Resolver.resolve_literal,
+    Identifier: Resolver.resolve_identifier,
+    MemberExpression: Resolver.resolve_member_expr,
+    CallExpression: Resolver.resolve_call_expr,
+    RangeExpression: Resolver.resolve_range_expr,
+    UnaryExpression: Resolver.resolve_unary_expr,
+    LogicalExpression: Resolver.resolve_binary_expr,
+    ObjectExpression: Resolver.resolve_object_expr,
+    ArrayExpression: Resolver.resolve_array_expr,
+    AssignmentExpression: Resolver.resolve_assignment,
+    BinaryExpression: Resolver.resolve_binary_expr,
+    Program: Resolver.resolve_block,
+    VariableDeclaration: Resolver.resolve_var_declaration,
+    FunctionDeclaration: Resolver.resolve_fn_declaration,
+    IfStatement: Resolver.resolve_if_stmt,
+    WhileStatement: Resolver.resolve_while_loop,
+    ForStatement: Resolver.resolve_for_loop,
+    BlockStatement: Resolver.resolve_block,
+    ExpressionStatement: Resolver.resolve_expr_stmt,
+}
+
+def resolve(program: Program, globals: Collection[str] = ()) -> Scope:
+    return Resolver(globals).resolve_program(program)
+
+def resolve_function(params: List[Identifier], body: BlockStatement) -> Scope:
+    """
+    Resolves the body of a function on its own, for functions declared by
+    another engine. Its free variables are looked up in the Environment.
+    """
+    return Resolver().resolve_function(params, body)
@@ -1,22 +1,86 @@
 from sys import exception
-from runtime.environment import createGlobalEnv, Environment
-from frontend.parser import Parser
+from runtime.environment import createGlobalEnv
+from frontend.cache import CACHE_DIR, VERSION, parse_file
+from frontend.lexer import ParseError
+from frontend.optimizer import optimize
 from runtime.interpreter import evaluate
+from runtime.closures import execute
+from runtime import memo, parallel, transpile, vm
+from runtime.bytecode import compile_program, disassemble
+from runtime.session import Session
+from runtime.batch import Batch, find_scripts
+from runtime.profiler import INTERVAL, Profiler
+from runtime.stats import Stats
+from runtime.memory import MemoryTracker
 from runtime.values import BooleanVal, NumberVal, NativeFn
+from contextlib import nullcontext
+import argparse
 import os
+import sys
 
+# Execution engines selectable with --engine, each runs a Program in an Environment.
+ENGINES = {
+    "tree": evaluate,
+    "closure": execute,
+    "vm": vm.execute,
+    "python": transpile.execute,
+}
 
+def run_file(path, engine=evaluate, optimized=False, cached=True, profile=None, interval=INTERVAL, stats=None, memory=None, memo_stats=None):
+    program = parse_file(path, cached)
+    env = createGlobalEnv()
+    if optimized:
+        print(optimize(program, env.variables), file=sys.stderr)
+    if profile is None and stats is None and memory is None and memo_stats is None:
+        return engine(program, env)
 
-def repl():
-    parser = Parser()
-    env = Environment()
-    print("BeamScript Language v0.3.2 Dev")
+    # Samples the BeamScript stack, writing collapsed stacks to profile and the hottest functions to stderr
+    profiler = None if profile is None else Profiler(program, path, interval)
+    # Counts what the tree interpreter does, reporting it on stderr and as JSON to stats unless it is True
+    counters = None if stats is None else Stats()
+    # Tracks memory per top-level statement and what closures retain, reported like stats
+    tracker = None if memory is None else MemoryTracker(program, path)
+    try:
+        with profiler or nullcontext(), counters.instrument() if counters else nullcontext(), tracker.instrument() if tracker else nullcontext():
+            return engine(program, env)
+    finally:
+        if profiler is not None:
+            profiler.write(profile)
+            print(profiler.table(), file=sys.stderr)
+        if counters is not None:
+            if stats is not True:
+                counters.write(stats)
+            print(counters.report(), file=sys.stderr)
+        if tracker is not None:
+            if memory is not True:
+                tracker.write(memory)
+            print(tracker.report(), file=sys.stderr)
+        # Hits and misses of the memoized functions, reported like stats
+        if memo_stats is not None:
+            if memo_stats is not True:
+                memo.write(memo_stats)
+            print(memo.report(), file=sys.stderr)
+
+def run_batch(path, engine=evaluate, optimized=False, cached=True, workers=1, report=None) -> int:
+    # One line per script as it finishes, the throughput of the whole batch at the end
+    batch = Batch(find_scripts(path), engine, optimized, cached, workers)
+    for result in batch.run():
+        failed = result["status"] != 0 or result["error"] is not None
+        print(f"{'FAIL' if failed else 'ok':<6}{result['status']:>4}{(result['parse'] + result['run']) * 1000:>10.1f} ms  {result['script']}")
+        if result["error"] is not None:
+            print("      " + result["error"])
+    if report is not None:
+        batch.write(report)
+    print(batch.report(), file=sys.stderr)
+    return 1 if batch.failed else 0
+
+def repl(engine="tree", optimized=False, cached=True):
+    # One session for the whole REPL, so definitions carry over between lines
+    session = Session(engine, optimized, cached)
+    print(f"BeamScript Language v{VERSION}")
 
     # Continue Repl Until User Stops Or Types `exit`
     while True:
-        env.variables.clear()
-        env.constants.clear()
-        env = createGlobalEnv()
         input_text = input(">>> ")
         # Check for no user input or exit keyword.
         if not input_text or "exit" in input_text:
@@ -24,17 +88,73 @@ def repl():
         
         input_list = input_text.split()
         # 
-        if input_list[0] == "run":
-            with open(f"{os.getcwd()}\{input_list[1]}") as file:
-                source = file.read()
-        else:
-            source = input_text
-        # Produce AST From source code
-        program = parser.produceAST(source)
-        # print(program)
-        
-        evaluate(program, env)
-        # print(result)   #.value)
+        try:
+            if input_list[0] == "run":
+                session.run_file(os.path.join(os.getcwd(), input_list[1]))
+            else:
+                session.run(input_text)
+        except Exception as e:
+            # A failing line leaves the session's definitions as they are
+            print(f"{type(e).__name__}: {e}")
 
 if __name__ == "__main__":
-    repl()
+    arg_parser = argparse.ArgumentParser(description="BeamScript interpreter")
+    arg_parser.add_argument("file", nargs="?", help="script to run, starts the REPL when omitted")
+    arg_parser.add_argument("--engine", choices=ENGINES, default="tree", help="execution engine")
+    arg_parser.add_argument("--disassemble", action="store_true", help="print the bytecode of the script instead of running it")
+    arg_parser.add_argument("-O", dest="optimized", action="store_true", help="optimize the AST before running it and report what was removed")
+    arg_parser.add_argument("--no-cache", dest="cached", action="store_false", help="always parse scripts instead of loading them from " + CACHE_DIR)
+    arg_parser.add_argument("--profile", action="store_true", help="sample the BeamScript call stack, writing collapsed stacks for flamegraphs to the --profile-out file")
+    arg_parser.add_argument("--profile-out", metavar="FILE", help="file --profile writes to, giving it implies --profile (default profile.folded)")
+    arg_parser.add_argument("--profile-interval", type=float, default=INTERVAL * 1000, metavar="MS", help="milliseconds between two samples of --profile")
+    arg_parser.add_argument("--stats", action="store_true", help="count evaluations, calls, variable lookups and values created by the tree engine")
+    arg_parser.add_argument("--stats-out", metavar="FILE", help="also write --stats as JSON to FILE, giving it implies --stats")
+    arg_parser.add_argument("--memory", action="store_true", help="trace the memory of every top-level statement and the scopes closures retain with the tree engine")
+    arg_parser.add_argument("--memory-out", metavar="FILE", help="also write --memory as JSON to FILE, giving it implies --memory")
+    arg_parser.add_argument("--memo-size", type=int, default=memo.DEFAULT_SIZE, metavar="N", help=f"results cached by every `memo def` function declared without a size, 0 for no limit (default {memo.DEFAULT_SIZE})")
+    arg_parser.add_argument("--workers", type=int, default=parallel.WORKERS, metavar="N", help=f"processes par.map, par.reduce and --batch spread their work over (default {parallel.WORKERS}, the number of CPUs)")
+    arg_parser.add_argument("--memo-stats", action="store_true", help="report the cache hits, misses and evictions of memoized functions")
+    arg_parser.add_argument("--memo-stats-out", metavar="FILE", help="also write --memo-stats as JSON to FILE, giving it implies --memo-stats")
+    arg_parser.add_argument("--batch", metavar="PATH", help="run every script of a directory, or listed in a manifest file, on --workers processes and report the throughput")
+    arg_parser.add_argument("--batch-report", metavar="FILE", help="write the output, exit status and timings of every script of --batch as JSON to FILE")
+    args = arg_parser.parse_args()
+    # The reports take no value, so they never take the script for their file
+    profile = args.profile_out or ("profile.folded" if args.profile else None)
+    stats = args.stats_out or (True if args.stats else None)
+    memory = args.memory_out or (True if args.memory else None)
+    memo_stats = args.memo_stats_out or (True if args.memo_stats else None)
+    if stats is not None and args.engine != "tree":
+        arg_parser.error("--stats counts what the tree engine evaluates, it cannot be used with --engine " + args.engine)
+    if memory is not None and args.engine != "tree":
+        arg_parser.error("--memory measures the statements the tree engine evaluates, it cannot be used with --engine " + args.engine)
+    if args.memo_size < 0:
+        arg_parser.error("--memo-size cannot be negative")
+    memo.DEFAULT_SIZE = args.memo_size
+    if args.workers < 1:
+        arg_parser.error("--workers needs at least one worker")
+    parallel.WORKERS = args.workers
+    if args.batch is not None:
+        if args.file:
+            arg_parser.error("--batch runs the scripts of PATH, it cannot be given a file as well")
+        for flag, value in (("--disassemble", args.disassemble), ("--profile", profile), ("--stats", stats), ("--memory", memory), ("--memo-stats", memo_stats)):
+            if value:
+                arg_parser.error(flag + " reports on a single script, it cannot be used with --batch")
+    elif args.batch_report is not None:
+        arg_parser.error("--batch-report needs --batch")
+
+    if args.batch is not None:
+        sys.exit(run_batch(args.batch, ENGINES[args.engine], args.optimized, args.cached, args.workers, args.batch_report))
+    elif args.file:
+        try:
+            if args.disassemble:
+                program = parse_file(args.file, args.cached)
+                if args.optimized:
+                    print(optimize(program, createGlobalEnv().variables), file=sys.stderr)
+                print(disassemble(compile_program(program)))
+            else:
+                run_file(args.file, ENGINES[args.engine], args.optimized, args.cached, profile, args.profile_interval / 1000, stats, memory, memo_stats)
+        except ParseError as error:
+            print("Parser Error:\n", error)
+            sys.exit(1)
+    else:
+        repl(args.engine, args.optimized, args.cached)
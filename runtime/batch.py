@@ -0,0 +1,177 @@
+from frontend.cache import CACHE_DIR, parse_file
+from frontend.optimizer import optimize
+from runtime.environment import Environment, createGlobalEnv
+from runtime import memo, parallel
+from multiprocessing.pool import Pool
+from time import perf_counter
+from typing import Iterator, List
+import contextlib
+import io
+import json
+import os
+import sys
+
+"""
+Batch runs of many scripts.
+`python main.py --batch PATH` runs every script of PATH, a directory searched
+for `.bs` files or a manifest naming one script per line, on a pool of worker
+processes instead of starting an interpreter per script:
+- Every worker builds the globals once and runs each script on a copy of
+  them, sharing the natives, so scripts still never see each other's
+  declarations.
+- What a script prints and the error it stops with are captured, along with
+  the exit status `python main.py script` would have ended with and the time
+  spent parsing and running it.
+- Results come in the order of the scripts, and add up to the throughput of
+  the whole batch.
+Workers can't start processes of their own, par.map and par.reduce run in the
+worker that runs the script.
+"""
+# In a worker: the globals each script starts from a copy of, and how scripts are run
+TEMPLATE = None
+SETTINGS = None
+
+def find_scripts(path: str) -> List[str]:
+    # The scripts of a directory, searched recursively, or of a manifest
+    if os.path.isdir(path):
+        scripts = []
+        for root, directories, files in os.walk(path):
+            directories[:] = sorted(directory for directory in directories if directory != CACHE_DIR)
+            scripts.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".bs"))
+        return scripts
+    # Manifest lines are paths relative to the manifest, `#` starts a comment line
+    base = os.path.dirname(path)
+    with open(path) as file:
+        lines = [line.strip() for line in file]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+def start_worker(engine, optimized: bool, cached: bool):
+    global TEMPLATE, SETTINGS
+    TEMPLATE = createGlobalEnv()
+    SETTINGS = (engine, optimized, cached)
+
+def start_pool_worker(engine, optimized: bool, cached: bool):
+    start_worker(engine, optimized, cached)
+    parallel.WORKERS = 1
+
+def fresh_globals() -> Environment:
+    env = Environment()
+    env.variables = dict(TEMPLATE.variables)
+    env.constants = list(TEMPLATE.constants)
+    return env
+
+def exit_status(code) -> int:
+    # Exit status of the interpreter for SystemExit(code)
+    if code is None:
+        return 0
+    return code if code.__class__ is int else 1
+
+def run_script(path: str) -> dict:
+    engine, optimized, cached = SETTINGS
+    output = io.StringIO()
+    errors = io.StringIO()
+    status = 0
+    error = None
+    parsed = None
+    # Results of memoized functions are per function value, only the stats outlive a script
+    memo.STATS.clear()
+    start = perf_counter()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+        try:
+            program = parse_file(path, cached)
+            parsed = perf_counter()
+            env = fresh_globals()
+            if optimized:
+                print(optimize(program, env.variables), file=sys.stderr)
+            engine(program, env)
+        except SystemExit as e:
+            if parsed is None:
+                # Reading the script ended the interpreter, a failure whatever the code, with
+                # the message given or printed before exiting
+                status = 1
+                message = e.code if e.code.__class__ is str else (errors.getvalue() or output.getvalue()).strip()
+                error = message or f"SystemExit: {e.code}"
+            else:
+                status = exit_status(e.code)
+        except Exception as e:
+            status = 1
+            error = f"{type(e).__name__}: {e}"
+    end = perf_counter()
+    return {
+        "script": path,
+        "status": status,
+        "error": error,
+        "output": output.getvalue(),
+        "stderr": errors.getvalue(),
+        "parse": (parsed if parsed is not None else end) - start,
+        "run": end - parsed if parsed is not None else 0.0,
+        "worker": os.getpid(),
+    }
+
+class Batch:
+    def __init__(self, scripts: List[str], engine, optimized: bool = False, cached: bool = True, workers: int = 1):
+        self.scripts = scripts
+        self.engine = engine
+        self.optimized = optimized
+        self.cached = cached
+        self.workers = workers
+        # What run_script gave for every script run so far, in order
+        self.results = []
+        self.elapsed = 0.0
+
+    def run(self) -> Iterator[dict]:
+        # Runs the scripts, yielding the result of each in order as soon as it is in
+        settings = (self.engine, self.optimized, self.cached)
+        start = perf_counter()
+        try:
+            if self.workers == 1:
+                start_worker(*settings)
+                for result in map(run_script, self.scripts):
+                    self.results.append(result)
+                    yield result
+                return
+            # Small scripts are handed out several at a time, a few rounds per worker
+            chunksize = max(1, len(self.scripts) // (self.workers * 16))
+            with Pool(self.workers, start_pool_worker, settings) as pool:
+                for result in pool.imap(run_script, self.scripts, chunksize):
+                    self.results.append(result)
+                    yield result
+        finally:
+            self.elapsed = perf_counter() - start
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for result in self.results if result["status"] != 0 or result["error"] is not None)
+
+    def to_dict(self) -> dict:
+        return {
+            "elapsed": self.elapsed,
+            "workers": self.workers,
+            "scripts": len(self.results),
+            "failed": self.failed,
+            "results": self.results,
+        }
+
+    def write(self, path: str):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def report(self, limit: int = 10) -> str:
+        count = len(self.results)
+        elapsed = self.elapsed or 1e-9
+        parse = sum(result["parse"] for result in self.results)
+        run = sum(result["run"] for result in self.results)
+        times = sorted(result["parse"] + result["run"] for result in self.results)
+        lines = [f"{count} scripts, {self.failed} failed, in {self.elapsed:.2f}s on {self.workers} workers"]
+        lines.append(f"{count / elapsed:.1f} scripts/s, {(parse + run) / (elapsed * self.workers):.1%} of the workers' time in scripts")
+        lines.append(f"parse {parse * 1000:.1f} ms, run {run * 1000:.1f} ms in total")
+        if times:
+            lines.append(f"per script: mean {(parse + run) / count * 1000:.2f} ms, median {times[count // 2] * 1000:.2f} ms, "
+                         f"95th percentile {times[min(count - 1, count * 95 // 100)] * 1000:.2f} ms, max {times[-1] * 1000:.2f} ms")
+
+            lines.append("")
+            lines.append(f"{'parse ms':>10}{'run ms':>10}  slowest scripts")
+            slowest = sorted(self.results, key=lambda result: result["parse"] + result["run"], reverse=True)[:limit]
+            for result in slowest:
+                lines.append(f"{result['parse'] * 1000:>10.1f}{result['run'] * 1000:>10.1f}  {result['script']}")
+        return "\n".join(lines)
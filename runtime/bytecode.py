@@ -0,0 +1,395 @@
+from frontend.ast import ArrayExpression, AssignmentExpression, BinaryExpression, BlockStatement, BooleanLiteral, CallExpression, ExpressionStatement, ForStatement, FunctionDeclaration, LogicalExpression, MemberExpression, NullLiteral, ObjectExpression, Stmt, Program, UnaryExpression, VariableDeclaration, NumericLiteral, Identifier, StringLiteral, IfStatement, WhileStatement, RangeExpression
+from runtime.values import BooleanVal, NumberVal, ObjectVal, StringVal, NULL, number, boolean, shape_of
+from array import array
+from enum import IntEnum
+from typing import List, Optional
+
+"""
+Bytecode compiler.
+Turns the parser's Program into a CodeObject: a flat array of instructions and
+the pools of constants and names they refer to. Every instruction is two ints
+wide, an opcode followed by its argument (0 when unused).
+"""
+class Op(IntEnum):
+    LOAD_CONST = 1      # push constants[arg]
+    LOAD_NAME = 2       # push the variable names[arg]
+    STORE_NAME = 3      # assign the top of the stack to names[arg], leaving it there
+    DECLARE_VAR = 4     # pop a value and declare it as the variable names[arg]
+    DECLARE_CONST = 5   # pop a value and declare it as the constant names[arg]
+    MAKE_FUNCTION = 6   # push a FunctionVal for the CodeObject constants[arg]
+    BINARY_OP = 7       # pop two values, push BINARY_OPERATORS[arg] applied to them
+    COMPARE_OP = 8      # pop two values, push COMPARISON_OPERATORS[arg] applied to them
+    UNARY_PLUS = 9
+    UNARY_MINUS = 10
+    UNARY_NOT = 11
+    LOGICAL_AND = 12
+    LOGICAL_OR = 13
+    GET_MEMBER = 14     # pop an object, push its property names[arg]
+    BUILD_OBJECT = 15   # pop one value per key of constants[arg], a (keys, Shape) pair, push the object
+    CALL = 16           # pop the callee and arg arguments, push the result
+    JUMP = 17           # continue at instruction offset arg
+    JUMP_IF_FALSE = 18  # pop a value, jump to arg when it is falsy
+    POP = 19            # discard the top of the stack
+    RETURN = 20         # stop, the top of the stack is the result
+    TAIL_CALL = 21      # CALL whose result is returned right away, the callee replaces the caller's frame
+    BUILD_ARRAY = 22    # pop arg values, push an array of them
+    GET_INDEX = 23      # pop a key and a value, push the value indexed by the key
+    GET_ITER = 24       # pop a value, push an iterator over what a for loop binds to
+    GET_RANGE = 25      # pop a step, a stop and a start, push an iterator counting through them
+    FOR_ITER = 26       # push the next value of the iterator on top, or pop it and jump to arg once it is exhausted
+    BIND_NAME = 27      # pop a value and set it as the loop variable names[arg] of the current scope
+
+BINARY_OPERATORS = ("+", "-", "*", "/", "%", "^")
+COMPARISON_OPERATORS = ("==", "!=", "<", "<=", ">", ">=")
+
+class CodeObject:
+    __slots__ = ("name", "params", "instructions", "constants", "names", "declaration", "listing", "caches")
+
+    def __init__(self, name: str, params: List[str], instructions: array, constants: list, names: List[str], declaration: Optional[FunctionDeclaration] = None):
+        self.name = name
+        self.params = params
+        self.instructions = instructions
+        self.constants = constants
+        self.names = names
+        # The FunctionDeclaration a function's code was compiled from
+        self.declaration = declaration
+        # The instructions as a list, which the VM indexes faster than the array
+        self.listing = instructions.tolist()
+        # Inline caches of the VM, indexed by the offset following an instruction
+        self.caches = [None] * (len(self.listing) + 1)
+
+class Compiler:
+    def __init__(self, name: str = "<program>"):
+        self.name = name
+        self.instructions = []
+        self.constants = []
+        self.names = []
+        # Pool indexes, so every constant and name is stored only once
+        self.constant_index = {}
+        self.name_index = {}
+
+    def emit(self, op: Op, arg: int = 0) -> int:
+        self.instructions.append(op)
+        self.instructions.append(arg)
+        return len(self.instructions) - 2
+
+    def patch(self, offset: int, target: int):
+        self.instructions[offset + 1] = target
+
+    def here(self) -> int:
+        return len(self.instructions)
+
+    def add_constant(self, value, key=None) -> int:
+        # Numbers are keyed on their class too, so 1, 1.0 and True stay apart
+        key = (value.__class__, value) if key is None else key
+        if key not in self.constant_index:
+            self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_index[key]
+
+    def add_name(self, name: str) -> int:
+        if name not in self.name_index:
+            self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return self.name_index[name]
+
+    def load_null(self):
+        self.emit(Op.LOAD_CONST, self.add_constant(NULL, ("null",)))
+
+    def load_none(self):
+        # Statements other than expressions evaluate to None in the tree-walker
+        self.emit(Op.LOAD_CONST, self.add_constant(None))
+
+    def mark_tail_call(self):
+        # Nothing can jump past the final instruction, so a CALL there is the value that gets returned
+        if self.instructions and self.instructions[-2] == Op.CALL:
+            self.instructions[-2] = Op.TAIL_CALL
+
+    def finish(self, params: List[str] = [], declaration: Optional[FunctionDeclaration] = None) -> CodeObject:
+        self.emit(Op.RETURN)
+        return CodeObject(self.name, params, array("i", self.instructions), self.constants, self.names, declaration)
+
+    # STATEMENTS
+
+    def compile_block(self, block: Program, keep_value: bool):
+        if not block.body:
+            if keep_value:
+                self.load_null()
+            return
+        last = len(block.body) - 1
+        for i, statement in enumerate(block.body):
+            self.compile_stmt(statement, keep_value and i == last)
+
+    def compile_stmt(self, stmt: Stmt, keep_value: bool):
+        """
+        Compiles a statement, leaving its value on the stack only when `keep_value` is set.
+        """
+        if stmt.__class__ is ExpressionStatement:
+            self.compile_expr(stmt.expression)
+            if not keep_value:
+                self.emit(Op.POP)
+            return
+
+        compiler = STATEMENT_COMPILERS.get(stmt.__class__)
+        if compiler is None:
+            # Expressions can appear directly where statements are expected
+            self.compile_expr(stmt)
+            if not keep_value:
+                self.emit(Op.POP)
+            return
+        compiler(self, stmt, keep_value)
+
+    def compile_program(self, program: Program, keep_value: bool):
+        self.compile_block(program, keep_value)
+
+    def compile_var_declaration(self, declaration: VariableDeclaration, keep_value: bool):
+        op = Op.DECLARE_CONST if declaration.constant else Op.DECLARE_VAR
+        for declarator in declaration.declarations:
+            self.compile_expr(declarator.init)
+            self.emit(op, self.add_name(declarator.id.name))
+        if keep_value:
+            self.load_none()
+
+    def compile_fn_declaration(self, declaration: FunctionDeclaration, keep_value: bool):
+        code = compile_function(declaration)
+        self.emit(Op.MAKE_FUNCTION, self.add_constant(code, ("code", id(code))))
+        self.emit(Op.DECLARE_CONST, self.add_name(declaration.id.name))
+        if keep_value:
+            self.load_none()
+
+    def compile_if_stmt(self, stmt: IfStatement, keep_value: bool):
+        self.compile_expr(stmt.condition)
+        jump_to_alternate = self.emit(Op.JUMP_IF_FALSE)
+        self.compile_branch(stmt.consequent)
+        jump_to_end = self.emit(Op.JUMP)
+        self.patch(jump_to_alternate, self.here())
+        self.compile_branch(stmt.alternate)
+        self.patch(jump_to_end, self.here())
+        if keep_value:
+            self.load_none()
+
+    def compile_branch(self, branch: Optional[Stmt]):
+        if branch is None:
+            return
+        if branch.__class__ is BlockStatement:
+            self.compile_block(branch, False)
+        else:
+            # An `else if` holds the nested IfStatement directly
+            self.compile_stmt(branch, False)
+
+    def compile_while_loop(self, stmt: WhileStatement, keep_value: bool):
+        start = self.here()
+        self.compile_expr(stmt.condition)
+        jump_to_end = self.emit(Op.JUMP_IF_FALSE)
+        self.compile_branch(stmt.body)
+        self.emit(Op.JUMP, start)
+        self.patch(jump_to_end, self.here())
+        if keep_value:
+            self.load_none()
+
+    def compile_for_loop(self, stmt: ForStatement, keep_value: bool):
+        # The iterator stays on the stack while the loop runs
+        iterable = stmt.iterable
+        if iterable.__class__ is RangeExpression:
+            self.compile_expr(iterable.start)
+            self.compile_expr(iterable.stop)
+            self.compile_expr(iterable.step)
+            self.emit(Op.GET_RANGE)
+        else:
+            self.compile_expr(iterable)
+            self.emit(Op.GET_ITER)
+        start = self.emit(Op.FOR_ITER)
+        self.emit(Op.BIND_NAME, self.add_name(stmt.variable.name))
+        self.compile_branch(stmt.body)
+        self.emit(Op.JUMP, start)
+        self.patch(start, self.here())
+        if keep_value:
+            self.load_none()
+
+    # EXPRESSIONS
+
+    def compile_expr(self, expr: Optional[Stmt]):
+        if expr is None:
+            self.load_null()
+            return
+        compiler = EXPRESSION_COMPILERS.get(expr.__class__)
+        if compiler is None:
+            raise ValueError(f"This AST Node has not yet been set up for compilation: {expr.type}")
+        compiler(self, expr)
+
+    def compile_numeric_literal(self, literal: NumericLiteral):
+        # Keyed on the repr, 0.0 and -0.0 are equal but print differently
+        self.emit(Op.LOAD_CONST, self.add_constant(number(literal.value), (literal.value.__class__, repr(literal.value))))
+
+    def compile_string_literal(self, literal: StringLiteral):
+        self.emit(Op.LOAD_CONST, self.add_constant(StringVal(literal.value), ("string", literal.value)))
+
+    def compile_null_literal(self, literal: NullLiteral):
+        self.load_null()
+
+    def compile_boolean_literal(self, literal: BooleanLiteral):
+        self.emit(Op.LOAD_CONST, self.add_constant(boolean(literal.value), ("boolean", literal.value)))
+
+    def compile_identifier(self, ident: Identifier):
+        self.emit(Op.LOAD_NAME, self.add_name(ident.name))
+
+    def compile_assignment(self, node: AssignmentExpression):
+        if node.left.type != "Identifier":
+            raise Exception("Invalid LHS inside assignment expression")
+        self.compile_expr(node.right)
+        self.emit(Op.STORE_NAME, self.add_name(node.left.name))
+
+    def compile_binary_expr(self, binop: BinaryExpression):
+        self.compile_expr(binop.left)
+        self.compile_expr(binop.right)
+        if binop.operator in COMPARISON_OPERATORS:
+            self.emit(Op.COMPARE_OP, COMPARISON_OPERATORS.index(binop.operator))
+        else:
+            self.emit(Op.BINARY_OP, BINARY_OPERATORS.index(binop.operator))
+
+    def compile_unary_expr(self, expr: UnaryExpression):
+        self.compile_expr(expr.argument)
+        if expr.operator == "+":
+            self.emit(Op.UNARY_PLUS)
+        elif expr.operator == "-":
+            self.emit(Op.UNARY_MINUS)
+        elif expr.operator in {"not", "!"}:
+            self.emit(Op.UNARY_NOT)
+        else:
+            raise ValueError("Unsupported unary operator: " + expr.operator)
+
+    def compile_logical_expr(self, expr: LogicalExpression):
+        # Both sides are always evaluated, like the tree-walker does
+        self.compile_expr(expr.left)
+        self.compile_expr(expr.right)
+        if expr.operator in {"and", "&&"}:
+            self.emit(Op.LOGICAL_AND)
+        elif expr.operator in {"or", "||"}:
+            self.emit(Op.LOGICAL_OR)
+        else:
+            raise ValueError("Invalid operator in logical expression")
+
+    def compile_object_expr(self, obj: ObjectExpression):
+        if obj.constant:
+            # Objects of constants only are built once, BeamScript never mutates an object
+            self.emit(Op.LOAD_CONST, self.add_constant(constant_object(obj), ("object", id(obj))))
+            return
+
+        keys = tuple(prop.key for prop in obj.properties)
+        for prop in obj.properties:
+            # A property without a value is shorthand for the variable of the same name
+            if prop.value is None:
+                self.emit(Op.LOAD_NAME, self.add_name(prop.key))
+            else:
+                self.compile_expr(prop.value)
+        self.emit(Op.BUILD_OBJECT, self.add_constant((keys, shape_of(keys)), ("keys", keys)))
+
+    def compile_array_expr(self, array: ArrayExpression):
+        for element in array.elements:
+            self.compile_expr(element)
+        self.emit(Op.BUILD_ARRAY, len(array.elements))
+
+    def compile_member_expr(self, expr: MemberExpression):
+        self.compile_expr(expr.object)
+        if expr.computed:
+            self.compile_expr(expr.property)
+            self.emit(Op.GET_INDEX)
+            return
+        self.emit(Op.GET_MEMBER, self.add_name(expr.property.name))
+
+    def compile_call_expr(self, expr: CallExpression):
+        # Arguments are evaluated before the callee
+        for arg in expr.arguments:
+            self.compile_expr(arg)
+        self.compile_expr(expr.callee)
+        self.emit(Op.CALL, len(expr.arguments))
+
+STATEMENT_COMPILERS = {
+    Program: Compiler.compile_program,
+    BlockStatement: Compiler.compile_program,
+    VariableDeclaration: Compiler.compile_var_declaration,
+    FunctionDeclaration: Compiler.compile_fn_declaration,
+    IfStatement: Compiler.compile_if_stmt,
+    WhileStatement: Compiler.compile_while_loop,
+    ForStatement: Compiler.compile_for_loop,
+}
+
+EXPRESSION_COMPILERS = {
+    NumericLiteral: Compiler.compile_numeric_literal,
+    StringLiteral: Compiler.compile_string_literal,
+    NullLiteral: Compiler.compile_null_literal,
+    BooleanLiteral: Compiler.compile_boolean_literal,
+    Identifier: Compiler.compile_identifier,
+    AssignmentExpression: Compiler.compile_assignment,
+    BinaryExpression: Compiler.compile_binary_expr,
+    UnaryExpression: Compiler.compile_unary_expr,
+    LogicalExpression: Compiler.compile_logical_expr,
+    ObjectExpression: Compiler.compile_object_expr,
+    ArrayExpression: Compiler.compile_array_expr,
+    MemberExpression: Compiler.compile_member_expr,
+    CallExpression: Compiler.compile_call_expr,
+}
+
+def constant_object(obj: ObjectExpression) -> ObjectVal:
+    # Builds the value of an object literal made only of literals and constant objects
+    compiler = Compiler()
+    properties = {}
+    for prop in obj.properties:
+        compiler.compile_expr(prop.value)
+        properties[prop.key] = compiler.constants[compiler.instructions[-1]]
+    return ObjectVal(properties)
+
+def compile_program(program: Program) -> CodeObject:
+    compiler = Compiler()
+    compiler.compile_block(program, True)
+    return compiler.finish()
+
+def compile_function(declaration: FunctionDeclaration) -> CodeObject:
+    compiler = Compiler(declaration.id.name)
+    compiler.compile_block(declaration.body, True)
+    compiler.mark_tail_call()
+    return compiler.finish([param.name for param in declaration.params], declaration)
+
+# DISASSEMBLER
+
+def describe_constant(value) -> str:
+    if isinstance(value, CodeObject):
+        return f"<code {value.name}>"
+    if value is NULL:
+        return "null"
+    if value.__class__ in (NumberVal, StringVal, BooleanVal):
+        return repr(value.value)
+    return repr(value)
+
+def disassemble(code: CodeObject) -> str:
+    """
+    Renders a CodeObject, and every function compiled into it, as readable text.
+    """
+    lines = [f"code {code.name}({', '.join(code.params)}):"]
+    instructions = code.instructions
+    for offset in range(0, len(instructions), 2):
+        op = Op(instructions[offset])
+        arg = instructions[offset + 1]
+        if op in (Op.LOAD_CONST, Op.MAKE_FUNCTION):
+            detail = describe_constant(code.constants[arg])
+        elif op == Op.BUILD_OBJECT:
+            detail = repr(code.constants[arg][0])
+        elif op in (Op.LOAD_NAME, Op.STORE_NAME, Op.DECLARE_VAR, Op.DECLARE_CONST, Op.GET_MEMBER, Op.BIND_NAME):
+            detail = code.names[arg]
+        elif op == Op.BINARY_OP:
+            detail = BINARY_OPERATORS[arg]
+        elif op == Op.COMPARE_OP:
+            detail = COMPARISON_OPERATORS[arg]
+        elif op in (Op.JUMP, Op.JUMP_IF_FALSE, Op.CALL, Op.TAIL_CALL, Op.BUILD_ARRAY, Op.FOR_ITER):
+            lines.append(f"{offset:>6} {op.name:<16}{arg:>4}")
+            continue
+        else:
+            lines.append(f"{offset:>6} {op.name}")
+            continue
+        lines.append(f"{offset:>6} {op.name:<16}{arg:>4} ({detail})")
+
+    for constant in code.constants:
+        if isinstance(constant, CodeObject):
+            lines.append("")
+            lines.append(disassemble(constant))
+    return "\n".join(lines)
@@ -0,0 +1,1213 @@
+from frontend.ast import ArrayExpression, AssignmentExpression, BinaryExpression, BlockStatement, BooleanLiteral, CallExpression, Expr, ExpressionStatement, ForStatement, FunctionDeclaration, LogicalExpression, MemberExpression, NullLiteral, ObjectExpression, Stmt, Program, UnaryExpression, VariableDeclaration, NumericLiteral, Identifier, StringLiteral, IfStatement, WhileStatement, RangeExpression
+from runtime.values import ArrayVal, FunctionVal, NativeFn, NumberVal, ObjectVal, RuntimeVal, StringVal, BooleanVal, NULL, TRUE, FALSE, SMALL_NUMBERS, number, boolean, shape_of, array_member, index_value, iterate, count_range
+from runtime.environment import Environment, Frame, UNSET
+from frontend.resolver import Scope, resolve, resolve_function
+from runtime import memo
+from typing import Callable
+import operator
+
+"""
+Closure compilation engine.
+The Program is resolved by frontend.resolver, then walked once and every node
+is turned into a Python closure `run(frame) -> RuntimeVal`, so executing it
+never inspects node types again. Variables live in the slots of a Frame per
+function call, the Environment only holds the globals.
+Common shapes, such as arithmetic on variables of the current frame, chains of
+property reads and calls, compile into fused closures which take the generic
+ones for any value they were not built for.
+The semantics mirror `runtime.interpreter.evaluate` exactly.
+"""
+Closure = Callable[[Frame], RuntimeVal]
+# Makes an instance without running `__init__`, for closures that set its slots themselves
+allocate = object.__new__
+
+def divide(lhs, rhs):
+    # Arrays divide element-wise, each element checks its own divisor
+    if rhs.__class__ is not ArrayVal and lhs.__class__ is not ArrayVal and rhs == 0:
+        raise Exception("Cannot Divide by Zero")
+    return lhs / rhs
+
+ARITHMETIC_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": divide,
+    "%": operator.mod,
+    "^": operator.pow,
+}
+
+COMPARISON_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+def compile_block(block: Program) -> Closure:
+    statements = [compile_node(statement) for statement in block.body]
+
+    # Short blocks, such as most function and loop bodies, run without a loop
+    if len(statements) == 1:
+        return statements[0]
+    if len(statements) == 2:
+        first, second = statements
+
+        def run(frame):
+            first(frame)
+            return second(frame)
+        return run
+    if len(statements) == 3:
+        first, second, third = statements
+
+        def run(frame):
+            first(frame)
+            second(frame)
+            return third(frame)
+        return run
+
+    def run(frame):
+        last_evaluated = NULL
+        for statement in statements:
+            last_evaluated = statement(frame)
+        return last_evaluated
+    return run
+
+def compile_declare(ident: Identifier, constant: bool) -> Callable[[Frame, RuntimeVal], RuntimeVal]:
+    name = ident.name
+    slot = ident.slot
+
+    if ident.depth is None:
+        # A program level declaration of a name the Environment already has
+        def declare(frame, value):
+            return frame.globals.declareVar(name, value, constant)
+        return declare
+
+    def declare(frame, value):
+        return frame.declare(slot, value, constant)
+    return declare
+
+def compile_declarator(ident: Identifier, constant: bool, init: Closure) -> Closure:
+    # Evaluates init and declares ident with its value
+    if constant or ident.depth is None:
+        declare = compile_declare(ident, constant)
+
+        def run(frame):
+            declare(frame, init(frame))
+        return run
+
+    name = ident.name
+    slot = ident.slot
+
+    def run(frame):
+        value = init(frame)
+        # Frame.declare, for a variable that is not constant
+        values = frame.values
+        if values[slot] is not UNSET:
+            raise ValueError(f"Cannot declare variable {name}. As it already is defined.")
+        values[slot] = value
+    return run
+
+def compile_var_declaration(declaration: VariableDeclaration) -> Closure:
+    declarators = [compile_declarator(declarator.id, declaration.constant, compile_node(declarator.init)) for declarator in declaration.declarations]
+
+    if len(declarators) == 1:
+        return declarators[0]
+
+    def run(frame):
+        for declarator in declarators:
+            declarator(frame)
+    return run
+
+def compile_function(params, body, layout: Scope) -> Callable[[Frame, list], RuntimeVal]:
+    """
+    Compiles a function body together with its parameter binding into
+    `invoke(declaration_frame, args)`, which runs one call of the function.
+    """
+    slots = [param.slot for param in params]
+    count = len(slots)
+    block = compile_node(body)
+
+    if len(set(slots)) != count:
+        # Repeated parameter names fail on declaration exactly like the tree-walker
+        def invoke(declaration_frame, args):
+            frame = Frame(declaration_frame, layout)
+            for i in range(count):
+                frame.declare(slots[i], args[i], False)
+            return block(frame)
+        return invoke
+
+    # Parameters are declared first, so they take the first slots in order.
+    # A call with one argument per parameter builds the frame's values from
+    # the argument list, which every caller builds for that call alone.
+    padding = [UNSET] * (len(layout.names) - count)
+
+    def invoke(declaration_frame, args):
+        if len(args) != count:
+            frame = Frame(declaration_frame, layout)
+            values = frame.values
+            for i in range(count):
+                values[i] = args[i]
+            return block(frame)
+        # Frame.__init__, inlined
+        frame = allocate(Frame)
+        frame.parent = declaration_frame
+        frame.layout = layout
+        frame.values = args + padding if padding else args
+        frame.globals = declaration_frame.globals if declaration_frame.__class__ is Frame else declaration_frame
+        frame.constants = None
+        return block(frame)
+    return compile_record(body, count, invoke) or invoke
+
+def compile_record(body: BlockStatement, count: int, generic: Callable[[Frame, list], RuntimeVal]):
+    """
+    Compiles a function whose body is just an object literal of its
+    parameters, such as `def vector(x, y, z) { { x, y, z } }`, into an invoke
+    building the object straight from the argument list, without a frame.
+    A call with another number of arguments takes the generic invoke. Gives
+    None for other bodies.
+    """
+    if body.__class__ is not BlockStatement or len(body.body) != 1 or body.body[0].__class__ is not ExpressionStatement:
+        return None
+    obj = body.body[0].expression
+    if obj.__class__ is not ObjectExpression:
+        return None
+    keys = tuple(prop.key for prop in obj.properties)
+    shape = shape_of(keys)
+    slots = [prop.slot if prop.depth == 0 else None if prop.value is None else local_slot(prop.value) for prop in obj.properties]
+    if len(shape.keys) != len(keys) or None in slots or any(slot >= count for slot in slots):
+        return None
+
+    if slots == list(range(count)):
+        # The properties are the parameters in order, the argument list is the object's values
+        def invoke(declaration_frame, args):
+            if len(args) != count:
+                return generic(declaration_frame, args)
+            obj = allocate(ObjectVal)
+            obj.shape = shape
+            obj.values = args
+            return obj
+        return invoke
+
+    def invoke(declaration_frame, args):
+        if len(args) != count:
+            return generic(declaration_frame, args)
+        obj = allocate(ObjectVal)
+        obj.shape = shape
+        obj.values = [args[slot] for slot in slots]
+        return obj
+    return invoke
+
+def compile_function_value(fn: FunctionVal) -> Callable[[Frame, list], RuntimeVal]:
+    # Functions declared by another engine were never resolved as part of this program
+    return compile_function(fn.params, fn.body, resolve_function(fn.params, fn.body))
+
+def compile_fn_declaration(declaration: FunctionDeclaration) -> Closure:
+    name = declaration.id.name
+    params = declaration.params
+    body = declaration.body
+    compiled = compile_function(params, body, declaration.scope)
+    declare = compile_declare(declaration.id, True)
+
+    if declaration.memoized:
+        def run(frame):
+            fn = FunctionVal(name, params, frame, body, compiled)
+            fn.memo = memo.new_cache(declaration)
+            declare(frame, fn)
+        return run
+
+    def run(frame):
+        declare(frame, FunctionVal(name, params, frame, body, compiled))
+    return run
+
+def compile_if_stmt(stmt: IfStatement) -> Closure:
+    condition = compile_test(stmt.condition)
+    consequent = compile_node(stmt.consequent)
+    alternate = compile_node(stmt.alternate)
+
+    def run(frame):
+        if condition(frame):
+            consequent(frame)
+        else:
+            alternate(frame)
+    return run
+
+def compile_while_loop(stmt: WhileStatement) -> Closure:
+    condition = compile_test(stmt.condition)
+    body = compile_node(stmt.body)
+
+    def run(frame):
+        while condition(frame):
+            body(frame)
+    return run
+
+def compile_for_loop(stmt: ForStatement) -> Closure:
+    name = stmt.variable.name
+    slot = stmt.variable.slot
+    body = compile_node(stmt.body)
+    iterable = stmt.iterable
+    if iterable.__class__ is RangeExpression:
+        start = compile_node(iterable.start)
+        stop = compile_node(iterable.stop)
+        step = compile_node(iterable.step)
+
+        def values(frame):
+            return map(number, count_range(start(frame), stop(frame), step(frame)))
+    else:
+        collection = compile_node(iterable)
+
+        def values(frame):
+            return iterate(collection(frame))
+
+    if stmt.variable.depth is None:
+        # A program level loop over a name the Environment already has
+        def run(frame):
+            bind = frame.globals.bindVar
+            for value in values(frame):
+                bind(name, value)
+                body(frame)
+        return run
+
+    if stmt.constant is None:
+        # Its scope declares the variable constant too, which has to be checked when it is set
+        def run(frame):
+            for value in values(frame):
+                frame.bind(slot, value)
+                body(frame)
+        return run
+
+    def run(frame):
+        frame_values = frame.values
+        for value in values(frame):
+            frame_values[slot] = value
+            body(frame)
+    return run
+
+def compile_number(node: Expr) -> Callable[[Frame], object]:
+    """
+    Compiles an operand of an arithmetic or comparison expression into a closure
+    returning its raw Python number, or None when it is not a number. Nested
+    arithmetic stays unboxed, only the outermost expression builds a NumberVal.
+    Arrays are returned as they are, the Python operators of ArrayVal apply
+    element-wise. Every operand is still evaluated left to right like the
+    tree-walker does.
+    """
+    if node.__class__ is NumericLiteral:
+        constant = node.value
+
+        def run(frame):
+            return constant
+        return run
+
+    if node.__class__ is Identifier and node.depth == 0:
+        name = node.name
+        slot = node.slot
+
+        def run(frame):
+            value = frame.values[slot]
+            if value is UNSET:
+                value = frame.lookupVar(name)
+            if value.__class__ is NumberVal:
+                return value.value
+            return value if value.__class__ is ArrayVal else None
+        return run
+
+    if node.__class__ is Identifier and node.depth == 1:
+        # A variable of the enclosing function, such as a closed over parameter
+        name = node.name
+        slot = node.slot
+
+        def run(frame):
+            frame = frame.parent
+            value = frame.values[slot]
+            if value is UNSET:
+                value = frame.lookupVar(name)
+            if value.__class__ is NumberVal:
+                return value.value
+            return value if value.__class__ is ArrayVal else None
+        return run
+
+    if node.__class__ is Identifier and node.depth == 2:
+        name = node.name
+        slot = node.slot
+
+        def run(frame):
+            frame = frame.parent.parent
+            value = frame.values[slot]
+            if value is UNSET:
+                value = frame.lookupVar(name)
+            if value.__class__ is NumberVal:
+                return value.value
+            return value if value.__class__ is ArrayVal else None
+        return run
+
+    if node.__class__ is Identifier and node.depth is not None:
+        name = node.name
+        hops = range(node.depth)
+        slot = node.slot
+
+        def run(frame):
+            for _ in hops:
+                frame = frame.parent
+            value = frame.values[slot]
+            if value is UNSET:
+                value = frame.lookupVar(name)
+            if value.__class__ is NumberVal:
+                return value.value
+            return value if value.__class__ is ArrayVal else None
+        return run
+
+    if is_arithmetic(node) and is_arithmetic(node.left):
+        # A left leaning chain, such as `a * b + c + d`, runs as one loop over its operators
+        steps = []
+        spine = node
+        while is_arithmetic(spine):
+            steps.append((ARITHMETIC_OPERATORS[spine.operator], compile_number(spine.right)))
+            spine = spine.left
+        steps.reverse()
+        first = compile_number(spine)
+
+        if len(steps) == 2:
+            (apply, operand), (then_apply, then_operand) = steps
+
+            def run(frame):
+                result = first(frame)
+                rhs = operand(frame)
+                result = None if result is None or rhs is None else apply(result, rhs)
+                rhs = then_operand(frame)
+                if result is None or rhs is None:
+                    return None
+                return then_apply(result, rhs)
+            return run
+
+        def run(frame):
+            result = first(frame)
+            for apply, operand in steps:
+                rhs = operand(frame)
+                if result is None or rhs is None:
+                    result = None
+                else:
+                    result = apply(result, rhs)
+            return result
+        return run
+
+    if node.__class__ is BinaryExpression and node.operator in ARITHMETIC_OPERATORS:
+        apply = ARITHMETIC_OPERATORS[node.operator]
+        left = compile_number(node.left)
+
+        # A numeric literal on the right needs no unboxing at all
+        if node.right.__class__ is NumericLiteral:
+            constant = node.right.value
+
+            def run(frame):
+                lhs = left(frame)
+                if lhs is None:
+                    return None
+                return apply(lhs, constant)
+            return run
+
+        right = compile_number(node.right)
+
+        def run(frame):
+            lhs = left(frame)
+            rhs = right(frame)
+            if lhs is None or rhs is None:
+                return None
+            return apply(lhs, rhs)
+        return run
+
+    boxed = compile_node(node)
+
+    def run(frame):
+        value = boxed(frame)
+        if value.__class__ is NumberVal:
+            return value.value
+        return value if value.__class__ is ArrayVal else None
+
+    if node.__class__ is MemberExpression and not node.computed:
+        return compile_local_member_number(node, run) or run
+    return run
+
+def compile_local_member_number(expr: MemberExpression, generic: Callable[[Frame], object]):
+    """
+    Fuses reading a property of an object held by a variable of the current
+    frame with unboxing it, for compile_number. Anything but an object with
+    the property, such as an array or an undeclared variable, takes the
+    generic closure. Gives None for other shapes.
+    """
+    slot = local_slot(expr.object)
+    if slot is None:
+        return None
+    name = expr.property.name
+    cached_shape = None
+    cached_index = None
+
+    def run(frame):
+        nonlocal cached_shape, cached_index
+        value = frame.values[slot]
+        if value.__class__ is not ObjectVal:
+            return generic(frame)
+        shape = value.shape
+        if shape is not cached_shape:
+            index = shape.index.get(name)
+            if index is None:
+                return generic(frame)
+            cached_shape = shape
+            cached_index = index
+        result = value.values[cached_index]
+        if result.__class__ is NumberVal:
+            return result.value
+        return result if result.__class__ is ArrayVal else None
+    return run
+
+def local_slot(node: Expr):
+    # The slot of an Identifier naming a variable of the frame itself, or None
+    if node.__class__ is Identifier and node.depth == 0:
+        return node.slot
+    return None
+
+def compile_local_arithmetic(binop: BinaryExpression, generic: Closure):
+    """
+    Fuses arithmetic on a variable of the current frame and a numeric literal
+    or another such variable into one closure, which boxes the result like
+    `number` without calling it. Operands that are not both numbers, and
+    variables not declared yet, take the generic closure, which reads the
+    variables again. Gives None for other shapes.
+    """
+    apply = ARITHMETIC_OPERATORS[binop.operator]
+    left = local_slot(binop.left)
+    if left is None:
+        return None
+
+    if binop.right.__class__ is NumericLiteral:
+        constant = binop.right.value
+
+        def run(frame):
+            value = frame.values[left]
+            if value.__class__ is NumberVal:
+                result = apply(value.value, constant)
+                if result.__class__ is int and -5 <= result <= 256:
+                    return SMALL_NUMBERS[result + 5]
+                boxed = allocate(NumberVal)
+                boxed.value = result
+                return boxed
+            return generic(frame)
+        return run
+
+    right = local_slot(binop.right)
+    if right is None:
+        return None
+
+    def run(frame):
+        values = frame.values
+        lhs = values[left]
+        rhs = values[right]
+        if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+            result = apply(lhs.value, rhs.value)
+            if result.__class__ is int and -5 <= result <= 256:
+                return SMALL_NUMBERS[result + 5]
+            boxed = allocate(NumberVal)
+            boxed.value = result
+            return boxed
+        return generic(frame)
+    return run
+
+def compile_local_test(binop: BinaryExpression, generic: Callable[[Frame], object]):
+    # compile_local_arithmetic for a comparison in a condition, which gives the Python bool,
+    # the right operand may also be anything compile_number takes
+    compare = COMPARISON_OPERATORS[binop.operator]
+    left = local_slot(binop.left)
+    if left is None:
+        return None
+
+    if binop.right.__class__ is NumericLiteral:
+        constant = binop.right.value
+
+        def test(frame):
+            value = frame.values[left]
+            if value.__class__ is NumberVal:
+                return compare(value.value, constant)
+            return generic(frame)
+        return test
+
+    right = local_slot(binop.right)
+    if right is None:
+        # Any other operand, such as a variable of an enclosing function, is read once the variable is known to be a number
+        operand = compile_number(binop.right)
+
+        def test(frame):
+            value = frame.values[left]
+            if value.__class__ is NumberVal:
+                rhs = operand(frame)
+                return rhs is not None and compare(value.value, rhs)
+            return generic(frame)
+        return test
+
+    def test(frame):
+        values = frame.values
+        lhs = values[left]
+        rhs = values[right]
+        if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+            return compare(lhs.value, rhs.value)
+        return generic(frame)
+    return test
+
+def unbox(value: RuntimeVal):
+    # What compile_number gives for an operand that evaluated to value
+    if value.__class__ is NumberVal:
+        return value.value
+    return value if value.__class__ is ArrayVal else None
+
+def is_arithmetic(node: Expr) -> bool:
+    return node.__class__ is BinaryExpression and node.operator in ARITHMETIC_OPERATORS
+
+def combine(apply, lhs: RuntimeVal, rhs: RuntimeVal) -> RuntimeVal:
+    # Arithmetic on two evaluated operands that are not both numbers
+    lhs = unbox(lhs)
+    rhs = unbox(rhs)
+    if lhs is None or rhs is None:
+        return NULL
+    result = apply(lhs, rhs)
+    if result.__class__ is ArrayVal:
+        return result
+    return number(result)
+
+def compile_boxed_arithmetic(binop: BinaryExpression) -> Closure:
+    """
+    Compiles arithmetic on two operands that are not arithmetic themselves,
+    such as the results of two calls. Their values are unboxed here rather
+    than by an extra closure per operand, and the result is boxed like
+    `number` without calling it.
+    """
+    apply = ARITHMETIC_OPERATORS[binop.operator]
+    left = compile_node(binop.left)
+    right = compile_node(binop.right)
+
+    def run(frame):
+        lhs = left(frame)
+        rhs = right(frame)
+        if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+            result = apply(lhs.value, rhs.value)
+            if result.__class__ is int and -5 <= result <= 256:
+                return SMALL_NUMBERS[result + 5]
+            boxed = allocate(NumberVal)
+            boxed.value = result
+            return boxed
+        return combine(apply, lhs, rhs)
+    return run
+
+def compile_binary_expr(binop: BinaryExpression) -> Closure:
+    if binop.operator in ARITHMETIC_OPERATORS:
+        if not is_arithmetic(binop.left) and not is_arithmetic(binop.right):
+            run = compile_boxed_arithmetic(binop)
+        else:
+            arithmetic = compile_number(binop)
+
+            def run(frame):
+                result = arithmetic(frame)
+                # number, inlined
+                if result.__class__ is int and -5 <= result <= 256:
+                    return SMALL_NUMBERS[result + 5]
+                if result is None:
+                    return NULL
+                if result.__class__ is ArrayVal:
+                    return result
+                boxed = allocate(NumberVal)
+                boxed.value = result
+                return boxed
+        return compile_local_arithmetic(binop, run) or run
+
+    compare = COMPARISON_OPERATORS[binop.operator]
+    left = compile_number(binop.left)
+    right = compile_number(binop.right)
+
+    def run(frame):
+        lhs = left(frame)
+        rhs = right(frame)
+        if lhs is None or rhs is None:
+            return NULL
+        result = compare(lhs, rhs)
+        if result.__class__ is ArrayVal:
+            return result
+        return boolean(result)
+    return run
+
+def compile_test(node: Expr) -> Callable[[Frame], object]:
+    """
+    Compiles the condition of an if or while statement into a closure returning
+    the Python truth value directly, comparisons skip building a BooleanVal.
+    """
+    if node.__class__ is BinaryExpression and node.operator in COMPARISON_OPERATORS:
+        compare = COMPARISON_OPERATORS[node.operator]
+        left = compile_number(node.left)
+        right = compile_number(node.right)
+
+        def test(frame):
+            lhs = left(frame)
+            rhs = right(frame)
+            return lhs is not None and rhs is not None and compare(lhs, rhs)
+        return compile_local_test(node, test) or test
+
+    value = compile_node(node)
+
+    def test(frame):
+        return value(frame).value
+    return test
+
+def compile_lookup(name: str, depth, slot) -> Closure:
+    """
+    Compiles a read of the variable at a lexical address. A slot whose
+    declaration has not run yet falls back to looking the name up further
+    out, like Environment.lookupVar would.
+    """
+    if depth is None:
+        def run(frame):
+            return frame.globals.lookupVar(name)
+        return run
+
+    if depth == 0:
+        def run(frame):
+            value = frame.values[slot]
+            if value is UNSET:
+                return frame.lookupVar(name)
+            return value
+        return run
+
+    if depth == 1:
+        def run(frame):
+            frame = frame.parent
+            value = frame.values[slot]
+            if value is UNSET:
+                return frame.lookupVar(name)
+            return value
+        return run
+
+    hops = range(depth)
+
+    def run(frame):
+        for _ in hops:
+            frame = frame.parent
+        value = frame.values[slot]
+        if value is UNSET:
+            return frame.lookupVar(name)
+        return value
+    return run
+
+def compile_identifier(ident: Identifier) -> Closure:
+    return compile_lookup(ident.name, ident.depth, ident.slot)
+
+def compile_assignment(node: AssignmentExpression) -> Closure:
+    if node.left.type != "Identifier":
+        raise Exception("Invalid LHS inside assignment expression")
+
+    varname = node.left.name
+    depth = node.left.depth
+    slot = node.left.slot
+    value = compile_node(node.right)
+
+    if depth is None or node.constant is None:
+        # Environment variables, and slots declared both ways, check constness at runtime
+        def run(frame):
+            result = value(frame)
+            if depth is None:
+                return frame.globals.assignVar(varname, result)
+            for _ in range(depth):
+                frame = frame.parent
+            return frame.assignVar(varname, result)
+        return run
+
+    if node.constant:
+        # Resolved to a constant, only an undeclared slot can still resolve elsewhere
+        def run(frame):
+            result = value(frame)
+            for _ in range(depth):
+                frame = frame.parent
+            if frame.values[slot] is UNSET:
+                return frame.assignVar(varname, result)
+            raise ValueError(f"Cannot assign a value to variable {varname} as it was declared a constant.")
+        return run
+
+    if depth == 0:
+        def run(frame):
+            result = value(frame)
+            values = frame.values
+            if values[slot] is UNSET:
+                return frame.assignVar(varname, result)
+            values[slot] = result
+            return result
+        return compile_local_update(node, run) or run
+
+    def run(frame):
+        result = value(frame)
+        for _ in range(depth):
+            frame = frame.parent
+        values = frame.values
+        if values[slot] is UNSET:
+            return frame.assignVar(varname, result)
+        values[slot] = result
+        return result
+    return run
+
+def compile_local_update(node: AssignmentExpression, generic: Closure):
+    """
+    Fuses an update such as `total = total + f(x)` of a variable of the current
+    frame into one closure, which reads the variable, evaluates the other
+    operand, computes and stores. A variable not declared yet takes the
+    generic closure. Gives None for other shapes, and when the other operand
+    is arithmetic itself, which compile_number keeps unboxed.
+    """
+    binop = node.right
+    if not is_arithmetic(binop) or is_arithmetic(binop.right) or local_slot(binop.left) != node.left.slot:
+        return None
+    apply = ARITHMETIC_OPERATORS[binop.operator]
+    slot = node.left.slot
+
+    if binop.right.__class__ is NumericLiteral:
+        # A counter such as `i = i + 1`, anything but a number takes the generic closure
+        constant = binop.right.value
+
+        def run(frame):
+            values = frame.values
+            lhs = values[slot]
+            if lhs.__class__ is not NumberVal:
+                return generic(frame)
+            result = apply(lhs.value, constant)
+            if result.__class__ is int and -5 <= result <= 256:
+                result = SMALL_NUMBERS[result + 5]
+            else:
+                boxed = result
+                result = allocate(NumberVal)
+                result.value = boxed
+            values[slot] = result
+            return result
+        return run
+
+    right = compile_node(binop.right)
+
+    def run(frame):
+        values = frame.values
+        lhs = values[slot]
+        if lhs is UNSET:
+            return generic(frame)
+        rhs = right(frame)
+        if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+            result = apply(lhs.value, rhs.value)
+            if result.__class__ is int and -5 <= result <= 256:
+                result = SMALL_NUMBERS[result + 5]
+            else:
+                boxed = result
+                result = allocate(NumberVal)
+                result.value = boxed
+        else:
+            result = combine(apply, lhs, rhs)
+        values[slot] = result
+        return result
+    return run
+
+def compile_unary_expr(expr: UnaryExpression) -> Closure:
+    op = expr.operator
+    argument = compile_node(expr.argument)
+
+    if op == "+":
+        def run(frame):
+            operand = argument(frame)
+            if operand.__class__ is NumberVal:
+                return number(+operand.value)
+            raise ValueError("Unary plus operator can only be applied to numbers.")
+        return run
+
+    if op == "-":
+        def run(frame):
+            operand = argument(frame)
+            if operand.__class__ is NumberVal:
+                return number(-operand.value)
+            raise ValueError("Unary negation can only be applied to numbers.")
+        return run
+
+    if op in {"not", "!"}:
+        def run(frame):
+            operand = argument(frame)
+            if operand.__class__ is BooleanVal:
+                return boolean(not operand.value)
+            raise ValueError("Logical not can only be applied to booleans.")
+        return run
+
+    raise ValueError("Unsupported unary operator: " + op)
+
+def compile_logical_expr(expr: LogicalExpression) -> Closure:
+    left = compile_node(expr.left)
+    right = compile_node(expr.right)
+    op = expr.operator
+
+    if op in {"and", "&&"}:
+        def run(frame):
+            left_val = left(frame)
+            right_val = right(frame)
+            if left_val == right_val:
+                return left_val
+            return FALSE
+        return run
+
+    if op in {"or", "||"}:
+        def run(frame):
+            left_val = left(frame)
+            right_val = right(frame)
+            if left_val.value:
+                return TRUE
+            return right_val
+        return run
+
+    raise ValueError("Invalid operator in logical expression")
+
+def compile_values(closures: list) -> Callable[[Frame], list]:
+    # A closure building the list of the values of closures in order, without a loop for short lists
+    count = len(closures)
+    if count == 0:
+        def run(frame):
+            return []
+    elif count == 1:
+        first, = closures
+
+        def run(frame):
+            return [first(frame)]
+    elif count == 2:
+        first, second = closures
+
+        def run(frame):
+            return [first(frame), second(frame)]
+    elif count == 3:
+        first, second, third = closures
+
+        def run(frame):
+            return [first(frame), second(frame), third(frame)]
+    elif count == 4:
+        first, second, third, fourth = closures
+
+        def run(frame):
+            return [first(frame), second(frame), third(frame), fourth(frame)]
+    else:
+        def run(frame):
+            return [value(frame) for value in closures]
+    return run
+
+def compile_local_values(slots: list, generic: Callable[[Frame], list]):
+    """
+    compile_values for two or three reads of variables of the current frame,
+    such as the shorthand properties of `{ x, y, z }`, reading the slots
+    directly. A variable not declared yet takes the generic closure. Gives
+    None for other counts.
+    """
+    if len(slots) == 2:
+        first, second = slots
+
+        def run(frame):
+            values = frame.values
+            a = values[first]
+            b = values[second]
+            if a is UNSET or b is UNSET:
+                return generic(frame)
+            return [a, b]
+        return run
+
+    if len(slots) == 3:
+        first, second, third = slots
+
+        def run(frame):
+            values = frame.values
+            a = values[first]
+            b = values[second]
+            c = values[third]
+            if a is UNSET or b is UNSET or c is UNSET:
+                return generic(frame)
+            return [a, b, c]
+        return run
+    return None
+
+def compile_object_expr(obj: ObjectExpression) -> Closure:
+    # A property without a value is shorthand for the variable of the same name
+    properties = [(prop.key, compile_lookup(prop.key, prop.depth, prop.slot) if prop.value is None else compile_node(prop.value)) for prop in obj.properties]
+    keys = tuple(key for key, value in properties)
+    shape = shape_of(keys)
+    values = compile_values([value for key, value in properties])
+    # Objects of variables of the frame itself, such as `{ x, y, z }`, read their slots directly
+    slots = [prop.slot if prop.depth == 0 else None if prop.value is None else local_slot(prop.value) for prop in obj.properties]
+    if None not in slots:
+        values = compile_local_values(slots, values) or values
+
+    def run(frame):
+        # make_object, inlined
+        obj = allocate(ObjectVal)
+        obj.shape = shape
+        obj.values = values(frame)
+        return obj
+
+    if len(shape.keys) != len(keys):
+        # A key given more than once keeps its last value
+        def run(frame):
+            values = {}
+            for key, value in properties:
+                values[key] = value(frame)
+            return ObjectVal(values)
+
+    if obj.constant:
+        # Objects of constants only are built once, BeamScript never mutates an object
+        constant = run(None)
+
+        def run(frame):
+            return constant
+    return run
+
+def compile_array_expr(array: ArrayExpression) -> Closure:
+    elements = compile_values([compile_node(element) for element in array.elements])
+
+    def run(frame):
+        return ArrayVal(elements(frame))
+    return run
+
+def compile_member_expr(expr: MemberExpression) -> Closure:
+    member_object = compile_node(expr.object)
+    if expr.computed:
+        key = compile_node(expr.property)
+
+        def run(frame):
+            value = member_object(frame)
+            return index_value(value, key(frame))
+        return run
+    name = expr.property.name
+
+    # Inline cache: the Shape of the last object read and the index of name in it
+    cached_shape = None
+    cached_index = None
+
+    slot = local_slot(expr.object)
+    if slot is not None:
+        # The object is a variable of the frame itself, read without calling its closure
+        def run(frame):
+            nonlocal cached_shape, cached_index
+            value = frame.values[slot]
+            if value is UNSET:
+                value = member_object(frame)
+            shape = value.shape
+            if shape is cached_shape:
+                return value.values[cached_index]
+            index = shape.index.get(name)
+            if index is None:
+                if value.__class__ is ArrayVal:
+                    return array_member(value, name)
+                raise Exception("The Member couldn't be found")
+            cached_shape = shape
+            cached_index = index
+            return value.values[index]
+        return run
+
+    def run(frame):
+        nonlocal cached_shape, cached_index
+        value = member_object(frame)
+        shape = value.shape
+        if shape is cached_shape:
+            return value.values[cached_index]
+        index = shape.index.get(name)
+        if index is None:
+            if value.__class__ is ArrayVal:
+                return array_member(value, name)
+            raise Exception("The Member couldn't be found")
+        cached_shape = shape
+        cached_index = index
+        return value.values[index]
+    return compile_member_chain(expr, run) or run
+
+def compile_member_chain(expr: MemberExpression, generic: Closure):
+    """
+    Compiles a chain of property reads, such as `config.server.port`, on an
+    object held by a variable of the current frame. Objects are never mutated,
+    so the chain remembers the last object it started from and the value it
+    ended with. A chain passing anything but objects, such as the length of
+    an array, takes the generic closure every time. Gives None for other
+    shapes and for single reads.
+    """
+    names = []
+    node = expr
+    while node.__class__ is MemberExpression and not node.computed:
+        names.append(node.property.name)
+        node = node.object
+    slot = local_slot(node)
+    if slot is None or len(names) < 2:
+        return None
+    names.reverse()
+    cached_base = None
+    cached_value = None
+
+    def run(frame):
+        nonlocal cached_base, cached_value
+        base = frame.values[slot]
+        if base is cached_base:
+            return cached_value
+        value = base
+        for name in names:
+            if value.__class__ is not ObjectVal:
+                return generic(frame)
+            index = value.shape.index.get(name)
+            if index is None:
+                return generic(frame)
+            value = value.values[index]
+        cached_base = base
+        cached_value = value
+        return value
+    return run
+
+def compile_call_expr(expr: CallExpression) -> Closure:
+    arguments = [compile_node(arg) for arg in expr.arguments]
+    callee = compile_node(expr.callee)
+
+    # The function this call ran last, unless it is memoized, with its compiled body and declaration frame
+    cached_fn = None
+    cached_invoke = None
+    cached_env = None
+
+    def call(fn, args, frame):
+        nonlocal cached_fn, cached_invoke, cached_env
+        if fn.__class__ is FunctionVal:
+            invoke = fn.compiled
+            if invoke is None:
+                # Declared by another engine, compile it on first call
+                invoke = fn.compiled = compile_function_value(fn)
+            cache = fn.memo
+            if cache is None:
+                cached_fn = fn
+                cached_invoke = invoke
+                cached_env = fn.declaration_env
+                return invoke(fn.declaration_env, args)
+            key, result = cache.lookup(args)
+            if result is memo.MISS:
+                result = invoke(fn.declaration_env, args)
+                if key is not None:
+                    cache.store(key, result)
+            return result
+        if fn.__class__ is NativeFn:
+            return fn.call(args, frame)
+
+        raise ValueError("Cannot call value that is not a function: " + str(fn))
+
+    # Calls with up to three arguments build their argument list in place
+    if len(arguments) == 1:
+        first, = arguments
+
+        def run(frame):
+            args = [first(frame)]
+            fn = callee(frame)
+            if fn is cached_fn:
+                return cached_invoke(cached_env, args)
+            return call(fn, args, frame)
+        return run
+
+    if len(arguments) == 2:
+        first, second = arguments
+
+        def run(frame):
+            args = [first(frame), second(frame)]
+            fn = callee(frame)
+            if fn is cached_fn:
+                return cached_invoke(cached_env, args)
+            return call(fn, args, frame)
+        return run
+
+    if len(arguments) == 3:
+        first, second, third = arguments
+
+        def run(frame):
+            args = [first(frame), second(frame), third(frame)]
+            fn = callee(frame)
+            if fn is cached_fn:
+                return cached_invoke(cached_env, args)
+            return call(fn, args, frame)
+        return run
+
+    values = compile_values(arguments)
+
+    def run(frame):
+        args = values(frame)
+        fn = callee(frame)
+        if fn is cached_fn:
+            return cached_invoke(cached_env, args)
+        return call(fn, args, frame)
+    return run
+
+# Missing nodes, such as an absent else branch, evaluate to null.
+def compile_missing(frame):
+    return NULL
+
+# Literal values are never mutated, so each literal builds its value only once.
+def compile_string_literal(literal: StringLiteral) -> Closure:
+    value = StringVal(literal.value)
+
+    def run(frame):
+        return value
+    return run
+
+def compile_numeric_literal(literal: NumericLiteral) -> Closure:
+    value = number(literal.value)
+
+    def run(frame):
+        return value
+    return run
+
+def compile_null_literal(literal: NullLiteral) -> Closure:
+    return compile_missing
+
+def compile_boolean_literal(literal: BooleanLiteral) -> Closure:
+    value = boolean(literal.value)
+
+    def run(frame):
+        return value
+    return run
+
+def compile_expr_stmt(stmt: ExpressionStatement) -> Closure:
+    return compile_node(stmt.expression)
+
+# Maps each AST node class to the function compiling it.
+COMPILERS = {
+    StringLiteral: compile_string_literal,
+    NumericLiteral: compile_numeric_literal,
+    NullLiteral: compile_null_literal,
+    BooleanLiteral: compile_boolean_literal,
+    Identifier: compile_identifier,
+    MemberExpression: compile_member_expr,
+    CallExpression: compile_call_expr,
+    UnaryExpression: compile_unary_expr,
+    LogicalExpression: compile_logical_expr,
+    ObjectExpression: compile_object_expr,
+    ArrayExpression: compile_array_expr,
+    AssignmentExpression: compile_assignment,
+    BinaryExpression: compile_binary_expr,
+    Program: compile_block,
+    VariableDeclaration: compile_var_declaration,
+    FunctionDeclaration: compile_fn_declaration,
+    IfStatement: compile_if_stmt,
+    WhileStatement: compile_while_loop,
+    ForStatement: compile_for_loop,
+    BlockStatement: compile_block,
+    ExpressionStatement: compile_expr_stmt,
+}
+
+def compile_node(node: Stmt) -> Closure:
+    if node is None:
+        return compile_missing
+
+    compiler = COMPILERS.get(node.__class__)
+    if compiler is None:
+        raise ValueError(f"This AST Node has not yet been set up for compilation: {node.type}")
+    return compiler(node)
+
+def compile_program(program: Program, globals=()) -> Closure:
+    resolve(program, globals)
+    return compile_node(program)
+
+def execute(program: Program, env: Environment) -> RuntimeVal:
+    run = compile_program(program, env.variables)
+    frame = Frame(env, program.scope)
+    try:
+        return run(frame)
+    finally:
+        # The program's variables end up in env, like on every other engine
+        frame.export(env)
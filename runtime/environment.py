@@ -1,5 +1,5 @@
 from typing import Optional
-from runtime.values import NumberVal, RuntimeVal, BooleanVal, NullVal, ObjectVal
+from runtime.values import NumberVal, RuntimeVal, BooleanVal, NullVal, ObjectVal, TRUE, FALSE
 
 class Environment:
     def __init__(self, parentENV: Optional['Environment'] = None):
@@ -26,12 +26,19 @@ class Environment:
             self.constants.append(varname)
         return value
 
+    def bindVar(self, varname: str, value: RuntimeVal) -> RuntimeVal:
+        # Sets the variable of a for loop in this scope, declared yet or not
+        if varname in self.constants:
+            raise ValueError(f"Cannot assign a value to variable {varname} as it was declared a constant.")
+        self.variables[varname] = value
+        return value
+
     def assignVar(self, varname: str, value) -> RuntimeVal:
         env = self.resolve(varname)
         if varname in env.constants:
             raise ValueError(f"Cannot assign a value to variable {varname} as it was declared a constant.")
         env.variables[varname] = value
-        return NumberVal(value)
+        return value
 
     def lookupVar(self, varname: str) -> RuntimeVal:
         env = self.resolve(varname)
@@ -43,11 +50,95 @@ class Environment:
         if self.parent is None:
             raise ValueError(f"Cannot resolve '{varname}' as it does not exist.")
         return self.parent.resolve(varname)
-   
+
+# Value of a Frame slot whose declaration has not run yet
+class Unset:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "UNSET"
+
+UNSET = Unset()
+
+"""
+Array backed scope of one function call or of the program, laid out by
+frontend.resolver. Variables are read and written by slot, their names are only
+needed on the slow paths, which behave exactly like Environment.
+- The chain of frames ends in an Environment holding the globals.
+"""
+class Frame:
+    __slots__ = ("parent", "layout", "values", "globals", "constants")
+
+    def __init__(self, parent, layout):
+        self.parent = parent
+        self.layout = layout
+        self.values = [UNSET] * len(layout.names)
+        self.globals: Environment = parent.globals if parent.__class__ is Frame else parent
+        # Slots declared constant here, only tracked when the layout declares them both ways
+        self.constants = None
+
+    def declare(self, slot: int, value: RuntimeVal, constant: bool) -> RuntimeVal:
+        if self.values[slot] is not UNSET:
+            raise ValueError(f"Cannot declare variable {self.layout.names[slot]}. As it already is defined.")
+        self.values[slot] = value
+
+        if constant and self.layout.constant[slot] is None:
+            if self.constants is None:
+                self.constants = set()
+            self.constants.add(slot)
+        return value
+
+    def bind(self, slot: int, value: RuntimeVal) -> RuntimeVal:
+        # Environment.bindVar of a slot
+        if self.is_constant(slot):
+            raise ValueError(f"Cannot assign a value to variable {self.layout.names[slot]} as it was declared a constant.")
+        self.values[slot] = value
+        return value
+
+    def is_constant(self, slot: int) -> bool:
+        constant = self.layout.constant[slot]
+        if constant is None:
+            return self.constants is not None and slot in self.constants
+        return constant
+
+    def find(self, varname: str):
+        # The frame or Environment where varname is declared by now, like Environment.resolve
+        frame = self
+        while frame.__class__ is Frame:
+            slot = frame.layout.slots.get(varname)
+            if slot is not None and frame.values[slot] is not UNSET:
+                return frame, slot
+            frame = frame.parent
+        return frame.resolve(varname), None
+
+    def lookupVar(self, varname: str) -> RuntimeVal:
+        scope, slot = self.find(varname)
+        if slot is None:
+            return scope.variables[varname]
+        return scope.values[slot]
+
+    def assignVar(self, varname: str, value: RuntimeVal) -> RuntimeVal:
+        scope, slot = self.find(varname)
+        if slot is None:
+            return scope.assignVar(varname, value)
+        if scope.is_constant(slot):
+            raise ValueError(f"Cannot assign a value to variable {varname} as it was declared a constant.")
+        scope.values[slot] = value
+        return value
+
+    def export(self, env: Environment):
+        # Declares every variable set in this frame in env, e.g. the program's variables once it has run
+        for slot, value in enumerate(self.values):
+            if value is not UNSET:
+                varname = self.layout.names[slot]
+                env.variables[varname] = value
+                if self.is_constant(slot) and varname not in env.constants:
+                    env.constants.append(varname)
+
 def createGlobalEnv():
     env = Environment()
-    env.declareVar("true", BooleanVal(True), True) 
-    env.declareVar("false", BooleanVal(False), True)
+    env.declareVar("true", TRUE, True)
+    env.declareVar("false", FALSE, True)
 
     from runtime.values import NativeFn
     def printout(args, scope):
@@ -63,4 +154,7 @@ def createGlobalEnv():
 
     env.declareVar("con", ObjectVal({'out': ObjectVal({'print': NativeFn(printout), 'println': NativeFn(printlnout)}), 'in': NativeFn(inputin)}), True)
 
+    from runtime.parallel import par_map, par_reduce
+    env.declareVar("par", ObjectVal({'map': NativeFn(par_map), 'reduce': NativeFn(par_reduce)}), True)
+
     return env
\ No newline at end of file
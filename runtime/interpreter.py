@@ -1,43 +1,77 @@
-from frontend.ast import AssignmentExpression, BinaryExpression, CallExpression, LogicalExpression, MemberExpression, ObjectExpression, Stmt, Program, UnaryExpression, VariableDeclaration, NumericLiteral, Identifier, StringLiteral, IfStatement, WhileStatement
-from runtime.values import FunctionVal, NativeFn, NullVal, NumberVal, ObjectVal, RuntimeVal, StringVal, BooleanVal
+from frontend.ast import ArrayExpression, AssignmentExpression, BinaryExpression, BlockStatement, BooleanLiteral, CallExpression, Expr, ExpressionStatement, ForStatement, FunctionDeclaration, LogicalExpression, MemberExpression, NullLiteral, ObjectExpression, Stmt, Program, UnaryExpression, VariableDeclaration, NumericLiteral, Identifier, StringLiteral, IfStatement, WhileStatement, RangeExpression
+from runtime.values import ArrayVal, FunctionVal, NativeFn, NullVal, NumberVal, ObjectVal, RuntimeVal, StringVal, BooleanVal, NULL, TRUE, FALSE, SMALL_NUMBERS, number, boolean, make_object, shape_of, array_member, index_value, iterate, count_range
 from frontend.lexer import TokenType
 from runtime.environment import Environment
+from runtime import memo, vector
+from runtime.closures import ARITHMETIC_OPERATORS, COMPARISON_OPERATORS
+from functools import partial
 from math import pow
 
 def eval_program(program: Program, env: Environment) -> RuntimeVal:
-    last_evaluated: RuntimeVal = NullVal().__dict__
-    for statement in program["body"]:
+    last_evaluated: RuntimeVal = NULL
+    for statement in program.body:
         last_evaluated = evaluate(statement, env)
     return last_evaluated
 
 def eval_var_declaration(declaration: VariableDeclaration, env: Environment) -> RuntimeVal:
-    for declarator in declaration["declarations"]:
-        identifier = declarator["id"]["name"]
-        value = evaluate(declarator["init"], env)
-        env.declareVar(identifier, value, declaration["constant"])
+    for declarator in declaration.declarations:
+        identifier = declarator.id.name
+        value = evaluate(declarator.init, env)
+        env.declareVar(identifier, value, declaration.constant)
         
 def eval_fn_declaration(declaration: VariableDeclaration, env: Environment) -> RuntimeVal:
-    fn = FunctionVal(declaration["id"]["name"], declaration["params"], env, declaration["body"])
+    fn = FunctionVal(declaration.id.name, declaration.params, env, declaration.body)
+    if declaration.memoized:
+        fn.memo = memo.new_cache(declaration)
     
-    env.declareVar(declaration["id"]["name"], fn, True)
+    env.declareVar(declaration.id.name, fn, True)
 
 def eval_if_stmt(stmt: IfStatement, env: Environment) -> RuntimeVal:
-    condition = evaluate(stmt["condition"], env)
-    if condition["value"]:
-        evaluate(stmt["consequent"], env)
+    condition = evaluate(stmt.condition, env)
+    if condition.value:
+        evaluate(stmt.consequent, env)
     else:
-        evaluate(stmt["alternate"], env)
+        evaluate(stmt.alternate, env)
 
 def eval_while_loop(stmt: WhileStatement, env: Environment):
+    iterations = 0
     while True:
-        condition = evaluate(stmt["condition"], env)
+        site = stmt.site
+        if site is not None:
+            if site(env):
+                break
+            # A site deoptimized, the loop is specialized again once the sites in it are
+            stmt.site = None
+            iterations = 0
+
+        condition = evaluate(stmt.condition, env)
         
         if not condition.value: break
         
-        evaluate(stmt["body"], env)
-            
-            
-        
+        evaluate(stmt.body, env)
+        iterations += 1
+        if iterations == SPECIALIZE_AFTER + 1:
+            # The sites in the body specialize within SPECIALIZE_AFTER iterations
+            stmt.site = specialize_loop(stmt)
+
+def eval_for_loop(stmt: ForStatement, env: Environment):
+    iterable = stmt.iterable
+    if iterable.__class__ is RangeExpression:
+        # Counts with a Python range, the bounds are evaluated once
+        start = evaluate(iterable.start, env)
+        stop = evaluate(iterable.stop, env)
+        step = evaluate(iterable.step, env)
+        values = map(number, count_range(start, stop, step))
+    else:
+        values = iterate(evaluate(iterable, env))
+
+    name = stmt.variable.name
+    body = stmt.body
+    bind = env.bindVar
+    for value in values:
+        bind(name, value)
+        evaluate(body, env)
+
 
 def eval_numeric_binary_expr(lhs: NumberVal, rhs: NumberVal, operator: str) -> NumberVal:
     result: int
@@ -57,188 +91,478 @@ def eval_numeric_binary_expr(lhs: NumberVal, rhs: NumberVal, operator: str) -> N
     elif operator == "^":
         result = lhs ** rhs
 
-    return NumberVal(result).__dict__
+    return number(result)
 
 def eval_comparison_expr(lhs: NumberVal, rhs: NumberVal, operator: str) -> RuntimeVal:
     # Evaluate based on the operator
     if operator == "==":
-        return BooleanVal(lhs == rhs).__dict__
+        return boolean(lhs == rhs)
     elif operator == "!=":
-        return BooleanVal(lhs != rhs).__dict__
+        return boolean(lhs != rhs)
     elif operator == "<":
-        return BooleanVal(lhs < rhs).__dict__
+        return boolean(lhs < rhs)
     elif operator == "<=":
-        return BooleanVal(lhs <= rhs).__dict__
+        return boolean(lhs <= rhs)
     elif operator == ">":
-        return BooleanVal(lhs > rhs).__dict__
+        return boolean(lhs > rhs)
     elif operator == ">=":
-        return BooleanVal(lhs >= rhs).__dict__
+        return boolean(lhs >= rhs)
     else:
         raise ValueError("Invalid operator in comparison expression")
 
 
+"""
+Type feedback of one BinaryExpression.
+Counts how often in a row its operands were numbers of the same Python types.
+Once that reaches SPECIALIZE_AFTER, `specialize` binds a function evaluating
+the expression for just those types to `binop.site`. When the types change
+the site is dropped again, and after MAX_DEOPTS changes it stays generic.
+"""
+class BinaryFeedback:
+    __slots__ = ("types", "hits", "deopts")
+
+    def __init__(self):
+        self.types = None
+        self.hits = 0
+        self.deopts = 0
+
+SPECIALIZE_AFTER = 8
+MAX_DEOPTS = 4
+# Sites deoptimized so far, a specialized loop stops using its sites once this changes
+DEOPTIMIZATIONS = 0
+# Makes a NumberVal without running `__init__`, the specialized assignments set its value
+allocate = object.__new__
+
 def eval_binary_expr(binop: BinaryExpression, env: Environment) -> RuntimeVal:
-    lhs = evaluate(binop['left'], env)
-    rhs = evaluate(binop['right'], env)
+    site = binop.site
+    if site is not None:
+        return site(env)
+
+    lhs = evaluate(binop.left, env)
+    rhs = evaluate(binop.right, env)
+    result = eval_binary_values(binop, lhs, rhs)
 
-    if lhs["type"] == "number" and rhs["type"] == "number":
-        if binop["operator"] in {"+", "-", "*", "/", "%", "^"}:
-            return eval_numeric_binary_expr(lhs["value"], rhs["value"], binop['operator'])
+    if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+        feedback = binop.feedback
+        if feedback is None:
+            feedback = binop.feedback = BinaryFeedback()
+        types = (lhs.value.__class__, rhs.value.__class__)
+        if feedback.types == types:
+            feedback.hits += 1
+            if feedback.hits >= SPECIALIZE_AFTER and feedback.deopts < MAX_DEOPTS:
+                binop.site = specialize(binop, *types)
         else:
-            return eval_comparison_expr(lhs["value"], rhs["value"], binop['operator'])
+            feedback.types = types
+            feedback.hits = 1
+    return result
+
+def eval_binary_values(binop: BinaryExpression, lhs: RuntimeVal, rhs: RuntimeVal) -> RuntimeVal:
+    if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+        if binop.operator in {"+", "-", "*", "/", "%", "^"}:
+            return eval_numeric_binary_expr(lhs.value, rhs.value, binop.operator)
+        else:
+            return eval_comparison_expr(lhs.value, rhs.value, binop.operator)
+    if lhs.__class__ is ArrayVal or rhs.__class__ is ArrayVal:
+        return vector.binary(binop.operator, lhs, rhs)
+
+    return NULL
+
+def deoptimize(binop: BinaryExpression, lhs: RuntimeVal, rhs: RuntimeVal) -> RuntimeVal:
+    # Operands of other types reached a specialized site, its operands are already evaluated
+    global DEOPTIMIZATIONS
+    DEOPTIMIZATIONS += 1
+    binop.site = None
+    feedback = binop.feedback
+    feedback.types = None
+    feedback.deopts += 1
+    return eval_binary_values(binop, lhs, rhs)
+
+def operation(binop: BinaryExpression, left_type: type, right_type: type):
+    # The operator function of a site for numbers of left_type and right_type, and what boxes its result
+    if binop.operator in COMPARISON_OPERATORS:
+        # Comparing two numbers gives a bool, which indexes its BooleanVal
+        return COMPARISON_OPERATORS[binop.operator], (FALSE, TRUE).__getitem__
+    # Only int operations can produce a cached small int
+    return ARITHMETIC_OPERATORS[binop.operator], number if left_type is int and right_type is int else NumberVal
+
+def specialize(binop: BinaryExpression, left_type: type, right_type: type):
+    """
+    Builds `site(env)` evaluating binop for numbers of left_type and right_type
+    with its operator function bound up front. Identifiers are looked up, a
+    numeric literal on the right is read and nested BinaryExpressions are
+    evaluated without going through `evaluate`.
+    """
+    apply, box = operation(binop, left_type, right_type)
+    left = binop.left
+    right = binop.right
+    if left.__class__ is Identifier and right.__class__ is NumericLiteral and right.value.__class__ is right_type:
+        # `i + 1`, `i < n`, the shapes counting loops are made of
+        name = left.name
+        constant = right.value
+        rhs = number(constant)
+
+        def site(env):
+            variables = env.variables
+            lhs = variables[name] if name in variables else lookup(env, name)
+            if lhs.__class__ is NumberVal and lhs.value.__class__ is left_type:
+                return box(apply(lhs.value, constant))
+            return deoptimize(binop, lhs, rhs)
+        return site
+
+    if left.__class__ is Identifier and right.__class__ is Identifier:
+        left_name = left.name
+        right_name = right.name
+
+        def site(env):
+            variables = env.variables
+            lhs = variables[left_name] if left_name in variables else lookup(env, left_name)
+            rhs = variables[right_name] if right_name in variables else lookup(env, right_name)
+            if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal and lhs.value.__class__ is left_type and rhs.value.__class__ is right_type:
+                return box(apply(lhs.value, rhs.value))
+            return deoptimize(binop, lhs, rhs)
+        return site
+
+    left_operand = operand(left)
+    right_operand = operand(right)
+
+    def site(env):
+        lhs = left_operand(env)
+        rhs = right_operand(env)
+        if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal and lhs.value.__class__ is left_type and rhs.value.__class__ is right_type:
+            return box(apply(lhs.value, rhs.value))
+        return deoptimize(binop, lhs, rhs)
+    return site
+
+def operand(node: Expr):
+    # Evaluates an operand of a specialized site, like `evaluate` does
+    if node.__class__ is BinaryExpression:
+        return partial(eval_binary_expr, node)
+    if node.__class__ is Identifier:
+        name = node.name
+
+        def read(env):
+            variables = env.variables
+            return variables[name] if name in variables else lookup(env, name)
+        return read
+    if node.__class__ is NumericLiteral:
+        value = number(node.value)
+
+        def read(env):
+            return value
+        return read
+    return partial(evaluate, node)
+
+def specialize_assignment(node: AssignmentExpression):
+    """
+    Builds `site(env)` assigning the value of a specialized BinaryExpression,
+    straight into env when the variable is declared there and not constant.
+    `i = i + 1` and `total = total + i` do the arithmetic of the BinaryExpression
+    in place, guarded the same way, and box its result like `number` without
+    calling it.
+    """
+    name = node.left.name
+    binop = node.right
+    left = binop.left
+    right = binop.right
+    left_type, right_type = binop.feedback.types
+    apply = ARITHMETIC_OPERATORS.get(binop.operator)
+
+    if apply is not None and left.__class__ is Identifier and right.__class__ is NumericLiteral and right.value.__class__ is right_type:
+        source = left.name
+        constant = right.value
+        rhs = number(constant)
+
+        def site(env):
+            variables = env.variables
+            lhs = variables[source] if source in variables else lookup(env, source)
+            if lhs.__class__ is NumberVal and lhs.value.__class__ is left_type:
+                result = apply(lhs.value, constant)
+                if result.__class__ is int and -5 <= result <= 256:
+                    value = SMALL_NUMBERS[result + 5]
+                else:
+                    value = allocate(NumberVal)
+                    value.value = result
+            else:
+                node.site = None
+                value = deoptimize(binop, lhs, rhs)
+            if name in variables and name not in env.constants:
+                variables[name] = value
+                return value
+            return env.assignVar(name, value)
+        return site
 
-    return NullVal().__dict__
+    if apply is not None and left.__class__ is Identifier and right.__class__ is Identifier:
+        left_name = left.name
+        right_name = right.name
+
+        def site(env):
+            variables = env.variables
+            lhs = variables[left_name] if left_name in variables else lookup(env, left_name)
+            rhs = variables[right_name] if right_name in variables else lookup(env, right_name)
+            if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal and lhs.value.__class__ is left_type and rhs.value.__class__ is right_type:
+                result = apply(lhs.value, rhs.value)
+                if result.__class__ is int and -5 <= result <= 256:
+                    value = SMALL_NUMBERS[result + 5]
+                else:
+                    value = allocate(NumberVal)
+                    value.value = result
+            else:
+                node.site = None
+                value = deoptimize(binop, lhs, rhs)
+            if name in variables and name not in env.constants:
+                variables[name] = value
+                return value
+            return env.assignVar(name, value)
+        return site
+
+    def site(env):
+        value_site = binop.site
+        if value_site is None:
+            # The value deoptimized, the assignment is generic until it specializes again
+            node.site = None
+            return eval_assignment(node, env)
+        value = value_site(env)
+        variables = env.variables
+        if name in variables and name not in env.constants:
+            variables[name] = value
+            return value
+        return env.assignVar(name, value)
+    return site
+
+def loop_step(statement: Stmt):
+    # The site a loop runs a statement of its body with
+    node = statement.expression if statement.__class__ is ExpressionStatement else statement
+    if node.__class__ is AssignmentExpression or node.__class__ is BinaryExpression:
+        if node.site is not None:
+            return node.site
+
+    def step(env):
+        return evaluate(statement, env)
+    return step
+
+def specialize_loop(stmt: WhileStatement):
+    """
+    Builds `site(env)` running a while loop with the sites of its condition and
+    statements called directly, instead of dispatching through `evaluate`. It
+    gives False when a site deoptimized, after finishing the iteration it was in,
+    and True once the loop ended.
+    """
+    condition = stmt.condition
+    test = condition.site if condition.__class__ is BinaryExpression else None
+    if test is None:
+        def test(env):
+            return evaluate(condition, env)
+    body = stmt.body.body if stmt.body.__class__ is BlockStatement else [stmt.body]
+    steps = tuple(loop_step(statement) for statement in body)
+    generation = DEOPTIMIZATIONS
+
+    def site(env):
+        if DEOPTIMIZATIONS != generation:
+            return False
+        while test(env).value:
+            for step in steps:
+                step(env)
+            if DEOPTIMIZATIONS != generation:
+                return False
+        return True
+    return site
+
+def lookup(env: Environment, name: str) -> RuntimeVal:
+    # Environment.lookupVar with the parent chain walk inlined
+    scope = env
+    while name not in scope.variables:
+        scope = scope.parent
+        if scope is None:
+            raise ValueError(f"Cannot resolve '{name}' as it does not exist.")
+    return scope.variables[name]
 
 def eval_identifier(ident: Identifier, env: Environment) -> RuntimeVal:
-    val = env.lookupVar(ident["name"])
+    val = env.lookupVar(ident.name)
     return val
 
 def eval_assignment(node: AssignmentExpression, env: Environment) -> RuntimeVal:
-    if (node["assigne"]["type"] != "Identifier"):
+    site = node.site
+    if site is not None:
+        return site(env)
+
+    if node.left.type != "Identifier":
         raise Exception("Invalid LHS inside assignment expression")
     
-    varname = node["assigne"]["name"]
-    return env.assignVar(varname, evaluate(node["value"], env))
+    varname = node.left.name
+    result = env.assignVar(varname, evaluate(node.right, env))
+    if node.right.__class__ is BinaryExpression and node.right.site is not None:
+        node.site = specialize_assignment(node)
+    return result
 
 def eval_unary_expr(expr: UnaryExpression, env: Environment) -> RuntimeVal:
-    operator = expr["operator"]
-    operand = evaluate(expr["argument"], env)
+    operator = expr.operator
+    operand = evaluate(expr.argument, env)
     if operator == "+":
         # Evaluate plus
-        if operand["type"] == "number":
-            return NumberVal(+operand["value"])
+        if operand.__class__ is NumberVal:
+            return number(+operand.value)
         else:
             raise ValueError("Unary plus operator can only be applied to numbers.")
     if operator == "-":
         # Evaluate negation
-        if operand["type"] == "number":
-            return NumberVal(-operand["value"])
+        if operand.__class__ is NumberVal:
+            return number(-operand.value)
         else:
             raise ValueError("Unary negation can only be applied to numbers.")
     if operator in {"not", "!"}:
         # Evaluate logical negation
-        if operand["type"] == "boolean":
-            return BooleanVal(not operand["value"])
+        if operand.__class__ is BooleanVal:
+            return boolean(not operand.value)
         else:
             raise ValueError("Logical not can only be applied to booleans.")
     else:
         raise ValueError("Unsupported unary operator: " + operator)
 
 def eval_logical_expr(expr: LogicalExpression, env: Environment) -> RuntimeVal:
-    left_val = evaluate(expr["left"], env)
-    right_val = evaluate(expr["right"], env)
+    left_val = evaluate(expr.left, env)
+    right_val = evaluate(expr.right, env)
     
     # Evaluate logical AND
-    if expr["operator"] in {"and", "&&"}:
+    if expr.operator in {"and", "&&"}:
         if left_val == right_val:
             return left_val
         else:
-            return BooleanVal(False).__dict__
+            return FALSE
     
     # Evaluate logical OR
-    if expr["operator"] in {"or", "||"}:
-        if left_val["value"] == "True":
-            return BooleanVal(True).__dict__
+    if expr.operator in {"or", "||"}:
+        if left_val.value:
+            return TRUE
         return right_val
 
     raise ValueError("Invalid operator in logical expression")
 
 def eval_object_expr(obj: ObjectExpression, env: Environment) -> RuntimeVal:
-    # Create an instance of ObjectVal
-    object_val = {
-        "properties": {}
-    }
+    # Objects of constants only are built once, BeamScript never mutates an object
+    if obj.constant and obj.value is not None:
+        return obj.value
+
+    values = []
 
     # Iterate over properties of the object
-    for prop in obj["properties"]:
-        key = prop["key"]
-        value = prop["value"]
+    for prop in obj.properties:
+        key = prop.key
+        value = prop.value
         # Lookup variable if value is None, otherwise evaluate the expression
-        runtime_val = env.lookupVar(key) if value is None else evaluate(value, env)
-    
-        # Update properties of the ObjectVal instance
-        object_val["properties"][key] = runtime_val    
+        values.append(env.lookupVar(key) if value is None else evaluate(value, env))
 
-    # Return the ObjectVal instance
-    return ObjectVal(object_val["properties"]).__dict__
+    shape = obj.shape
+    if shape is None:
+        shape = obj.shape = shape_of(tuple(prop.key for prop in obj.properties))
+    if len(values) == len(shape.keys):
+        value = make_object(shape, values)
+    else:
+        # A key given more than once keeps its last value
+        value = ObjectVal(dict(zip([prop.key for prop in obj.properties], values)))
+    if obj.constant:
+        obj.value = value
+    return value
+
+def eval_array_expr(array: ArrayExpression, env: Environment) -> RuntimeVal:
+    return ArrayVal([evaluate(element, env) for element in array.elements])
 
 def eval_member_expr(expr: MemberExpression, env: Environment) -> RuntimeVal:
-    if expr["object"]["type"] == "Identifier":
-        value = env.lookupVar(expr["object"]["name"])
-    elif expr["object"]["type"] == "MemberExpression":
-        value = evaluate(expr["object"], env)
+    value = evaluate(expr.object, env)
+    if expr.computed:
+        return index_value(value, evaluate(expr.property, env))
+    shape = value.shape
 
-    if expr["property"]["name"] in value.properties:
-        return value.properties[expr["property"]["name"]]
-    else:
+    # Inline cache hit, the object has the shape the last read saw
+    if shape is expr.shape:
+        return value.values[expr.index]
+
+    index = shape.index.get(expr.property.name)
+    if index is None:
+        if value.__class__ is ArrayVal:
+            return array_member(value, expr.property.name)
         raise Exception("The Member couldn't be found")
+    expr.shape = shape
+    expr.index = index
+    return value.values[index]
     
 
 def eval_call_expr(expr: CallExpression, env: Environment) -> RuntimeVal:
-    args = [evaluate(arg, env) for arg in expr["arguments"]]
-    fn = evaluate(expr["callee"], env)
+    args = [evaluate(arg, env) for arg in expr.arguments]
+    fn = evaluate(expr.callee, env)
 
     if fn.type == "native_fn":
         result = fn.call(args, env)
         return result
     if fn.type == "function":
         func = fn
+        cache = func.memo
+        if cache is not None:
+            # Looked up before any scope is created
+            key, result = cache.lookup(args)
+            if result is not memo.MISS:
+                return result
         scope = Environment(func.declaration_env)
         
         i = 0
         for i in range(len(func.params)):
             # TODO Check the bounds here.
             # verify arity of function
-            varname = func.params[i]["name"]
+            varname = func.params[i].name
             scope.declareVar(varname, args[i], False)
             
-        return evaluate(func.body, scope)
+        result = evaluate(func.body, scope)
+        if cache is not None and key is not None:
+            cache.store(key, result)
+        return result
 
     raise ValueError("Cannot call value that is not a function: " + str(fn))
 
-def evaluate(astNode: Stmt, env: Environment) -> RuntimeVal:
-    if astNode == None:
-        return NullVal()
-    if astNode == {}:
-        return None
-    
-    if astNode["type"] == "StringLiteral":
-        return StringVal(astNode["value"]).__dict__
-    elif astNode["type"] == "NumericLiteral":
-        return NumberVal(astNode["value"]).__dict__
-    elif astNode["type"] == "NullLiteral":
-        return NullVal().__dict__
-    elif astNode["type"] == "Identifier":
-        return eval_identifier(astNode, env)
-    elif astNode["type"] == "MemberExpression":
-        return eval_member_expr(astNode, env)
-    elif astNode["type"] == "CallExpression":
-        return eval_call_expr(astNode, env)
-    elif astNode["type"] == "UnaryExpression":
-        return eval_unary_expr(astNode, env)
-    elif astNode["type"] == "LogicalExpression":
-        return eval_logical_expr(astNode, env)
-    elif astNode["type"] == "ObjectExpression":
-        return eval_object_expr(astNode, env)
-    elif astNode["type"] == "AssignmentExpression":
-        return eval_assignment(astNode, env)
-    elif astNode["type"] == "BinaryExpression":
-        return eval_binary_expr(astNode, env)
-    elif astNode["type"] == "Program":
-        return eval_program(astNode, env)
-    elif astNode["type"] == "VariableDeclaration":
-        return eval_var_declaration(astNode, env)
-    elif astNode["type"] == "FunctionDeclaration":
-        return eval_fn_declaration(astNode, env)
-    elif astNode["type"] == "IfStatement":
-        return eval_if_stmt(astNode, env)
-    elif astNode["type"] == "WhileStatement":
-        return eval_while_loop(astNode, env)
-    elif astNode["type"] == "BlockStatement":
-        return eval_program(astNode, env)
-    elif astNode["type"] == "ExpressionStatement":
-        return evaluate(astNode["expression"], env)
-    else:
-        print("This AST Node has not yet been set up for interpretation:", astNode)
+def eval_string_literal(literal: StringLiteral, env: Environment) -> RuntimeVal:
+    return StringVal(literal.value)
+
+def eval_numeric_literal(literal: NumericLiteral, env: Environment) -> RuntimeVal:
+    return number(literal.value)
 
+def eval_null_literal(literal: NullLiteral, env: Environment) -> RuntimeVal:
+    return NULL
 
+def eval_boolean_literal(literal: BooleanLiteral, env: Environment) -> RuntimeVal:
+    return boolean(literal.value)
+
+def eval_expr_stmt(stmt: ExpressionStatement, env: Environment) -> RuntimeVal:
+    return evaluate(stmt.expression, env)
+
+# Maps each AST node class to the function evaluating it.
+EVALUATORS = {
+    StringLiteral: eval_string_literal,
+    NumericLiteral: eval_numeric_literal,
+    NullLiteral: eval_null_literal,
+    BooleanLiteral: eval_boolean_literal,
+    Identifier: eval_identifier,
+    MemberExpression: eval_member_expr,
+    CallExpression: eval_call_expr,
+    UnaryExpression: eval_unary_expr,
+    LogicalExpression: eval_logical_expr,
+    ObjectExpression: eval_object_expr,
+    ArrayExpression: eval_array_expr,
+    AssignmentExpression: eval_assignment,
+    BinaryExpression: eval_binary_expr,
+    Program: eval_program,
+    VariableDeclaration: eval_var_declaration,
+    FunctionDeclaration: eval_fn_declaration,
+    IfStatement: eval_if_stmt,
+    WhileStatement: eval_while_loop,
+    ForStatement: eval_for_loop,
+    BlockStatement: eval_program,
+    ExpressionStatement: eval_expr_stmt,
+}
+
+def evaluate(astNode: Stmt, env: Environment) -> RuntimeVal:
+    if astNode is None:
+        return NULL
+
+    evaluator = EVALUATORS.get(astNode.__class__)
+    if evaluator is None:
+        print("This AST Node has not yet been set up for interpretation:", astNode)
+        return None
+    return evaluator(astNode, env)
@@ -0,0 +1,130 @@
+from frontend.ast import FunctionDeclaration
+from runtime.values import BooleanVal, NullVal, NumberVal, StringVal
+from collections import OrderedDict
+from typing import Dict, Optional
+import json
+
+"""
+Memoized functions.
+`memo def f(...)` declares a function whose results are cached by its
+arguments, so calling it again with the same arguments returns the first
+result without creating a scope or running the body. `memo(n) def` caches at
+most n results, plain `memo def` DEFAULT_SIZE, and 0 keeps every result.
+- Null, booleans, numbers and strings make up keys, told apart by type, so
+  1, 1.0 and true are different arguments, as are 0.0 and -0.0. A call with
+  any other argument, such as an object, runs uncached and counts as skipped.
+- Every function value gets a MemoCache of its own. A function declared in
+  another one gets a new, empty cache each time its declaration runs, as its
+  results may depend on the variables it closes over.
+- Once a cache is full the least recently used result is evicted.
+- The counters of every cache of one declaration add up in its MemoStats.
+A hit skips everything the body would have done, memoized functions are
+expected to be pure. An array one returns is the same array on every hit.
+"""
+DEFAULT_SIZE = 1024
+
+# What MemoCache.lookup gives for a call that has no cached result
+MISS = object()
+
+NULL_KEY = ("null",)
+
+def raw_key(value) -> Optional[tuple]:
+    # Key of a bare Python value as transpiled code holds it, None when it can't be one
+    cls = value.__class__
+    if cls is int or cls is str or cls is bool:
+        return (cls, value)
+    if cls is float:
+        return (float, value.hex())
+    if cls is complex:
+        return (complex, value.real.hex(), value.imag.hex())
+    if value is None:
+        return NULL_KEY
+    return None
+
+def value_key(value) -> Optional[tuple]:
+    cls = value.__class__
+    if cls is NumberVal or cls is StringVal or cls is BooleanVal:
+        return raw_key(value.value)
+    if cls is NullVal:
+        return NULL_KEY
+    return None
+
+class MemoStats:
+    __slots__ = ("name", "size", "caches", "hits", "misses", "evictions", "skipped")
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.caches = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+# Stats of every memoized declaration that made a function value so far
+STATS: Dict[FunctionDeclaration, MemoStats] = {}
+
+class MemoCache:
+    __slots__ = ("results", "size", "stats", "key")
+
+    def __init__(self, size: int, stats: MemoStats, key=value_key):
+        self.results = OrderedDict()
+        self.size = size
+        self.stats = stats
+        # Key of one argument
+        self.key = key
+
+    def lookup(self, args: list):
+        """
+        (key, result) of a call with args. The key is None when an argument
+        can't be part of one, the result is MISS unless it was cached.
+        """
+        keys = tuple(map(self.key, args))
+        if None in keys:
+            self.stats.skipped += 1
+            return None, MISS
+        result = self.results.get(keys, MISS)
+        if result is MISS:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+            self.results.move_to_end(keys)
+        return keys, result
+
+    def store(self, key: tuple, result):
+        results = self.results
+        results[key] = result
+        if self.size and len(results) > self.size:
+            results.popitem(last=False)
+            self.stats.evictions += 1
+        return result
+
+def new_cache(declaration: FunctionDeclaration, key=value_key) -> MemoCache:
+    # The cache of a new function value of a memoized declaration
+    stats = STATS.get(declaration)
+    if stats is None:
+        size = DEFAULT_SIZE if declaration.memo_size is None else declaration.memo_size
+        stats = STATS[declaration] = MemoStats(declaration.id.name, size)
+    stats.caches += 1
+    return MemoCache(stats.size, stats, key)
+
+def to_dict() -> list:
+    return [stats.to_dict() for stats in STATS.values()]
+
+def write(path: str):
+    with open(path, "w") as file:
+        json.dump(to_dict(), file, indent=2)
+
+def report() -> str:
+    lines = [f"{'memoized function':<22}{'size':>8}{'hits':>10}{'misses':>10}{'hit rate':>10}{'evicted':>10}{'skipped':>10}"]
+    for stats in STATS.values():
+        lookups = stats.hits + stats.misses
+        rate = stats.hits / lookups if lookups else 0.0
+        size = stats.size or "-"
+        lines.append(f"{stats.name:<22}{size:>8}{stats.hits:>10}{stats.misses:>10}{rate:>10.1%}{stats.evictions:>10}{stats.skipped:>10}")
+    if not STATS:
+        lines.append("no memoized function was declared")
+    return "\n".join(lines)
@@ -0,0 +1,175 @@
+from frontend.ast import Program
+from runtime.environment import Environment, Frame
+from runtime.values import FunctionVal, RuntimeVal, FALSE, NULL, SMALL_NUMBERS, TRUE
+from runtime import interpreter
+from collections import Counter
+from contextlib import contextmanager
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+"""
+Memory accounting of the tree-walking interpreter.
+MemoryTracker.instrument() runs the program under tracemalloc and, like
+runtime.stats, swaps its counters in for the duration of the run only:
+- the evaluator of Program, which runs the top-level statements of the program
+  one by one, recording the peak memory of each and how much it left allocated
+- Environment.__init__, counting the scopes created, one per call
+Once the program has run, the live objects are counted by type, and the
+environments still reachable from the `declaration_env` of a live function
+are reported as retained by closures, with the functions retaining them.
+The shared values built at import, null, the booleans and the small integers,
+are not counted.
+"""
+SHARED = frozenset(map(id, [NULL, TRUE, FALSE, *SMALL_NUMBERS]))
+
+def deep_size(env) -> int:
+    # Bytes of a scope and of the containers holding its variables, without the values
+    if env.__class__ is Frame:
+        return sys.getsizeof(env) + sys.getsizeof(env.values)
+    return sys.getsizeof(env) + sys.getsizeof(env.__dict__) + sys.getsizeof(env.variables) + sys.getsizeof(env.constants)
+
+class MemoryTracker:
+    def __init__(self, program: Program, path: str):
+        self.program = program
+        with open(path) as file:
+            self.source = file.read()
+        self.filename = os.path.basename(path)
+        # (label, peak bytes, bytes left allocated) of every top-level statement run
+        self.statements = []
+        self.peak = 0
+        self.environments_created = 0
+        # Type name -> live instances once the program has run
+        self.live = Counter()
+        # Function name -> live function values, scopes they retain, bytes of those scopes
+        self.closures = Counter()
+        self.retained = Counter()
+        self.retained_bytes = Counter()
+        self.retained_total = 0
+        self.retained_total_bytes = 0
+
+    def label(self, index: int) -> str:
+        starts = self.program.starts
+        if starts is None or index >= len(starts):
+            return f"statement {index + 1}"
+        offset = starts[index]
+        line = self.source.count("\n", 0, offset) + 1
+        end = self.source.find("\n", offset)
+        text = self.source[offset:end if end >= 0 else len(self.source)].strip()
+        if len(text) > 40:
+            text = text[:37] + "..."
+        return f"{line}: {text}"
+
+    def measured(self, eval_program):
+        program = self.program
+        statements = self.statements
+        evaluate = interpreter.evaluate
+
+        def run(node, env):
+            # Blocks and any other program run as before
+            if node is not program:
+                return eval_program(node, env)
+            last_evaluated = interpreter.NULL
+            for index, statement in enumerate(node.body):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                try:
+                    last_evaluated = evaluate(statement, env)
+                finally:
+                    current, peak = tracemalloc.get_traced_memory()
+                    statements.append((self.label(index), peak - before, current - before))
+            return last_evaluated
+        return run
+
+    def counted_init(self, init):
+        tracker = self
+
+        def __init__(self, *args, **kwargs):
+            tracker.environments_created += 1
+            init(self, *args, **kwargs)
+        return __init__
+
+    @contextmanager
+    def instrument(self):
+        eval_program = interpreter.EVALUATORS[Program]
+        init = Environment.__init__
+        tracing = tracemalloc.is_tracing()
+
+        interpreter.EVALUATORS[Program] = self.measured(eval_program)
+        Environment.__init__ = self.counted_init(init)
+        if not tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            interpreter.EVALUATORS[Program] = eval_program
+            Environment.__init__ = init
+            if not tracing:
+                tracemalloc.stop()
+            self.census()
+
+    def census(self):
+        # Counts the live values and scopes, and the scopes closures keep alive
+        gc.collect()
+        functions = []
+        for obj in gc.get_objects():
+            cls = obj.__class__
+            if isinstance(obj, RuntimeVal) and id(obj) not in SHARED or cls is Environment or cls is Frame:
+                self.live[cls.__name__] += 1
+                if cls is FunctionVal:
+                    functions.append(obj)
+
+        seen = set()
+        for fn in functions:
+            self.closures[fn.name] += 1
+            env = fn.declaration_env
+            # The global scope is alive anyway and not counted
+            while env is not None and env.parent is not None:
+                if id(env) not in seen:
+                    seen.add(id(env))
+                    size = deep_size(env)
+                    self.retained[fn.name] += 1
+                    self.retained_bytes[fn.name] += size
+                    self.retained_total += 1
+                    self.retained_total_bytes += size
+                env = env.parent
+
+    def to_dict(self) -> dict:
+        return {
+            "peak": self.peak,
+            "statements": [{"statement": label, "peak": peak, "retained": left} for label, peak, left in self.statements],
+            "environments_created": self.environments_created,
+            "live": dict(self.live.most_common()),
+            "closures": {
+                name: {"functions": count, "environments": self.retained[name], "bytes": self.retained_bytes[name]}
+                for name, count in self.closures.most_common()
+            },
+            "retained_environments": self.retained_total,
+            "retained_bytes": self.retained_total_bytes,
+        }
+
+    def write(self, path: str):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def report(self, limit: int = 10) -> str:
+        lines = [f"peak {self.peak / 1024:.1f} KiB traced, {self.environments_created} scopes created", ""]
+        lines.append(f"{'peak KiB':>10}{'left KiB':>10}  top-level statement")
+        for label, peak, left in sorted(self.statements, key=lambda statement: statement[1], reverse=True)[:limit]:
+            lines.append(f"{peak / 1024:>10.1f}{left / 1024:>10.1f}  {label}")
+
+        lines.append("")
+        lines.append(f"{'live objects':<22}{'count':>10}")
+        for name, count in self.live.most_common():
+            lines.append(f"{name:<22}{count:>10}")
+
+        lines.append("")
+        lines.append(f"{self.retained_total} scopes ({self.retained_total_bytes / 1024:.1f} KiB) retained by closures")
+        if self.retained_total:
+            lines.append(f"{'function':<22}{'values':>10}{'scopes':>10}{'KiB':>10}")
+            for name, count in self.retained.most_common(limit):
+                lines.append(f"{name:<22}{self.closures[name]:>10}{count:>10}{self.retained_bytes[name] / 1024:>10.1f}")
+        return "\n".join(lines)
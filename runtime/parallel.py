@@ -0,0 +1,194 @@
+from runtime.closures import compile_function_value
+from runtime.environment import Environment, Frame, UNSET, createGlobalEnv
+from runtime.values import ArrayVal, FunctionVal, NativeFn, ObjectVal, RuntimeVal, NULL, number
+from itertools import count
+from multiprocessing.pool import Pool
+import atexit
+import io
+import os
+import pickle
+
+"""
+Parallel map and reduce.
+`par.map(fn, array)` calls fn on every element of an array and gives the array
+of the results, `par.reduce(fn, array)` folds the elements with fn, starting
+from an initial value when one is given as a third argument. Both spread the
+work over a pool of WORKERS processes, started on first use:
+- The array is cut into CHUNKS_PER_WORKER chunks per worker. Each chunk is
+  sent to a worker with fn, which calls fn on its elements, and the results
+  come back in the order of the elements.
+- fn is pickled once per call, with every scope it closes over down to the
+  globals. The natives of the global scope are sent by name and each process
+  uses its own, any other native can't be sent. Workers work on copies, so
+  what fn assigns is neither seen by the program nor by other chunks, and the
+  copies are not memoized. Results come back as copies the same way.
+- Workers run fn on the closure engine, whatever engine runs the program. The
+  frames of the closure engine are sent as Environments holding their variables.
+- reduce folds every chunk in a worker and then the results of the chunks in
+  order, so fn has to be associative. An initial value is folded in once, first.
+- With a single worker, or fewer than two elements, the chunk runs in this
+  process, on copies all the same. What fn prints in a worker is not ordered
+  with the output of the program.
+"""
+WORKERS = os.cpu_count() or 1
+CHUNKS_PER_WORKER = 4
+
+POOL = None
+# Identifies the function of a call to the workers, which unpickle it once
+CALLS = count()
+
+# In a worker: its globals, and the (call, function) it last ran chunks of
+WORKER_GLOBALS = None
+LOADED = (None, None)
+
+def global_scope(scope) -> Environment:
+    # The Environment holding the globals of the scope a native is called from
+    if scope.__class__ is Frame:
+        return scope.globals
+    while scope.parent is not None:
+        scope = scope.parent
+    return scope
+
+def builtin_paths(env: Environment) -> dict:
+    # id -> names leading to it of the natives in env, and of the objects holding them
+    paths = {}
+
+    def walk(value: RuntimeVal, path: tuple):
+        paths[id(value)] = path
+        if value.__class__ is ObjectVal:
+            for key, item in zip(value.shape.keys, value.values):
+                walk(item, path + (key,))
+    for name in createGlobalEnv().variables:
+        walk(env.variables[name], (name,))
+    return paths
+
+def snapshot(frame: Frame) -> dict:
+    # State of an Environment holding the variables set in frame, like Frame.export
+    names = frame.layout.names
+    variables = {}
+    constants = []
+    for slot, value in enumerate(frame.values):
+        if value is not UNSET:
+            variables[names[slot]] = value
+            if frame.is_constant(slot):
+                constants.append(names[slot])
+    return {"parent": frame.parent, "variables": variables, "constants": constants}
+
+class Packer(pickle.Pickler):
+    # Pickles values for another process, with the natives of env by name
+    def __init__(self, file, env: Environment):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.builtins = builtin_paths(env)
+
+    def persistent_id(self, obj):
+        return self.builtins.get(id(obj))
+
+    def reducer_override(self, obj):
+        cls = obj.__class__
+        if cls is Frame:
+            return Environment, (), snapshot(obj)
+        if cls is NativeFn:
+            raise ValueError("Cannot send a native function to a worker process, only the natives of the global scope.")
+        return NotImplemented
+
+class Unpacker(pickle.Unpickler):
+    # Unpickles what a Packer pickled, with the natives of env
+    def __init__(self, file, env: Environment):
+        super().__init__(file)
+        self.env = env
+
+    def persistent_load(self, path: tuple) -> RuntimeVal:
+        value = self.env.variables[path[0]]
+        for key in path[1:]:
+            value = value.values[value.shape.index[key]]
+        return value
+
+def pack(value, env: Environment) -> bytes:
+    buffer = io.BytesIO()
+    Packer(buffer, env).dump(value)
+    return buffer.getvalue()
+
+def unpack(data: bytes, env: Environment):
+    return Unpacker(io.BytesIO(data), env).load()
+
+def call(fn: RuntimeVal, args: list, env: Environment) -> RuntimeVal:
+    # Calls a copy of a function on the closure engine
+    if fn.__class__ is NativeFn:
+        return fn.call(args, env)
+    invoke = fn.compiled
+    if invoke is None:
+        invoke = fn.compiled = compile_function_value(fn)
+    return invoke(fn.declaration_env, args)
+
+def apply(fn: RuntimeVal, kind: str, items, env: Environment):
+    # The results of a chunk of a map, or the fold of a chunk of a reduce
+    values = iter(items) if items.__class__ is list else map(number, items)
+    if kind == "map":
+        return [call(fn, [value], env) for value in values]
+    result = next(values)
+    for value in values:
+        result = call(fn, [result, value], env)
+    return result
+
+# WORKERS
+
+def start_worker():
+    global WORKER_GLOBALS
+    WORKER_GLOBALS = createGlobalEnv()
+
+def work(task: tuple) -> bytes:
+    global LOADED
+    token, function, kind, chunk = task
+    if LOADED[0] != token:
+        LOADED = (token, unpack(function, WORKER_GLOBALS))
+    result = apply(LOADED[1], kind, unpack(chunk, WORKER_GLOBALS), WORKER_GLOBALS)
+    return pack(result, WORKER_GLOBALS)
+
+def pool() -> Pool:
+    global POOL
+    if POOL is None:
+        POOL = Pool(WORKERS, initializer=start_worker)
+        atexit.register(POOL.terminate)
+    return POOL
+
+def run_here(kind: str, fn: RuntimeVal, items, env: Environment):
+    # What a worker would give for items, on copies made like the ones sent to it
+    fn, items = unpack(pack((fn, items), env), env)
+    return unpack(pack(apply(fn, kind, items, env), env), env)
+
+def run_chunks(kind: str, fn: RuntimeVal, items, env: Environment) -> list:
+    # What the workers give for every chunk of items, in order
+    if WORKERS == 1 or len(items) < 2:
+        return [run_here(kind, fn, items, env)]
+    token = next(CALLS)
+    function = pack(fn, env)
+    size = -(-len(items) // (WORKERS * CHUNKS_PER_WORKER))
+    tasks = [(token, function, kind, pack(items[start:start + size], env)) for start in range(0, len(items), size)]
+    return [unpack(result, env) for result in pool().map(work, tasks, chunksize=1)]
+
+def arguments(args: list, name: str):
+    if len(args) < 2 or args[0].__class__ not in (FunctionVal, NativeFn) or args[1].__class__ is not ArrayVal:
+        raise ValueError(f"par.{name} needs a function and an array.")
+    return args[0], args[1].items
+
+# NATIVES
+
+def par_map(args: list, scope) -> RuntimeVal:
+    fn, items = arguments(args, "map")
+    results = []
+    if items:
+        for chunk in run_chunks("map", fn, items, global_scope(scope)):
+            results.extend(chunk)
+    return ArrayVal(results)
+
+def par_reduce(args: list, scope) -> RuntimeVal:
+    fn, items = arguments(args, "reduce")
+    env = global_scope(scope)
+    values = run_chunks("reduce", fn, items, env) if items else []
+    if len(args) > 2:
+        values.insert(0, args[2])
+    if not values:
+        return NULL
+    if len(values) == 1:
+        return values[0]
+    return run_here("reduce", fn, values, env)
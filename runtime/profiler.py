@@ -0,0 +1,175 @@
+from frontend.ast import FunctionDeclaration, Program, Stmt
+from runtime.values import FunctionVal
+from runtime import closures, interpreter, transpile, vm
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import os
+import sys
+import threading
+
+"""
+Sampling profiler.
+A daemon thread wakes up every `interval` seconds and reads the Python stack
+of the thread running the program with sys._current_frames(). The frames of
+the engines' call sites are mapped back to the BeamScript functions running
+in them, so the engines record nothing themselves and run at full speed
+between samples:
+- tree: eval_call_expr holds the FunctionVal it calls as `func`
+- closure: the `run` closure of compile_call_expr holds it as `fn`, like the
+  `call` helper of transpiled code does for functions of other engines
+- vm: run_code holds the running CodeObject as `code`, its callers in `frames`
+- python: every function is a Python function `v_<name>` of "<beamscript>"
+Samples are kept as collapsed stacks, the input format of flamegraph.pl and
+speedscope, and summarized into a table of the functions most samples ran in.
+"""
+INTERVAL = 0.005
+
+def nested_code(function, name: str):
+    # Code object of the closure `name` defined in function
+    for constant in function.__code__.co_consts:
+        if getattr(constant, "co_name", None) == name:
+            return constant
+    raise LookupError(f"{function.__name__} defines no {name}")
+
+TREE_CALL = interpreter.eval_call_expr.__code__
+CLOSURE_CALL = nested_code(closures.compile_call_expr, "run")
+TRANSPILED_CALL = nested_code(transpile.make_call, "call")
+VM_RUN = vm.run_code.__code__
+TRANSPILED_FILE = "<beamscript>"
+
+class Profiler:
+    def __init__(self, program: Program, path: str, interval: float = INTERVAL):
+        self.interval = interval
+        with open(path) as file:
+            self.source = file.read()
+        self.filename = os.path.basename(path)
+        self.root = f"<program> ({self.filename})"
+        # Label of every function of the program, by its body
+        self.labels: Dict[Stmt, str] = {}
+        # Labels of the functions of each name, for transpiled code
+        self.names: Dict[str, List[str]] = {}
+        for statement, start in zip(program.body, program.starts or ()):
+            self.label_functions(statement, start)
+
+        self.samples: Counter = Counter()
+        self.thread_id = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.switch_interval = None
+
+    def label_functions(self, node, start: int):
+        if isinstance(node, list):
+            for item in node:
+                self.label_functions(item, start)
+            return
+        if not isinstance(node, Stmt):
+            return
+        if node.__class__ is FunctionDeclaration:
+            label = self.label(node.id.name, None if node.start is None else start + node.start)
+            self.labels[node.body] = label
+            self.names.setdefault(node.id.name, []).append(label)
+        for field in node.fields():
+            if field != "scope":
+                self.label_functions(getattr(node, field), start)
+
+    def label(self, name: str, offset: Optional[int]) -> str:
+        if offset is None:
+            return f"{name} ({self.filename})"
+        line = self.source.count("\n", 0, offset) + 1
+        column = offset - self.source.rfind("\n", 0, offset)
+        return f"{name} ({self.filename}:{line}:{column})"
+
+    def function_label(self, name: str, body: Stmt) -> str:
+        label = self.labels.get(body)
+        if label is None:
+            # Declared by code the profiler never saw, such as a REPL line
+            label = self.labels[body] = self.label(name, None)
+        return label
+
+    def transpiled_label(self, name: str) -> str:
+        labels = self.names.get(name)
+        if labels is not None and len(labels) == 1:
+            return labels[0]
+        return f"{name} ({self.filename})"
+
+    def stack(self, frame) -> Tuple[str, ...]:
+        # BeamScript functions running in the Python frames from frame outwards, outermost first
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            if code is TREE_CALL:
+                fn = frame.f_locals.get("func")
+                if fn is not None:
+                    labels.append(self.function_label(fn.name, fn.body))
+            elif code is CLOSURE_CALL or code is TRANSPILED_CALL:
+                fn = frame.f_locals.get("fn")
+                if fn.__class__ is FunctionVal:
+                    labels.append(self.function_label(fn.name, fn.body))
+            elif code is VM_RUN:
+                local = frame.f_locals
+                for running in [local["code"]] + [caller[0] for caller in reversed(local["frames"])]:
+                    # The program runs as code without a declaration
+                    if running.declaration is not None:
+                        labels.append(self.function_label(running.name, running.declaration.body))
+            elif code.co_filename == TRANSPILED_FILE and code.co_name.startswith("v_"):
+                labels.append(self.transpiled_label(code.co_name[2:]))
+            frame = frame.f_back
+        labels.append(self.root)
+        labels.reverse()
+        return tuple(labels)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self.stack(frame)] += 1
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.stopped.clear()
+        # The sampler waits for the running thread to drop the GIL, which it
+        # only does every switch interval, 5ms by default
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval / 5))
+        self.thread = threading.Thread(target=self.run, name="beamscript-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        sys.setswitchinterval(self.switch_interval)
+
+    def __enter__(self) -> 'Profiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def collapsed(self) -> str:
+        # One line per distinct stack: its frames separated by ';' and the number of samples
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, path: str):
+        with open(path, "w") as file:
+            file.write(self.collapsed())
+
+    def table(self, limit: int = 15) -> str:
+        """
+        The functions most samples ran in, with the share of samples spent in
+        their own code and the share spent in them or anything they called.
+        """
+        total = sum(self.samples.values())
+        if not total:
+            return f"no samples, the program ran for less than {self.interval * 1000:g}ms"
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+
+        lines = [f"{total} samples every {self.interval * 1000:g}ms", f"{'self':>7}{'total':>8}  function"]
+        for label in sorted(inclusive, key=lambda label: (own[label], inclusive[label]), reverse=True)[:limit]:
+            lines.append(f"{own[label] / total:>7.1%}{inclusive[label] / total:>8.1%}  {label}")
+        return "\n".join(lines)
@@ -0,0 +1,112 @@
+from frontend.ast import Program
+from frontend.cache import cache_key, parse_source
+from frontend.optimizer import optimize
+from frontend.parser import Parser
+from frontend.resolver import ALL_NAMES, Resolver, Scope
+from runtime.environment import Environment, Frame, createGlobalEnv
+from runtime.interpreter import evaluate
+from runtime.values import RuntimeVal
+from runtime import bytecode, closures, vm
+from typing import Callable, Dict, List
+
+"""
+Interactive sessions.
+A Session runs every program it is given in one global Environment, so the
+definitions of a REPL line are still there for the next one and the natives
+such as `con` are only built once.
+- Program level declarations live in the Environment on every engine rather
+  than in the slots of a frame per program, so the functions of earlier input
+  see the assignments of later input.
+- Every program is kept parsed and compiled for the session's engine, keyed
+  by its source. Running the same line or an unchanged file again only
+  executes it, function bodies included.
+- Declaring a name again in later input replaces the earlier definition, so a
+  script can be run again after editing it. Within one input it stays an
+  error, and the natives can't be redeclared.
+- Input is parsed before anything of the session changes, so input that raises
+  a ParseError leaves it as it was.
+"""
+# Programs kept per session, the least recently run are dropped first
+MAX_PROGRAMS = 256
+
+def prepare_tree(program: Program) -> Callable[[Environment], RuntimeVal]:
+    return lambda env: evaluate(program, env)
+
+def prepare_closure(program: Program) -> Callable[[Environment], RuntimeVal]:
+    run = closures.compile_program(program, ALL_NAMES)
+    layout = program.scope
+    return lambda env: run(Frame(env, layout))
+
+def prepare_vm(program: Program) -> Callable[[Environment], RuntimeVal]:
+    code = bytecode.compile_program(program)
+    return lambda env: vm.run_code(code, env)
+
+# The python engine transpiles a whole program against a snapshot of its
+# globals, which later input could not see into, so sessions run it on closures
+PREPARERS = {
+    "tree": prepare_tree,
+    "closure": prepare_closure,
+    "vm": prepare_vm,
+    "python": prepare_closure,
+}
+
+def declared_names(program: Program) -> List[str]:
+    # Names the program declares at program level, hoisted like frontend.resolver does
+    resolver = Resolver()
+    resolver.scope = Scope()
+    resolver.declare(program)
+    return resolver.scope.names
+
+class Prepared:
+    __slots__ = ("names", "run")
+
+    def __init__(self, names: List[str], run: Callable[[Environment], RuntimeVal]):
+        self.names = names
+        self.run = run
+
+class Session:
+    def __init__(self, engine: str = "tree", optimized: bool = False, cached: bool = True):
+        self.prepare = PREPARERS[engine]
+        self.optimized = optimized
+        # Whether files are parsed through the on-disk cache
+        self.cached = cached
+        self.parser = Parser()
+        self.env = createGlobalEnv()
+        self.natives = set(self.env.variables)
+        # cache_key(source) -> Prepared, least recently run first
+        self.programs: Dict[str, Prepared] = {}
+
+    def run(self, source: str) -> RuntimeVal:
+        return self.execute(source, lambda: self.parser.produceAST(source))
+
+    def run_file(self, path: str) -> RuntimeVal:
+        with open(path) as file:
+            source = file.read()
+        return self.execute(source, lambda: parse_source(path, source, self.cached))
+
+    def execute(self, source: str, parse: Callable[[], Program]) -> RuntimeVal:
+        key = cache_key(source)
+        prepared = self.programs.pop(key, None)
+        if prepared is None:
+            prepared = self.compile(parse())
+        self.programs[key] = prepared
+        if len(self.programs) > MAX_PROGRAMS:
+            del self.programs[next(iter(self.programs))]
+
+        self.forget(prepared.names)
+        return prepared.run(self.env)
+
+    def compile(self, program: Program) -> Prepared:
+        if self.optimized:
+            optimize(program, ALL_NAMES)
+        return Prepared(declared_names(program), self.prepare(program))
+
+    def forget(self, names: List[str]):
+        # Drops the earlier definitions of names the next program declares again
+        variables = self.env.variables
+        constants = self.env.constants
+        for name in names:
+            if name in variables and name not in self.natives:
+                del variables[name]
+                while name in constants:
+                    constants.remove(name)
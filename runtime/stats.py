@@ -0,0 +1,182 @@
+from frontend.ast import BlockStatement, FunctionDeclaration
+from runtime.environment import Environment
+from runtime.values import ArrayVal, FunctionVal, NumberVal, ObjectVal, StringVal
+from runtime import interpreter, vector
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+import json
+import sys
+
+"""
+Execution statistics of the tree-walking interpreter.
+Stats.instrument() swaps counting versions in at the points the interpreter
+dispatches through anyway, and puts the originals back when it exits, so
+`evaluate` carries no checks and costs nothing extra while stats are off:
+- every entry of interpreter.EVALUATORS, counting evaluations and the time
+  spent in the evaluator of each node type, excluding the nodes it evaluates
+- Environment.lookupVar and interpreter.lookup, counting variable reads by
+  how many scopes up the parent chain the variable was found
+- `__init__` of the value classes, interpreter.make_object and
+  vector.make_array, counting the values created of each type. Shared values such as small numbers and
+  booleans are not created, so they are not counted.
+Calls are counted per function declaration, as evaluations of its body.
+Sites don't specialize while instrumented, the specialized ones skip `evaluate`
+for the nodes in them, so every node is evaluated and counted.
+Every evaluation goes through one more Python frame while instrumented, so the
+recursion limit is raised by as much.
+"""
+VALUE_CLASSES = (NumberVal, StringVal, ObjectVal, ArrayVal, FunctionVal)
+
+class Stats:
+    def __init__(self):
+        # Node type -> evaluations, and seconds spent in its own evaluator
+        self.nodes = Counter()
+        self.times = Counter()
+        # Function name -> calls
+        self.calls = Counter()
+        # Scopes walked up from the current one -> variable reads
+        self.lookups = Counter()
+        # Value type -> values created
+        self.allocations = Counter()
+        self.elapsed = 0.0
+        # Body of every function declared so far -> its name
+        self.bodies = {}
+        # Time spent in the nodes each running evaluator evaluated, innermost last
+        self.nested = [0.0]
+
+    def counted(self, node_class, evaluator):
+        name = node_class.__name__
+        nodes = self.nodes
+        times = self.times
+        nested = self.nested
+        clock = perf_counter
+        bodies = self.bodies
+        calls = self.calls
+        block = node_class is BlockStatement
+        declaration = node_class is FunctionDeclaration
+
+        def run(node, env):
+            nodes[name] += 1
+            if block:
+                function = bodies.get(node)
+                if function is not None:
+                    calls[function] += 1
+            elif declaration:
+                bodies[node.body] = node.id.name
+            nested.append(0.0)
+            start = clock()
+            try:
+                return evaluator(node, env)
+            finally:
+                elapsed = clock() - start
+                times[name] += elapsed - nested.pop()
+                nested[-1] += elapsed
+        return run
+
+    def counted_lookup(self, lookup):
+        lookups = self.lookups
+
+        def counted(env, name):
+            depth = 0
+            scope = env
+            while scope is not None and name not in scope.variables:
+                scope = scope.parent
+                depth += 1
+            lookups[depth] += 1
+            return lookup(env, name)
+        return counted
+
+    def counted_init(self, cls, init):
+        allocations = self.allocations
+        name = cls.__name__
+
+        def __init__(self, *args, **kwargs):
+            allocations[name] += 1
+            init(self, *args, **kwargs)
+        return __init__
+
+    def counted_factory(self, cls, factory):
+        # Factories build values without calling `__init__`
+        allocations = self.allocations
+        name = cls.__name__
+
+        def counted(*args):
+            allocations[name] += 1
+            return factory(*args)
+        return counted
+
+    @contextmanager
+    def instrument(self):
+        evaluators = dict(interpreter.EVALUATORS)
+        lookup_var = Environment.lookupVar
+        lookup = interpreter.lookup
+        make_object = interpreter.make_object
+        make_array = vector.make_array
+        specialize_after = interpreter.SPECIALIZE_AFTER
+        inits = [cls.__init__ for cls in VALUE_CLASSES]
+        recursion_limit = sys.getrecursionlimit()
+
+        for node_class, evaluator in evaluators.items():
+            interpreter.EVALUATORS[node_class] = self.counted(node_class, evaluator)
+        Environment.lookupVar = self.counted_lookup(lookup_var)
+        interpreter.lookup = self.counted_lookup(lookup)
+        interpreter.make_object = self.counted_factory(ObjectVal, make_object)
+        vector.make_array = self.counted_factory(ArrayVal, make_array)
+        for cls, init in zip(VALUE_CLASSES, inits):
+            cls.__init__ = self.counted_init(cls, init)
+        interpreter.SPECIALIZE_AFTER = float("inf")
+        # evaluate and the evaluator were two frames per evaluation, now they are three
+        sys.setrecursionlimit(recursion_limit * 3 // 2)
+
+        start = perf_counter()
+        try:
+            yield self
+        finally:
+            self.elapsed += perf_counter() - start
+            sys.setrecursionlimit(recursion_limit)
+            interpreter.EVALUATORS.update(evaluators)
+            Environment.lookupVar = lookup_var
+            interpreter.lookup = lookup
+            interpreter.make_object = make_object
+            vector.make_array = make_array
+            interpreter.SPECIALIZE_AFTER = specialize_after
+            for cls, init in zip(VALUE_CLASSES, inits):
+                cls.__init__ = init
+
+    def to_dict(self) -> dict:
+        return {
+            "elapsed": self.elapsed,
+            "nodes": {name: {"count": count, "time": self.times[name]} for name, count in self.nodes.most_common()},
+            "calls": dict(self.calls.most_common()),
+            "lookups": {str(depth): count for depth, count in sorted(self.lookups.items())},
+            "allocations": dict(self.allocations.most_common()),
+        }
+
+    def write(self, path: str):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def report(self, limit: int = 15) -> str:
+        lines = [f"{'node type':<22}{'count':>10}{'self ms':>10}{'share':>8}"]
+        total = sum(self.times.values()) or 1.0
+        for name, time in self.times.most_common():
+            lines.append(f"{name:<22}{self.nodes[name]:>10}{time * 1000:>10.1f}{time / total:>8.1%}")
+
+        lines.append("")
+        lines.append(f"{'function':<22}{'calls':>10}")
+        for name, count in self.calls.most_common(limit):
+            lines.append(f"{name:<22}{count:>10}")
+
+        reads = sum(self.lookups.values())
+        mean = sum(depth * count for depth, count in self.lookups.items()) / reads if reads else 0.0
+        lines.append("")
+        lines.append(f"{reads} variable reads, {mean:.2f} scopes up on average")
+        for depth, count in sorted(self.lookups.items()):
+            lines.append(f"{depth:>8} up{count:>12}")
+
+        lines.append("")
+        lines.append(f"{'values created':<22}{'count':>10}")
+        for name, count in self.allocations.most_common():
+            lines.append(f"{name:<22}{count:>10}")
+        return "\n".join(lines)
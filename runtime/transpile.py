@@ -0,0 +1,679 @@
+from frontend.ast import ArrayExpression, AssignmentExpression, BinaryExpression, BlockStatement, BooleanLiteral, CallExpression, ExpressionStatement, ForStatement, FunctionDeclaration, LogicalExpression, MemberExpression, NullLiteral, ObjectExpression, Stmt, Program, UnaryExpression, VariableDeclaration, NumericLiteral, Identifier, StringLiteral, IfStatement, WhileStatement, RangeExpression
+from runtime.values import BooleanVal, FunctionVal, NullVal, NumberVal, ObjectVal, RuntimeVal, StringVal, NULL, boolean, number, iterate, count_range
+from runtime.environment import Environment
+from runtime.closures import ARITHMETIC_OPERATORS, COMPARISON_OPERATORS, compile_function_value, divide
+from runtime import closures, memo
+from types import FunctionType
+from typing import List, Optional
+import ast
+import re
+import unicodedata
+
+"""
+Python transpiler.
+The Program is mapped onto a Python `ast.Module` and compiled with `compile()`,
+so scripts run as ordinary CPython bytecode. Every BeamScript variable becomes
+a Python variable named `v_<name>` and every function a nested Python function.
+Inside the generated code values are plain Python values: numbers, strings,
+booleans, None for null and dicts of properties for objects. They are boxed
+into RuntimeVals only when they reach a NativeFn or the Environment.
+The semantics mirror `runtime.interpreter.evaluate` exactly, programs that
+can't be mapped onto Python scoping or use arrays run on the closure engine
+instead.
+"""
+# Value of a var, def, if, while or for statement. The tree-walker returns a bare
+# None for them, which is not the same as null.
+class Nothing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "NOTHING"
+
+NOTHING = Nothing()
+
+# Raised for a program that can't be mapped onto Python, which runs on the closure engine instead
+class Untranspilable(Exception):
+    pass
+
+# Default of parameters the caller passed no argument for
+MISSING = object()
+
+NUMBER_TYPES = {int, float, complex}
+
+# Names of the runtime helpers applying each operator in generated code
+OPERATOR_HELPERS = {
+    "+": "add", "-": "sub", "*": "mul", "/": "div", "%": "mod", "^": "pow",
+    "==": "eq", "!=": "ne", "<": "lt", "<=": "le", ">": "gt", ">=": "ge",
+}
+
+# Operators emitted as plain Python operations when both operands are numbers
+PYTHON_OPERATORS = {"+": ast.Add, "-": ast.Sub, "*": ast.Mult, "%": ast.Mod, "^": ast.Pow}
+PYTHON_COMPARISONS = {"==": ast.Eq, "!=": ast.NotEq, "<": ast.Lt, "<=": ast.LtE, ">": ast.Gt, ">=": ast.GtE}
+
+def numeric(apply):
+    # Binary operations on anything but two numbers evaluate to null
+    def run(lhs, rhs):
+        if lhs.__class__ in NUMBER_TYPES and rhs.__class__ in NUMBER_TYPES:
+            return apply(lhs, rhs)
+        return None
+    return run
+
+def positive(operand):
+    if operand.__class__ in NUMBER_TYPES:
+        return +operand
+    raise ValueError("Unary plus operator can only be applied to numbers.")
+
+def negate(operand):
+    if operand.__class__ in NUMBER_TYPES:
+        return -operand
+    raise ValueError("Unary negation can only be applied to numbers.")
+
+def logical_not(operand):
+    if operand.__class__ is bool:
+        return not operand
+    raise ValueError("Logical not can only be applied to booleans.")
+
+def logical_and(left, right):
+    # 1, 1.0 and true are equal in Python but not as RuntimeVals
+    if left.__class__ is right.__class__ and left == right:
+        return left
+    return False
+
+def logical_or(left, right):
+    return True if left else right
+
+def member(value, name):
+    if value.__class__ is not dict:
+        # Fails with the AttributeError the other engines raise reading .shape
+        return box(value, None).shape
+    if name in value:
+        return value[name]
+    raise Exception("The Member couldn't be found")
+
+def missing_argument():
+    # The tree-walker binds parameters with args[i], which fails the same way
+    raise IndexError("list index out of range")
+
+def assign_constant(name, value):
+    raise ValueError(f"Cannot assign a value to variable {name} as it was declared a constant.")
+
+def assign_undeclared(name, value):
+    raise ValueError(f"Cannot resolve '{name}' as it does not exist.")
+
+def redeclare(name):
+    raise ValueError(f"Cannot declare variable {name}. As it already is defined.")
+
+def memoized(function):
+    # Calls of a `memo def` function through its MemoCache, keyed on the bare values
+    cache = memo.new_cache(function.declaration, memo.raw_key)
+
+    def memoized_call(*args):
+        key, result = cache.lookup(args)
+        if result is memo.MISS:
+            result = function(*args)
+            if key is not None:
+                cache.store(key, result)
+        return result
+    memoized_call.declaration = function.declaration
+    return memoized_call
+
+def loop_range(start, stop, step):
+    return count_range(box(start, None), box(stop, None), box(step, None))
+
+def loop_values(value):
+    # The keys of an object, or the values any other engine's iterate gives
+    if value.__class__ is dict:
+        return list(value)
+    return map(unbox, iterate(box(value, None)))
+
+# Globals shared by every transpiled program
+RUNTIME = {
+    "NOTHING": NOTHING,
+    "MISSING": MISSING,
+    "missing_argument": missing_argument,
+    "divide": divide,
+    "positive": positive,
+    "negate": negate,
+    "logical_not": logical_not,
+    "logical_and": logical_and,
+    "logical_or": logical_or,
+    "member": member,
+    "assign_constant": assign_constant,
+    "assign_undeclared": assign_undeclared,
+    "redeclare": redeclare,
+    "memoized": memoized,
+    "loop_range": loop_range,
+    "loop_values": loop_values,
+}
+for op, helper in OPERATOR_HELPERS.items():
+    RUNTIME[helper] = numeric(ARITHMETIC_OPERATORS.get(op) or COMPARISON_OPERATORS[op])
+
+def box(value, env: Environment) -> RuntimeVal:
+    """
+    Converts a value of the generated code into the RuntimeVal the other
+    engines and the native functions work with.
+    """
+    cls = value.__class__
+    if value is None:
+        return NULL
+    if value is NOTHING:
+        return None
+    if cls is bool:
+        return boolean(value)
+    if cls in NUMBER_TYPES:
+        return number(value)
+    if cls is str:
+        return StringVal(value)
+    if cls is dict:
+        return ObjectVal({key: box(item, env) for key, item in value.items()})
+    if cls is FunctionType:
+        declaration = value.declaration
+
+        def invoke(declaration_env, args):
+            return box(value(*[unbox(arg) for arg in args]), env)
+        return FunctionVal(declaration.id.name, declaration.params, env, declaration.body, invoke)
+    return value
+
+# Values the generated code holds as their bare Python value
+UNBOXED = {NullVal, BooleanVal, NumberVal, StringVal}
+
+def unbox(value):
+    if value is None:
+        return NOTHING
+    cls = value.__class__
+    if cls is ObjectVal:
+        return {key: unbox(item) for key, item in zip(value.shape.keys, value.values)}
+    if cls in UNBOXED:
+        return value.value
+    return value
+
+def make_call(env: Environment):
+    def call(args, fn):
+        if fn.__class__ is FunctionType:
+            return fn(*args)
+
+        fn = box(fn, env)
+        if fn.type == "native_fn":
+            return unbox(fn.call([box(arg, env) for arg in args], env))
+        if fn.type == "function":
+            invoke = fn.compiled
+            if invoke is None:
+                # Declared by another engine, compile it on first call
+                invoke = fn.compiled = compile_function_value(fn)
+            return unbox(invoke(fn.declaration_env, [box(arg, env) for arg in args]))
+
+        raise ValueError("Cannot call value that is not a function: " + str(fn))
+    return call
+
+# Declarations made directly in the body of one function, or of the program.
+class Scope:
+    def __init__(self, parent: Optional['Scope']):
+        self.parent = parent
+        # name -> kinds of its declarations: "var", "const", "function" or "param"
+        self.declarations = {}
+        # Names whose declaration may run more than once
+        self.repeated = set()
+        # Names assigned in this body, which may belong to an enclosing scope
+        self.assigned = set()
+        # Program level declarations of names the Environment already holds
+        self.clashes = set()
+        # Position of the first use and first declaration of every name
+        self.first_use = {}
+        self.first_declaration = {}
+
+class Transpiler:
+    def __init__(self, env: Environment):
+        self.env = env
+        self.scopes = {}
+        self.declarations = []
+        # (scope, name, value node) of every declaration and assignment
+        self.bindings = []
+        self.numbers = set()
+        self.scope = None
+        self.clock = 0
+
+    def python_name(self, name: str) -> str:
+        # Python folds identifiers with NFKC, distinct BeamScript names must stay distinct
+        if unicodedata.normalize("NFKC", name) != name or not name.isidentifier():
+            raise Untranspilable(f"'{name}' is not a valid Python identifier")
+        return "v_" + name
+
+    def resolve(self, name: str, scope: Optional[Scope] = None) -> Optional[Scope]:
+        scope = self.scope if scope is None else scope
+        while scope is not None:
+            if name in scope.declarations:
+                return scope
+            scope = scope.parent
+        return None
+
+    # ANALYSIS
+
+    def declare(self, scope: Scope, name: str, kind: str, value: Optional[Stmt], in_loop: bool):
+        self.clock += 1
+        if scope.parent is None and name in self.env.variables:
+            scope.clashes.add(name)
+            return
+        if name in scope.declarations or in_loop:
+            scope.repeated.add(name)
+        scope.declarations.setdefault(name, []).append(kind)
+        scope.first_declaration.setdefault(name, self.clock)
+        if kind in ("var", "const"):
+            self.bindings.append((scope, name, value))
+
+    def use(self, scope: Scope, name: str):
+        self.clock += 1
+        scope.first_use.setdefault(name, self.clock)
+
+    def analyse_function(self, node: Stmt, params: List[Identifier], parent: Optional[Scope]):
+        scope = self.scopes[node] = Scope(parent)
+        for param in params:
+            self.declare(scope, param.name, "param", None, False)
+        self.analyse(scope, node.body if node.__class__ is FunctionDeclaration else node, False)
+
+    def analyse(self, scope: Scope, node: Optional[Stmt], in_loop: bool):
+        """
+        Walks one function body in evaluation order, recording its declarations
+        and uses. Nested function bodies get a Scope of their own.
+        """
+        cls = node.__class__
+        if node is None or cls in (NumericLiteral, StringLiteral, NullLiteral, BooleanLiteral):
+            return
+        if cls is Program or cls is BlockStatement:
+            for statement in node.body:
+                self.analyse(scope, statement, in_loop)
+        elif cls is ExpressionStatement:
+            self.analyse(scope, node.expression, in_loop)
+        elif cls is VariableDeclaration:
+            kind = "const" if node.constant else "var"
+            for declarator in node.declarations:
+                self.analyse(scope, declarator.init, in_loop)
+                self.declare(scope, declarator.id.name, kind, declarator.init, in_loop)
+        elif cls is FunctionDeclaration:
+            self.declare(scope, node.id.name, "function", None, in_loop)
+            self.analyse_function(node, node.params, scope)
+        elif cls is IfStatement:
+            self.analyse(scope, node.condition, in_loop)
+            self.analyse(scope, node.consequent, in_loop)
+            self.analyse(scope, node.alternate, in_loop)
+        elif cls is WhileStatement:
+            self.analyse(scope, node.condition, True)
+            self.analyse(scope, node.body, True)
+        elif cls is ForStatement:
+            iterable = node.iterable
+            if iterable.__class__ is RangeExpression:
+                for bound in (iterable.start, iterable.stop, iterable.step):
+                    self.analyse(scope, bound, in_loop)
+                # The variable of a range loop only ever holds ints
+                value = NumericLiteral(0)
+            else:
+                self.analyse(scope, iterable, in_loop)
+                value = None
+            # Bound on every iteration, a later declaration of it must fail
+            self.declare(scope, node.variable.name, "var", value, True)
+            self.analyse(scope, node.body, True)
+        elif cls is Identifier:
+            self.use(scope, node.name)
+        elif cls is AssignmentExpression:
+            if node.left.__class__ is not Identifier:
+                raise Exception("Invalid LHS inside assignment expression")
+            self.analyse(scope, node.right, in_loop)
+            self.use(scope, node.left.name)
+            scope.assigned.add(node.left.name)
+            self.bindings.append((scope, node.left.name, node.right))
+        elif cls is BinaryExpression or cls is LogicalExpression:
+            self.analyse(scope, node.left, in_loop)
+            self.analyse(scope, node.right, in_loop)
+        elif cls is UnaryExpression:
+            self.analyse(scope, node.argument, in_loop)
+        elif cls is MemberExpression:
+            if node.computed:
+                raise Untranspilable("arrays and computed members have no Python mapping")
+            self.analyse(scope, node.object, in_loop)
+        elif cls is CallExpression:
+            for arg in node.arguments:
+                self.analyse(scope, arg, in_loop)
+            self.analyse(scope, node.callee, in_loop)
+        elif cls is ObjectExpression:
+            for prop in node.properties:
+                if prop.value is None:
+                    self.use(scope, prop.key)
+                else:
+                    self.analyse(scope, prop.value, in_loop)
+        elif cls is ArrayExpression:
+            raise Untranspilable("arrays and computed members have no Python mapping")
+        else:
+            raise ValueError(f"This AST Node has not yet been set up for compilation: {node.type}")
+
+    def is_number(self, node: Optional[Stmt], scope: Scope) -> bool:
+        """
+        Tells whether an expression always evaluates to a number, given the
+        variables currently believed to only ever hold numbers.
+        """
+        cls = node.__class__
+        if cls is NumericLiteral:
+            return True
+        if cls is Identifier:
+            return (self.resolve(node.name, scope), node.name) in self.numbers
+        if cls is BinaryExpression:
+            return node.operator in ARITHMETIC_OPERATORS and self.is_number(node.left, scope) and self.is_number(node.right, scope)
+        if cls is UnaryExpression:
+            return node.operator in ("+", "-") and self.is_number(node.argument, scope)
+        if cls is AssignmentExpression:
+            return self.is_number(node.right, scope)
+        return False
+
+    def infer_numbers(self):
+        # Start from every var and const, then drop those given a value that may not be a number
+        self.numbers = {(scope, name) for scope in self.scopes.values() for name, kinds in scope.declarations.items() if "param" not in kinds and "function" not in kinds}
+        changed = True
+        while changed:
+            changed = False
+            for scope, name, value in self.bindings:
+                binding = (self.resolve(name, scope), name)
+                if binding in self.numbers and not self.is_number(value, scope):
+                    self.numbers.discard(binding)
+                    changed = True
+
+    # CODE GENERATION
+
+    def transpile_program(self, program: Program) -> ast.Module:
+        self.analyse_function(program, [], None)
+        self.infer_numbers()
+        result = ast.Call(ast.Name("locals", ast.Load()), [], [])
+        function = self.transpile_function("program", program, [], lambda value: ast.Tuple([value, result], ast.Load()))
+        return ast.fix_missing_locations(ast.Module([function], []))
+
+    def transpile_function(self, name: str, node: Stmt, params: List[Identifier], result=None) -> ast.FunctionDef:
+        parent, self.scope = self.scope, self.scopes[node]
+        scope = self.scope
+
+        for declared, position in scope.first_declaration.items():
+            # Python binds a name for the whole function, BeamScript only from its declaration on
+            if scope.first_use.get(declared, position) < position:
+                if self.resolve(declared, scope.parent) is not None or declared in self.env.variables:
+                    raise Untranspilable(f"'{declared}' is used before it shadows an outer variable")
+
+        body = []
+        outer = sorted(name for name in scope.assigned if name not in scope.declarations and self.resolve(name) is not None)
+        if outer:
+            body.append(ast.Nonlocal([self.python_name(name) for name in outer]))
+        assigned_globals = sorted(name for name in scope.assigned if self.resolve(name) is None and name in self.env.variables)
+        if assigned_globals:
+            body.append(ast.Global([self.python_name(name) for name in assigned_globals]))
+
+        names = [param.name for param in params]
+        if len(set(names)) == len(names):
+            # Arguments past the parameters are ignored, missing ones default to MISSING
+            arguments = ast.arguments([], [ast.arg(self.python_name(param)) for param in names], ast.arg("args"), [], [], None, [ast.Name("MISSING", ast.Load())] * len(names))
+            if names:
+                last = ast.Compare(ast.Name(self.python_name(names[-1]), ast.Load()), [ast.Is()], [ast.Name("MISSING", ast.Load())])
+                body.append(ast.If(last, [ast.Expr(self.helper_call("missing_argument", []))], []))
+        else:
+            # Repeated parameter names fail on declaration exactly like the tree-walker
+            arguments = ast.arguments([], [], ast.arg("args"), [], [], None, [])
+            body.append(ast.Assign([ast.Name("args", ast.Store())], self.helper_call("list", [ast.Name("args", ast.Load())])))
+            for i, param in enumerate(names):
+                body.extend(self.transpile_declaration(param, ast.Subscript(ast.Name("args", ast.Load()), ast.Constant(i), ast.Load())))
+        body.extend(self.transpile_body(node.body if node.__class__ is FunctionDeclaration else node, result or (lambda value: value)))
+
+        self.scope = parent
+        return ast.FunctionDef(name, arguments, body, [], None)
+
+    def transpile_body(self, block: Program, result) -> List[ast.stmt]:
+        """
+        Transpiles a function or program body, returning the value of its last
+        statement like the tree-walker's block evaluation.
+        """
+        if not block.body:
+            return [ast.Return(result(ast.Constant(None)))]
+        body = []
+        for statement in block.body[:-1]:
+            body.extend(self.transpile_stmt(statement))
+
+        last = block.body[-1]
+        if last.__class__ is ExpressionStatement:
+            return body + [ast.Return(result(self.transpile_expr(last.expression)))]
+        if last.__class__ not in STATEMENT_TRANSPILERS:
+            return body + [ast.Return(result(self.transpile_expr(last)))]
+        return body + self.transpile_stmt(last) + [ast.Return(result(ast.Name("NOTHING", ast.Load())))]
+
+    def transpile_block(self, block: Optional[Stmt]) -> List[ast.stmt]:
+        if block is None:
+            return [ast.Pass()]
+        if block.__class__ is not BlockStatement:
+            return self.transpile_stmt(block)
+        body = []
+        for statement in block.body:
+            body.extend(self.transpile_stmt(statement))
+        return body or [ast.Pass()]
+
+    def transpile_stmt(self, stmt: Stmt) -> List[ast.stmt]:
+        if stmt.__class__ is ExpressionStatement:
+            return [ast.Expr(self.transpile_expr(stmt.expression))]
+        transpiler = STATEMENT_TRANSPILERS.get(stmt.__class__)
+        if transpiler is None:
+            # Expressions can appear directly where statements are expected
+            return [ast.Expr(self.transpile_expr(stmt))]
+        return transpiler(self, stmt)
+
+    def transpile_declaration(self, name: str, value: ast.expr) -> List[ast.stmt]:
+        if name in self.scope.clashes:
+            return [ast.Expr(value), ast.Expr(self.helper_call("redeclare", [ast.Constant(name)]))]
+
+        target = self.python_name(name)
+        if name not in self.scope.repeated:
+            return [ast.Assign([ast.Name(target, ast.Store())], value)]
+
+        return [
+            ast.Assign([ast.Name("value", ast.Store())], value),
+            self.redeclaration_check(name),
+            ast.Assign([ast.Name(target, ast.Store())], ast.Name("value", ast.Load())),
+        ]
+
+    def redeclaration_check(self, name: str) -> ast.stmt:
+        # The declaration may run twice, it has to fail once the variable is bound
+        return ast.Try(
+            [ast.Expr(ast.Name(self.python_name(name), ast.Load()))],
+            [ast.ExceptHandler(ast.Name("NameError", ast.Load()), None, [ast.Pass()])],
+            [ast.Expr(self.helper_call("redeclare", [ast.Constant(name)]))],
+            [],
+        )
+
+    def transpile_var_declaration(self, declaration: VariableDeclaration) -> List[ast.stmt]:
+        body = []
+        for declarator in declaration.declarations:
+            body.extend(self.transpile_declaration(declarator.id.name, self.transpile_expr(declarator.init)))
+        return body
+
+    def transpile_fn_declaration(self, declaration: FunctionDeclaration) -> List[ast.stmt]:
+        name = declaration.id.name
+        if name in self.scope.clashes:
+            return [ast.Expr(self.helper_call("redeclare", [ast.Constant(name)]))]
+
+        target = self.python_name(name)
+        function = self.transpile_function(target, declaration, declaration.params)
+        body = [self.redeclaration_check(name)] if name in self.scope.repeated else []
+
+        # Keeps the declaration around so the function can be boxed into a FunctionVal
+        self.declarations.append(declaration)
+        index = ast.Subscript(ast.Name("declarations", ast.Load()), ast.Constant(len(self.declarations) - 1), ast.Load())
+        body += [function, ast.Assign([ast.Attribute(ast.Name(target, ast.Load()), "declaration", ast.Store())], index)]
+        if declaration.memoized:
+            body.append(ast.Assign([ast.Name(target, ast.Store())], self.helper_call("memoized", [ast.Name(target, ast.Load())])))
+        return body
+
+    def transpile_if_stmt(self, stmt: IfStatement) -> List[ast.stmt]:
+        alternate = [] if stmt.alternate is None else self.transpile_block(stmt.alternate)
+        return [ast.If(self.transpile_expr(stmt.condition), self.transpile_block(stmt.consequent), alternate)]
+
+    def transpile_while_loop(self, stmt: WhileStatement) -> List[ast.stmt]:
+        return [ast.While(self.transpile_expr(stmt.condition), self.transpile_block(stmt.body), [])]
+
+    def transpile_for_loop(self, stmt: ForStatement) -> List[ast.stmt]:
+        name = stmt.variable.name
+        if name in self.scope.clashes:
+            raise Untranspilable(f"'{name}' is a loop variable the Environment already holds")
+        if set(self.scope.declarations[name]) & {"const", "function"}:
+            raise Untranspilable(f"'{name}' is declared both as a constant and a loop variable")
+
+        iterable = stmt.iterable
+        if iterable.__class__ is RangeExpression:
+            values = self.helper_call("loop_range", [self.transpile_expr(iterable.start), self.transpile_expr(iterable.stop), self.transpile_expr(iterable.step)])
+        else:
+            values = self.helper_call("loop_values", [self.transpile_expr(iterable)])
+        return [ast.For(ast.Name(self.python_name(name), ast.Store()), values, self.transpile_block(stmt.body), [])]
+
+    def transpile_expr(self, expr: Optional[Stmt]) -> ast.expr:
+        if expr is None:
+            return ast.Constant(None)
+        transpiler = EXPRESSION_TRANSPILERS.get(expr.__class__)
+        if transpiler is None:
+            raise ValueError(f"This AST Node has not yet been set up for compilation: {expr.type}")
+        return transpiler(self, expr)
+
+    def helper_call(self, helper: str, args: List[ast.expr]) -> ast.Call:
+        return ast.Call(ast.Name(helper, ast.Load()), args, [])
+
+    def transpile_literal(self, literal: Stmt) -> ast.expr:
+        return ast.Constant(literal.value)
+
+    def transpile_identifier(self, ident: Identifier) -> ast.expr:
+        return ast.Name(self.python_name(ident.name), ast.Load())
+
+    def transpile_assignment(self, node: AssignmentExpression) -> ast.expr:
+        name = node.left.name
+        value = self.transpile_expr(node.right)
+        scope = self.resolve(name)
+
+        if scope is None:
+            if name not in self.env.variables:
+                return self.helper_call("assign_undeclared", [ast.Constant(name), value])
+            constant = name in self.env.constants
+        else:
+            kinds = set(scope.declarations[name])
+            constant = bool(kinds & {"const", "function"})
+            if constant and kinds & {"var", "param"}:
+                raise Untranspilable(f"'{name}' is declared both as a constant and a variable")
+
+        if constant:
+            return self.helper_call("assign_constant", [ast.Constant(name), value])
+        return ast.NamedExpr(ast.Name(self.python_name(name), ast.Store()), value)
+
+    def transpile_binary_expr(self, binop: BinaryExpression) -> ast.expr:
+        left = self.transpile_expr(binop.left)
+        right = self.transpile_expr(binop.right)
+        op = binop.operator
+
+        if self.is_number(binop.left, self.scope) and self.is_number(binop.right, self.scope):
+            if op in PYTHON_OPERATORS:
+                return ast.BinOp(left, PYTHON_OPERATORS[op](), right)
+            if op in PYTHON_COMPARISONS:
+                return ast.Compare(left, [PYTHON_COMPARISONS[op]()], [right])
+            if op == "/":
+                return self.helper_call("divide", [left, right])
+        return self.helper_call(OPERATOR_HELPERS[op], [left, right])
+
+    def transpile_unary_expr(self, expr: UnaryExpression) -> ast.expr:
+        op = expr.operator
+        argument = self.transpile_expr(expr.argument)
+        if op == "-" and self.is_number(expr.argument, self.scope):
+            return ast.UnaryOp(ast.USub(), argument)
+        if op == "+":
+            return self.helper_call("positive", [argument])
+        if op == "-":
+            return self.helper_call("negate", [argument])
+        if op in {"not", "!"}:
+            return self.helper_call("logical_not", [argument])
+        raise ValueError("Unsupported unary operator: " + op)
+
+    def transpile_logical_expr(self, expr: LogicalExpression) -> ast.expr:
+        # Both sides are always evaluated, so they are passed to a helper instead of Python's and/or
+        args = [self.transpile_expr(expr.left), self.transpile_expr(expr.right)]
+        if expr.operator in {"and", "&&"}:
+            return self.helper_call("logical_and", args)
+        if expr.operator in {"or", "||"}:
+            return self.helper_call("logical_or", args)
+        raise ValueError("Invalid operator in logical expression")
+
+    def transpile_object_expr(self, obj: ObjectExpression) -> ast.expr:
+        # A property without a value is shorthand for the variable of the same name
+        keys = [ast.Constant(prop.key) for prop in obj.properties]
+        values = [ast.Name(self.python_name(prop.key), ast.Load()) if prop.value is None else self.transpile_expr(prop.value) for prop in obj.properties]
+        return ast.Dict(keys, values)
+
+    def transpile_member_expr(self, expr: MemberExpression) -> ast.expr:
+        return self.helper_call("member", [self.transpile_expr(expr.object), ast.Constant(expr.property.name)])
+
+    def transpile_call_expr(self, expr: CallExpression) -> ast.expr:
+        args = [self.transpile_expr(arg) for arg in expr.arguments]
+        callee = expr.callee
+
+        # Functions declared in the program are called directly
+        if callee.__class__ is Identifier:
+            scope = self.resolve(callee.name)
+            if scope is not None and set(scope.declarations[callee.name]) == {"function"}:
+                return ast.Call(self.transpile_identifier(callee), args, [])
+
+        return self.helper_call("call", [ast.List(args, ast.Load()), self.transpile_expr(callee)])
+
+STATEMENT_TRANSPILERS = {
+    VariableDeclaration: Transpiler.transpile_var_declaration,
+    FunctionDeclaration: Transpiler.transpile_fn_declaration,
+    IfStatement: Transpiler.transpile_if_stmt,
+    WhileStatement: Transpiler.transpile_while_loop,
+    ForStatement: Transpiler.transpile_for_loop,
+    BlockStatement: Transpiler.transpile_block,
+}
+
+EXPRESSION_TRANSPILERS = {
+    NumericLiteral: Transpiler.transpile_literal,
+    StringLiteral: Transpiler.transpile_literal,
+    NullLiteral: Transpiler.transpile_literal,
+    BooleanLiteral: Transpiler.transpile_literal,
+    Identifier: Transpiler.transpile_identifier,
+    AssignmentExpression: Transpiler.transpile_assignment,
+    BinaryExpression: Transpiler.transpile_binary_expr,
+    UnaryExpression: Transpiler.transpile_unary_expr,
+    LogicalExpression: Transpiler.transpile_logical_expr,
+    ObjectExpression: Transpiler.transpile_object_expr,
+    MemberExpression: Transpiler.transpile_member_expr,
+    CallExpression: Transpiler.transpile_call_expr,
+}
+
+def transpile(program: Program, env: Environment):
+    """
+    Transpiles a Program into Python, returning the compiled module and the
+    globals it has to be executed with.
+    """
+    transpiler = Transpiler(env)
+    module = transpiler.transpile_program(program)
+    namespace = dict(RUNTIME)
+    namespace["call"] = make_call(env)
+    namespace["declarations"] = transpiler.declarations
+    for name, value in env.variables.items():
+        namespace["v_" + name] = unbox(value)
+    return compile(module, "<beamscript>", "exec"), namespace, transpiler.scopes[program]
+
+def execute(program: Program, env: Environment) -> RuntimeVal:
+    try:
+        code, namespace, scope = transpile(program, env)
+    except Untranspilable:
+        return closures.execute(program, env)
+
+    exec(code, namespace)
+    try:
+        value, variables = namespace["program"]()
+    except NameError as error:
+        # Python only knows the mangled name, report it like Environment.resolve
+        match = re.search(r"'v_([^']*)'", str(error))
+        if match is None:
+            raise
+        raise ValueError(f"Cannot resolve '{match.group(1)}' as it does not exist.") from None
+
+    # Program level declarations end up in the Environment like on every other engine
+    for name, kinds in scope.declarations.items():
+        if "v_" + name in variables:
+            env.variables[name] = box(variables["v_" + name], env)
+            if "var" not in kinds and name not in env.constants:
+                env.constants.append(name)
+    return box(value, env)
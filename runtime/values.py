@@ -1,46 +1,171 @@
+from array import array
 from dataclasses import dataclass
-from msilib.schema import Environment
 from typing import Union, Callable, List
 from frontend.ast import Stmt
 
 # Define a type alias for the union of NullVal and NumberVal
-ValueType = Union["NumberVal", "NullVal", "BooleanVal", "ObjectVal", "NativeFn", "FunctionVal",  "StringVal"]
+ValueType = Union["NumberVal", "NullVal", "BooleanVal", "ObjectVal", "NativeFn", "FunctionVal",  "StringVal", "ArrayVal"]
 
+"""
+Runtime values.
+Null, booleans, numbers, strings and objects are small `__slots__` classes
+whose `type` is a class attribute, so building one only stores its payload.
+null, true and false are shared singletons and the integers of SMALL_INTS are
+built once, `number` and `boolean` hand them out without allocating.
+Values print and compare like the dicts the engines used to pass around.
+- Values can be pickled, see runtime.parallel. The singletons unpickle as
+  themselves and shapes are interned again, functions leave what the engines
+  compiled of them behind.
+"""
 # Define a base class for runtime values
-@dataclass
+@dataclass(init=False)
 class RuntimeVal:
+    __slots__ = ()
     type: str
 
 # Define a class for representing NullVal, extending RuntimeVal
-@dataclass
 class NullVal(RuntimeVal):
-    type: str = "null"
-    value: str = None
+    __slots__ = ()
+    type = "null"
+    value = None
+
+    def __new__(cls):
+        return NULL
+
+    def __repr__(self):
+        return "{'type': 'null', 'value': None}"
+
+    def __eq__(self, other):
+        return self is other
+
+    __hash__ = object.__hash__
+
+    def __reduce__(self):
+        return "NULL"
 
 class BooleanVal(RuntimeVal):
-    def __init__(self, value: bool = True):
-        self.type = "boolean"
-        self.value = value
- 
+    __slots__ = ("value",)
+    type = "boolean"
+
+    def __new__(cls, value: bool = True):
+        return TRUE if value else FALSE
+
+    def __repr__(self):
+        return f"{{'type': 'boolean', 'value': {self.value!r}}}"
+
+    def __eq__(self, other):
+        return self is other
+
+    __hash__ = object.__hash__
+
+    def __reduce__(self):
+        return "TRUE" if self.value else "FALSE"
+
 # Define a class for representing NumberVal, extending RuntimeVal
-@dataclass
 class NumberVal(RuntimeVal):
+    __slots__ = ("value",)
+    type = "number"
+
     def __init__(self, value):
-        self.type = "number"
         self.value = value
-        number_type = ""
-        if "." in str(self.value):
-            number_type = "float"
-            
-        else: 
-            number_type = "int"
-        self.number_type = number_type
 
-@dataclass
+    # "int", "float" or "complex", the name of the Python type of the value
+    @property
+    def number_type(self) -> str:
+        return self.value.__class__.__name__
+
+    def __repr__(self):
+        return f"{{'type': 'number', 'value': {self.value!r}, 'number_type': {self.number_type!r}}}"
+
+    def __eq__(self, other):
+        return other.__class__ is NumberVal and self.value.__class__ is other.value.__class__ and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+"""
+Hidden class of objects.
+Every object with the same keys in the same order shares one Shape, which maps
+each key to the index of its value in the object's `values`. Objects are never
+mutated, so a shape never changes either and `shape_of` can intern them.
+- A member access remembers the last shape it saw and the index it found there,
+  repeated reads on objects of that shape are then a single list index.
+"""
+class Shape:
+    __slots__ = ("keys", "index")
+
+    def __init__(self, keys: tuple):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+
+    def __repr__(self):
+        return f"Shape{self.keys!r}"
+
+    def __reduce__(self):
+        return shape_of, (self.keys,)
+
+# Key tuple -> its Shape, object literals repeating a key share the shape without the repeats
+SHAPES = {}
+
+def shape_of(keys: tuple) -> Shape:
+    shape = SHAPES.get(keys)
+    if shape is None:
+        unique = tuple(dict.fromkeys(keys))
+        shape = SHAPES.get(unique)
+        if shape is None:
+            shape = SHAPES[unique] = Shape(unique)
+        SHAPES[keys] = shape
+    return shape
+
 class ObjectVal(RuntimeVal):
+    __slots__ = ("shape", "values")
+    type = "object"
+
     def __init__(self, properties: {}):
-        self.type = "object"
-        self.properties = properties  # Assuming properties is a dictionary in Python
+        self.shape = shape_of(tuple(properties))
+        self.values = list(properties.values())
+
+    # The properties as a dict, built on demand
+    @property
+    def properties(self) -> dict:
+        return dict(zip(self.shape.keys, self.values))
+
+    def __repr__(self):
+        return f"{{'type': 'object', 'properties': {self.properties!r}}}"
+
+    def __eq__(self, other):
+        if other.__class__ is not ObjectVal:
+            return False
+        if self.shape is other.shape:
+            return self.values == other.values
+        return self.properties == other.properties
+
+    __hash__ = None
+
+def make_object(shape: Shape, values: list) -> ObjectVal:
+    # Builds an object from the values of every key of shape in order
+    obj = object.__new__(ObjectVal)
+    obj.shape = shape
+    obj.values = values
+    return obj
+
+NULL = object.__new__(NullVal)
+TRUE = object.__new__(BooleanVal)
+TRUE.value = True
+FALSE = object.__new__(BooleanVal)
+FALSE.value = False
+
+# NumberVals of the integers most loops count with
+SMALL_INTS = range(-5, 257)
+SMALL_NUMBERS = [NumberVal(i) for i in SMALL_INTS]
+
+def number(value) -> NumberVal:
+    if value.__class__ is int and -5 <= value <= 256:
+        return SMALL_NUMBERS[value + 5]
+    return NumberVal(value)
+
+def boolean(value: bool) -> BooleanVal:
+    return TRUE if value else FALSE
 
 def import_env():
     from runtime.environment import Environment
@@ -55,17 +180,226 @@ class NativeFn(RuntimeVal):
     
 @dataclass
 class FunctionVal(RuntimeVal):
-    def __init__(self, name, params, declaration_env, body):
+    def __init__(self, name, params, declaration_env, body, compiled=None):
         self.type = "function"
         self.name: str = name
         self.params: [] = params
         self.declaration_env = declaration_env
         self.body = body
+        # Body compiled by the closure engine, built on first use
+        self.compiled = compiled
+        # CodeObject of the body for the bytecode VM, built on first use
+        self.code = None
+        # MemoCache of a function declared `memo def`, see runtime.memo
+        self.memo = None
+
+    # Compiled bodies and caches are closures of the process that built them
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["compiled"] = state["code"] = state["memo"] = None
+        return state
 
-@dataclass
 class StringVal(RuntimeVal):
+    __slots__ = ("value",)
+    type = "string"
+
     def __init__(self, value: str):
-        self.type = "string"
         self.value = value
- 
 
+    def __repr__(self):
+        return f"{{'type': 'string', 'value': {self.value!r}}}"
+
+    def __eq__(self, other):
+        return other.__class__ is StringVal and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+"""
+Arrays.
+The elements of an array are kept unboxed when they allow it: an array of ints
+that fit in 64 bits is backed by an `array('q')` and one of floats by an
+`array('d')`, 8 bytes per element instead of a NumberVal each. Any other
+element turns the buffer into a list of RuntimeVals for good. An empty array
+picks its storage again from the next element pushed onto it.
+- Arrays have a `length` and the methods of ARRAY_METHODS, and are indexed
+  with `array[i]`. Unlike objects they are mutable.
+- Operators apply element-wise, see runtime.vector. The Python operators of
+  ArrayVal do the same for the raw numbers runtime.closures computes with, so
+  `==` compares elements rather than arrays.
+"""
+INT64 = range(-2 ** 63, 2 ** 63)
+
+def storage_for(values: list):
+    # The buffer holding the RuntimeVals of values
+    if values and all(value.__class__ is NumberVal for value in values):
+        classes = {value.value.__class__ for value in values}
+        if classes == {int} and all(value.value in INT64 for value in values):
+            return array("q", [value.value for value in values])
+        if classes == {float}:
+            return array("d", [value.value for value in values])
+    return list(values)
+
+def fits(items, value: RuntimeVal) -> bool:
+    # Whether value can be stored in the typed buffer items
+    if value.__class__ is not NumberVal:
+        return False
+    if items.typecode == "q":
+        return value.value.__class__ is int and value.value in INT64
+    return value.value.__class__ is float
+
+class ArrayVal(RuntimeVal):
+    __slots__ = ("items",)
+    type = "array"
+
+    def __init__(self, values: list):
+        self.items = storage_for(values)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, index: int) -> RuntimeVal:
+        items = self.items
+        if items.__class__ is list:
+            return items[index]
+        return number(items[index])
+
+    def elements(self) -> list:
+        items = self.items
+        if items.__class__ is list:
+            return list(items)
+        return [number(item) for item in items]
+
+    def push(self, value: RuntimeVal):
+        items = self.items
+        if items.__class__ is list:
+            if not items:
+                self.items = storage_for([value])
+                return
+        elif fits(items, value):
+            items.append(value.value)
+            return
+        elif not items:
+            self.items = storage_for([value])
+            return
+        else:
+            items = self.items = self.elements()
+        items.append(value)
+
+    def pop(self) -> RuntimeVal:
+        items = self.items
+        if not items:
+            return NULL
+        if items.__class__ is list:
+            return items.pop()
+        return number(items.pop())
+
+    def __repr__(self):
+        return f"{{'type': 'array', 'elements': {self.elements()!r}}}"
+
+    # An array is neither true nor false, conditions read `value` of what they test
+    @property
+    def value(self):
+        raise ValueError("The truth value of an array is ambiguous.")
+
+    def __bool__(self):
+        raise ValueError("The truth value of an array is ambiguous.")
+
+    __hash__ = None
+
+# Arrays have no properties by key, reads of a name always miss the inline caches of objects
+ArrayVal.shape = Shape(())
+
+def make_array(items) -> ArrayVal:
+    # Builds an array around a buffer made by storage_for, or a list
+    value = object.__new__(ArrayVal)
+    value.items = items
+    return value
+
+# runtime.vector.binary, imported on the first element-wise operation since vector imports this module
+BINARY = None
+
+def elementwise(symbol: str, reflected: bool):
+    def apply(self, other):
+        global BINARY
+        binary = BINARY
+        if binary is None:
+            from runtime.vector import binary
+            BINARY = binary
+        if not isinstance(other, RuntimeVal):
+            other = number(other)
+        return binary(symbol, other, self) if reflected else binary(symbol, self, other)
+    return apply
+
+for symbol, method in (("+", "add"), ("-", "sub"), ("*", "mul"), ("/", "truediv"), ("%", "mod"), ("^", "pow")):
+    setattr(ArrayVal, f"__{method}__", elementwise(symbol, False))
+    setattr(ArrayVal, f"__r{method}__", elementwise(symbol, True))
+# Python reflects comparisons itself, `1 < array` calls `array > 1`
+for symbol, method in (("==", "eq"), ("!=", "ne"), ("<", "lt"), ("<=", "le"), (">", "gt"), (">=", "ge")):
+    setattr(ArrayVal, f"__{method}__", elementwise(symbol, False))
+
+def array_push(value: ArrayVal, args: list) -> RuntimeVal:
+    for arg in args:
+        value.push(arg)
+    return number(len(value.items))
+
+def array_pop(value: ArrayVal, args: list) -> RuntimeVal:
+    return value.pop()
+
+# Method name -> function(array, args) run by `array.name(args)`
+ARRAY_METHODS = {
+    "push": array_push,
+    "pop": array_pop,
+}
+
+def array_member(value: ArrayVal, name: str) -> RuntimeVal:
+    # `array.name`, the length or a method bound to the array
+    if name == "length":
+        return number(len(value.items))
+    method = ARRAY_METHODS.get(name)
+    if method is None:
+        raise Exception("The Member couldn't be found")
+    return NativeFn(lambda args, scope: method(value, args))
+
+def index_value(value: RuntimeVal, key: RuntimeVal) -> RuntimeVal:
+    # `value[key]`, an element of an array or a property of an object
+    cls = value.__class__
+    if cls is ArrayVal:
+        if key.__class__ is not NumberVal or key.value.__class__ is not int:
+            raise ValueError("Arrays can only be indexed with integers.")
+        index = key.value
+        if not 0 <= index < len(value.items):
+            raise IndexError(f"Array index {index} is out of range for an array of length {len(value.items)}.")
+        return value.get(index)
+    if cls is ObjectVal and key.__class__ is StringVal:
+        index = value.shape.index.get(key.value)
+        if index is None:
+            raise Exception("The Member couldn't be found")
+        return value.values[index]
+    raise ValueError(f"Cannot index a value of type {value.type} with a {key.type}.")
+
+"""
+Iteration of for loops.
+A loop runs over what its iterable held when the loop started: the elements of
+an array, or the keys of an object as strings in the order they were given.
+`range(start, stop, step)` counts like Python's range, through integers only.
+"""
+def iterate(value: RuntimeVal):
+    # Iterator over the values a for loop binds its variable to
+    cls = value.__class__
+    if cls is ArrayVal:
+        items = value.items
+        if items.__class__ is list:
+            return iter(list(items))
+        return map(number, items[:])
+    if cls is ObjectVal:
+        return map(StringVal, value.shape.keys)
+    raise ValueError(f"Cannot iterate over a value of type {value.type}.")
+
+def count_range(start: RuntimeVal, stop: RuntimeVal, step: RuntimeVal) -> range:
+    for bound in (start, stop, step):
+        if bound.__class__ is not NumberVal or bound.value.__class__ is not int:
+            raise ValueError("The bounds and step of a range must be integers.")
+    if step.value == 0:
+        raise ValueError("The step of a range cannot be zero.")
+    return range(start.value, stop.value, step.value)
@@ -0,0 +1,234 @@
+from runtime.values import ArrayVal, NumberVal, RuntimeVal, NULL, ARRAY_METHODS, INT64, boolean, make_array, number, storage_for
+from runtime.closures import ARITHMETIC_OPERATORS, COMPARISON_OPERATORS
+from array import array
+from itertools import repeat
+import math
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+Element-wise operators and reductions of arrays.
+`binary` applies an arithmetic or comparison operator to every element of an
+array, or pairwise to the elements of two arrays of the same length, with a
+number on the other side broadcast to every element. Elements combine exactly
+like two values do on their own: numbers give a number or boolean, arrays
+combine element-wise again and anything else gives null.
+- With NumPy installed, arrays of at least VECTORIZE_AFTER unboxed elements
+  combine in a single NumPy operation. It is only used where its result is
+  known to match Python's, ints that could leave 64 bits, division or modulo by
+  zero and powers of floats, which NumPy doesn't round like the C library does,
+  take the Python loop, which fails or widens like the operators on two numbers
+  do.
+- Arrays have the reductions sum, min, max, mean and dot as methods. Float sums
+  are correctly rounded by math.fsum, with or without NumPy.
+"""
+VECTORIZE_AFTER = 32
+
+# Magnitudes below which ints convert to floats exactly, and int64 operations can't overflow
+EXACT = 2.0 ** 53
+SAFE = 2.0 ** 62
+
+if numpy is not None:
+    NUMPY_OPERATORS = {
+        "+": numpy.add,
+        "-": numpy.subtract,
+        "*": numpy.multiply,
+        "/": numpy.true_divide,
+        "%": numpy.remainder,
+        "^": numpy.power,
+        "==": numpy.equal,
+        "!=": numpy.not_equal,
+        "<": numpy.less,
+        "<=": numpy.less_equal,
+        ">": numpy.greater,
+        ">=": numpy.greater_equal,
+    }
+
+def pack(values: list):
+    # The buffer holding the numbers of values, all of them Python numbers
+    if all(value.__class__ is int for value in values):
+        if all(value in INT64 for value in values):
+            return array("q", values)
+    elif all(value.__class__ is float for value in values):
+        return array("d", values)
+    return [number(value) for value in values]
+
+def combine(symbol: str, lhs: RuntimeVal, rhs: RuntimeVal) -> RuntimeVal:
+    # Two elements, or an element and the broadcast operand
+    if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+        if symbol in COMPARISON_OPERATORS:
+            return boolean(COMPARISON_OPERATORS[symbol](lhs.value, rhs.value))
+        return number(ARITHMETIC_OPERATORS[symbol](lhs.value, rhs.value))
+    if lhs.__class__ is ArrayVal or rhs.__class__ is ArrayVal:
+        return binary(symbol, lhs, rhs)
+    return NULL
+
+def binary(symbol: str, lhs: RuntimeVal, rhs: RuntimeVal) -> RuntimeVal:
+    """
+    `lhs symbol rhs` where at least one operand is an array. The other one has
+    to be an array of the same length or a number, anything else gives null.
+    """
+    left_array = lhs.__class__ is ArrayVal
+    right_array = rhs.__class__ is ArrayVal
+    if left_array and right_array:
+        if len(lhs.items) != len(rhs.items):
+            raise ValueError(f"Cannot combine arrays of lengths {len(lhs.items)} and {len(rhs.items)} element-wise.")
+    elif not (rhs.__class__ is NumberVal if left_array else lhs.__class__ is NumberVal):
+        return NULL
+
+    left = lhs.items if left_array else lhs.value
+    right = rhs.items if right_array else rhs.value
+    size = len(left) if left_array else len(right)
+    if left.__class__ is list or right.__class__ is list:
+        # Boxed elements, each combined on its own
+        lefts = lhs.elements() if left_array else repeat(lhs, size)
+        rights = rhs.elements() if right_array else repeat(rhs, size)
+        return make_array(storage_for([combine(symbol, x, y) for x, y in zip(lefts, rights)]))
+
+    if numpy is not None and size >= VECTORIZE_AFTER:
+        result = vectorized(symbol, left, right)
+        if result is not None:
+            return result
+
+    lefts = left if left_array else repeat(left, size)
+    rights = right if right_array else repeat(right, size)
+    if symbol in COMPARISON_OPERATORS:
+        return make_array(list(map(boolean, map(COMPARISON_OPERATORS[symbol], lefts, rights))))
+    return make_array(pack(list(map(ARITHMETIC_OPERATORS[symbol], lefts, rights))))
+
+def as_numpy(value):
+    # An ndarray sharing the memory of a typed buffer, a NumPy scalar of a number, None for anything else
+    cls = value.__class__
+    if cls is array:
+        return numpy.frombuffer(value, numpy.int64 if value.typecode == "q" else numpy.float64)
+    if cls is int:
+        return numpy.int64(value) if value in INT64 else None
+    if cls is float:
+        return numpy.float64(value)
+    return None
+
+def bound(value) -> float:
+    # Largest magnitude in an int ndarray or scalar
+    if value.size == 0:
+        return 0.0
+    return max(abs(float(value.min())), abs(float(value.max())))
+
+def vectorized(symbol: str, left, right) -> ArrayVal:
+    # The result computed by NumPy, or None when it may differ from Python's
+    a = as_numpy(left)
+    b = as_numpy(right)
+    if a is None or b is None:
+        return None
+    ints = a.dtype == numpy.int64 and b.dtype == numpy.int64
+    mixed = a.dtype != b.dtype
+
+    if symbol in COMPARISON_OPERATORS:
+        # Python compares ints and floats exactly, NumPy converts the int
+        if mixed and bound(a if a.dtype == numpy.int64 else b) >= EXACT:
+            return None
+        return make_array(list(map(boolean, NUMPY_OPERATORS[symbol](a, b).tolist())))
+
+    if symbol in ("/", "%") and not numpy.all(b != 0):
+        return None
+    if symbol == "^" and not ints:
+        return None
+    if ints:
+        left_bound = bound(a)
+        right_bound = bound(b)
+        if symbol in ("+", "-") and left_bound + right_bound >= SAFE:
+            return None
+        if symbol == "*" and left_bound * right_bound >= SAFE:
+            return None
+        if symbol == "/" and max(left_bound, right_bound) >= EXACT:
+            return None
+        if symbol == "^" and (numpy.any(b < 0) or left_bound > 1 and right_bound * math.log2(left_bound) >= 62):
+            return None
+
+    with numpy.errstate(all="ignore"):
+        result = NUMPY_OPERATORS[symbol](a, b)
+    items = array("q" if result.dtype == numpy.int64 else "d")
+    items.frombytes(result.tobytes())
+    return make_array(items)
+
+# REDUCTIONS
+
+def numbers(value: ArrayVal, name: str):
+    # The elements of an array as Python numbers, for a reduction
+    items = value.items
+    if items.__class__ is not list:
+        return items
+    for element in items:
+        if element.__class__ is not NumberVal:
+            raise ValueError(f"Cannot take the {name} of an array holding a {element.type}.")
+    return [element.value for element in items]
+
+def total(values) -> object:
+    # Sum of Python numbers: exact for ints, correctly rounded for floats
+    if values.__class__ is array:
+        if values.typecode == "d":
+            return math.fsum(values)
+        if numpy is not None and len(values) >= VECTORIZE_AFTER:
+            ints = numpy.frombuffer(values, numpy.int64)
+            if bound(ints) * len(values) < SAFE:
+                return int(ints.sum())
+        return sum(values)
+    if all(value.__class__ is int for value in values) or any(value.__class__ is complex for value in values):
+        return sum(values)
+    return math.fsum(values)
+
+def array_sum(value: ArrayVal, args: list) -> RuntimeVal:
+    return number(total(numbers(value, "sum")))
+
+def array_mean(value: ArrayVal, args: list) -> RuntimeVal:
+    values = numbers(value, "mean")
+    if not len(values):
+        return NULL
+    return number(total(values) / len(values))
+
+def extreme(value: ArrayVal, name: str, pick) -> RuntimeVal:
+    values = numbers(value, name)
+    if not len(values):
+        return NULL
+    if numpy is not None and values.__class__ is array and len(values) >= VECTORIZE_AFTER:
+        result = getattr(numpy.frombuffer(values, numpy.int64 if values.typecode == "q" else numpy.float64), name)().item()
+        # Python's min and max of floats including nan depend on the order
+        if result == result:
+            return number(result)
+    return number(pick(values))
+
+def array_min(value: ArrayVal, args: list) -> RuntimeVal:
+    return extreme(value, "min", min)
+
+def array_max(value: ArrayVal, args: list) -> RuntimeVal:
+    return extreme(value, "max", max)
+
+def array_dot(value: ArrayVal, args: list) -> RuntimeVal:
+    other = args[0] if args else NULL
+    if other.__class__ is not ArrayVal or len(other.items) != len(value.items):
+        raise ValueError("dot needs an array of the same length.")
+    left = numbers(value, "dot")
+    right = numbers(other, "dot")
+    if numpy is not None and left.__class__ is array and right.__class__ is array and len(left) >= VECTORIZE_AFTER:
+        a = as_numpy(left)
+        b = as_numpy(right)
+        if a.dtype == numpy.int64 and b.dtype == numpy.int64:
+            if bound(a) * bound(b) * len(left) < SAFE:
+                return number(int(numpy.dot(a, b)))
+        else:
+            # Same products as Python's, summed correctly rounded
+            with numpy.errstate(all="ignore"):
+                products = numpy.multiply(a, b)
+            return number(math.fsum(products.tolist()))
+    return number(total(list(map(operator.mul, left, right))))
+
+ARRAY_METHODS.update({
+    "sum": array_sum,
+    "min": array_min,
+    "max": array_max,
+    "mean": array_mean,
+    "dot": array_dot,
+})
@@ -0,0 +1,277 @@
+from frontend.ast import Program
+from runtime.bytecode import CodeObject, Op, BINARY_OPERATORS, COMPARISON_OPERATORS, compile_program, compile_function
+from runtime.closures import ARITHMETIC_OPERATORS, COMPARISON_OPERATORS as COMPARISONS
+from runtime.environment import Environment
+from runtime import memo, vector
+from runtime.values import ArrayVal, BooleanVal, FunctionVal, NumberVal, ObjectVal, RuntimeVal, NULL, TRUE, FALSE, number, boolean, make_object, array_member, index_value, iterate, count_range
+
+"""
+Stack based virtual machine running the CodeObjects built by runtime.bytecode.
+The semantics mirror `runtime.interpreter.evaluate` exactly.
+- The VM is stackless: a call of a BeamScript function saves the caller on an
+  explicit list of frames instead of recursing into Python, so recursion is
+  only limited by memory. A TAIL_CALL replaces the caller's frame instead.
+- A call of a memoized function that misses its cache saves the caller with
+  the cache and key, and RETURN stores the result there. A TAIL_CALL of one
+  saves the caller like a CALL does, to return the result once it is stored.
+"""
+# Operator functions indexed by the argument of BINARY_OP / COMPARE_OP
+BINARY_FUNCTIONS = tuple(ARITHMETIC_OPERATORS[op] for op in BINARY_OPERATORS)
+COMPARISON_FUNCTIONS = tuple(COMPARISONS[op] for op in COMPARISON_OPERATORS)
+
+LOAD_CONST = int(Op.LOAD_CONST)
+LOAD_NAME = int(Op.LOAD_NAME)
+STORE_NAME = int(Op.STORE_NAME)
+DECLARE_VAR = int(Op.DECLARE_VAR)
+DECLARE_CONST = int(Op.DECLARE_CONST)
+MAKE_FUNCTION = int(Op.MAKE_FUNCTION)
+BINARY_OP = int(Op.BINARY_OP)
+COMPARE_OP = int(Op.COMPARE_OP)
+UNARY_PLUS = int(Op.UNARY_PLUS)
+UNARY_MINUS = int(Op.UNARY_MINUS)
+UNARY_NOT = int(Op.UNARY_NOT)
+LOGICAL_AND = int(Op.LOGICAL_AND)
+LOGICAL_OR = int(Op.LOGICAL_OR)
+GET_MEMBER = int(Op.GET_MEMBER)
+BUILD_OBJECT = int(Op.BUILD_OBJECT)
+CALL = int(Op.CALL)
+JUMP = int(Op.JUMP)
+JUMP_IF_FALSE = int(Op.JUMP_IF_FALSE)
+POP = int(Op.POP)
+RETURN = int(Op.RETURN)
+TAIL_CALL = int(Op.TAIL_CALL)
+BUILD_ARRAY = int(Op.BUILD_ARRAY)
+GET_INDEX = int(Op.GET_INDEX)
+GET_ITER = int(Op.GET_ITER)
+GET_RANGE = int(Op.GET_RANGE)
+FOR_ITER = int(Op.FOR_ITER)
+BIND_NAME = int(Op.BIND_NAME)
+
+# What FOR_ITER gets from an iterator with no values left, arrays may hold a bare None
+EXHAUSTED = object()
+
+def run_code(code: CodeObject, env: Environment) -> RuntimeVal:
+    instructions = code.listing
+    constants = code.constants
+    names = code.names
+    caches = code.caches
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    ip = 0
+    # Callers of the running code: (code, ip, stack, env, pending) of each,
+    # pending is the (MemoCache, key) the result of its call is stored under
+    frames = []
+
+    # Opcodes are tested roughly in order of how often they run
+    while True:
+        op = instructions[ip]
+        arg = instructions[ip + 1]
+        ip += 2
+
+        if op == LOAD_NAME:
+            # Environment.lookupVar with the parent chain walk inlined
+            name = names[arg]
+            scope = env
+            while name not in scope.variables:
+                scope = scope.parent
+                if scope is None:
+                    raise ValueError(f"Cannot resolve '{name}' as it does not exist.")
+            push(scope.variables[name])
+        elif op == LOAD_CONST:
+            push(constants[arg])
+        elif op == BINARY_OP:
+            rhs = pop()
+            lhs = pop()
+            if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+                push(number(BINARY_FUNCTIONS[arg](lhs.value, rhs.value)))
+            elif lhs.__class__ is ArrayVal or rhs.__class__ is ArrayVal:
+                push(vector.binary(BINARY_OPERATORS[arg], lhs, rhs))
+            else:
+                push(NULL)
+        elif op == COMPARE_OP:
+            rhs = pop()
+            lhs = pop()
+            if lhs.__class__ is NumberVal and rhs.__class__ is NumberVal:
+                push(boolean(COMPARISON_FUNCTIONS[arg](lhs.value, rhs.value)))
+            elif lhs.__class__ is ArrayVal or rhs.__class__ is ArrayVal:
+                push(vector.binary(COMPARISON_OPERATORS[arg], lhs, rhs))
+            else:
+                push(NULL)
+        elif op == JUMP_IF_FALSE:
+            if not pop().value:
+                ip = arg
+        elif op == FOR_ITER:
+            value = next(stack[-1], EXHAUSTED)
+            if value is EXHAUSTED:
+                pop()
+                ip = arg
+            else:
+                push(value)
+        elif op == BIND_NAME:
+            env.bindVar(names[arg], pop())
+        elif op == STORE_NAME:
+            env.assignVar(names[arg], stack[-1])
+        elif op == JUMP:
+            ip = arg
+        elif op == POP:
+            pop()
+        elif op == CALL or op == TAIL_CALL:
+            fn = pop()
+            if arg:
+                args = stack[-arg:]
+                del stack[-arg:]
+            else:
+                args = []
+
+            if fn.type == "function":
+                pending = None
+                cache = fn.memo
+                if cache is not None:
+                    key, result = cache.lookup(args)
+                    if result is not memo.MISS:
+                        # After a TAIL_CALL comes the RETURN returning it
+                        push(result)
+                        continue
+                    if key is not None:
+                        pending = (cache, key)
+                if op == CALL or pending is not None:
+                    frames.append((code, ip, stack, env, pending))
+                code = fn.code
+                if code is None:
+                    # Declared by another engine, compile it on first call
+                    code = fn.code = compile_function_value(fn)
+                env = Environment(fn.declaration_env)
+                params = code.params
+                for i in range(len(params)):
+                    env.declareVar(params[i], args[i], False)
+                instructions = code.listing
+                constants = code.constants
+                names = code.names
+                caches = code.caches
+                stack = []
+                push = stack.append
+                pop = stack.pop
+                ip = 0
+            elif fn.type == "native_fn":
+                result = fn.call(args, env)
+                if op == CALL:
+                    push(result)
+                else:
+                    # Return the result like RETURN does
+                    if not frames:
+                        return result
+                    code, ip, stack, env, pending = frames.pop()
+                    if pending is not None:
+                        pending[0].store(pending[1], result)
+                    instructions = code.listing
+                    constants = code.constants
+                    names = code.names
+                    caches = code.caches
+                    push = stack.append
+                    pop = stack.pop
+                    push(result)
+            else:
+                raise ValueError("Cannot call value that is not a function: " + str(fn))
+        elif op == GET_MEMBER:
+            value = pop()
+            shape = value.shape
+            # Inline cache of this instruction: the last Shape seen and the index found in it
+            cache = caches[ip]
+            if cache is not None and cache[0] is shape:
+                push(value.values[cache[1]])
+            else:
+                index = shape.index.get(names[arg])
+                if index is None:
+                    if value.__class__ is not ArrayVal:
+                        raise Exception("The Member couldn't be found")
+                    push(array_member(value, names[arg]))
+                else:
+                    caches[ip] = (shape, index)
+                    push(value.values[index])
+        elif op == GET_INDEX:
+            key = pop()
+            push(index_value(pop(), key))
+        elif op == GET_ITER:
+            push(iterate(pop()))
+        elif op == GET_RANGE:
+            step = pop()
+            stop = pop()
+            push(map(number, count_range(pop(), stop, step)))
+        elif op == DECLARE_VAR:
+            env.declareVar(names[arg], pop(), False)
+        elif op == DECLARE_CONST:
+            env.declareVar(names[arg], pop(), True)
+        elif op == UNARY_MINUS:
+            operand = pop()
+            if operand.__class__ is not NumberVal:
+                raise ValueError("Unary negation can only be applied to numbers.")
+            push(number(-operand.value))
+        elif op == UNARY_PLUS:
+            operand = pop()
+            if operand.__class__ is not NumberVal:
+                raise ValueError("Unary plus operator can only be applied to numbers.")
+            push(number(+operand.value))
+        elif op == UNARY_NOT:
+            operand = pop()
+            if operand.__class__ is not BooleanVal:
+                raise ValueError("Logical not can only be applied to booleans.")
+            push(boolean(not operand.value))
+        elif op == LOGICAL_AND:
+            right_val = pop()
+            left_val = pop()
+            push(left_val if left_val == right_val else FALSE)
+        elif op == LOGICAL_OR:
+            right_val = pop()
+            left_val = pop()
+            push(TRUE if left_val.value else right_val)
+        elif op == BUILD_OBJECT:
+            keys, shape = constants[arg]
+            if keys:
+                values = stack[-len(keys):]
+                del stack[-len(keys):]
+            else:
+                values = []
+            if len(values) == len(shape.keys):
+                push(make_object(shape, values))
+            else:
+                # A key given more than once keeps its last value
+                push(ObjectVal(dict(zip(keys, values))))
+        elif op == BUILD_ARRAY:
+            if arg:
+                values = stack[-arg:]
+                del stack[-arg:]
+            else:
+                values = []
+            push(ArrayVal(values))
+        elif op == MAKE_FUNCTION:
+            function_code = constants[arg]
+            declaration = function_code.declaration
+            fn = FunctionVal(declaration.id.name, declaration.params, env, declaration.body)
+            fn.code = function_code
+            if declaration.memoized:
+                fn.memo = memo.new_cache(declaration)
+            push(fn)
+        elif op == RETURN:
+            result = stack[-1] if stack else None
+            if not frames:
+                return result
+            code, ip, stack, env, pending = frames.pop()
+            if pending is not None:
+                pending[0].store(pending[1], result)
+            instructions = code.listing
+            constants = code.constants
+            names = code.names
+            caches = code.caches
+            push = stack.append
+            pop = stack.pop
+            push(result)
+        else:
+            raise ValueError(f"Unknown opcode {op} at offset {ip - 2} in {code.name}")
+
+def compile_function_value(fn: FunctionVal) -> CodeObject:
+    from frontend.ast import FunctionDeclaration, Identifier
+    return compile_function(FunctionDeclaration(Identifier(fn.name), fn.params, fn.body))
+
+def execute(program: Program, env: Environment) -> RuntimeVal:
+    return run_code(compile_program(program), env)